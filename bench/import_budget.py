@@ -0,0 +1,88 @@
+# bench/import_budget.py
+"""
+Проверка времени холодного импорта бота.
+
+    python -m bench.import_budget                      # бюджет по умолчанию (IMPORT_BUDGET_S или 1.5 с)
+    python -m bench.import_budget --budget 0.8 --top 15
+
+Импорт выполняется в отдельном чистом интерпретаторе с -X importtime. Код возврата 1, если
+импорт дольше бюджета или если при импорте загрузилась тяжёлая библиотека (spaCy, numpy,
+pdf-парсеры и т.п.) — они должны подгружаться только стадиями анализа или фоновым прогревом.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ("bot.main",)
+HEAVY_MODULES = ("torch", "spacy", "numpy", "pdfplumber", "pdfminer", "docx", "rapidfuzz", "datasketch",
+                 "striprtf", "whisper", "pyttsx3")
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+print("ELAPSED", time.perf_counter() - start)
+print("LOADED", " ".join(sorted({m.split(".")[0] for m in sys.modules})))
+"""
+
+
+def measure_imports(modules=DEFAULT_MODULES) -> Tuple[float, set, List[Tuple[int, str]]]:
+    """
+    Импортирует modules в новом процессе.
+    Возвращает (секунды, загруженные пакеты верхнего уровня, [(кумулятивные мкс, модуль), ...]).
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE, *modules], cwd=ROOT_DIR,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        error = "\n".join(line for line in proc.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"Импорт {', '.join(modules)} завершился ошибкой:\n{error}")
+
+    values: Dict[str, str] = {}
+    for line in proc.stdout.splitlines():
+        key, _, value = line.partition(" ")
+        values[key] = value
+
+    cumulative = []
+    for line in proc.stderr.splitlines():
+        # формат: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) == 3:
+            cumulative.append((int(parts[1]), parts[2].strip()))
+    cumulative.sort(reverse=True)
+    return float(values["ELAPSED"]), set(values.get("LOADED", "").split()), cumulative
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бюджет времени холодного импорта бота")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_BUDGET_S", 1.5)),
+                        help="допустимое время импорта, с")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых медленных модулей показать")
+    args = parser.parse_args(argv)
+
+    elapsed, loaded, cumulative = measure_imports(args.modules)
+    print(f"Импорт {', '.join(args.modules)}: {elapsed:.3f} с (бюджет {args.budget:.3f} с)")
+    for micros, name in cumulative[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {name.strip()}")
+
+    failed = False
+    heavy = sorted(loaded.intersection(HEAVY_MODULES))
+    if heavy:
+        print(f"Тяжёлые библиотеки загружены при импорте: {', '.join(heavy)}")
+        failed = True
+    if elapsed > args.budget:
+        print(f"Бюджет превышен на {elapsed - args.budget:.3f} с")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
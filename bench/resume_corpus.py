@@ -0,0 +1,123 @@
+# bench/resume_corpus.py
+"""Генератор синтетических резюме (PDF/DOCX/RTF, ru/en, от одной страницы до десятков)."""
+
+import os
+import random
+from typing import Dict, List
+
+# Шрифт с кириллицей для PDF (fpdf 1.7 без unicode-шрифта умеет только latin-1)
+BENCH_FONT = os.getenv("BENCH_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+LINES_PER_PAGE = 40
+
+_VOCAB = {
+    "ru": {
+        "roles": ["бизнес-аналитик", "разработчик", "тестировщик", "руководитель проектов", "аналитик данных"],
+        "skills": ["Microsoft Excel", "PowerPoint", "SQL", "СУБД", "Python", "антифрод", "платёжные системы",
+                   "бизнес-требования", "корпоративные карты", "тест-кейсы", "BPMN", "Jira"],
+        "verbs": ["разрабатывал", "анализировал", "внедрял", "сопровождал", "оптимизировал", "тестировал"],
+        "objects": ["систему мониторинга", "бизнес-процессы", "отчётность", "правила антифрод-мониторинга",
+                    "функциональные требования", "интеграцию с банком"],
+        "templates": ["{role}. {verb} {obj}, использовал {skill} и {skill2}.",
+                      "Опыт работы {years} лет: {verb} {obj} ({skill}).",
+                      "Навыки: {skill}, {skill2}. Участвовал в проекте, где {verb} {obj}."],
+    },
+    "en": {
+        "roles": ["business analyst", "software engineer", "QA engineer", "project manager", "data analyst"],
+        "skills": ["Microsoft Excel", "PowerPoint", "SQL", "DBMS", "Python", "anti-fraud", "payment systems",
+                   "business requirements", "corporate cards", "test cases", "BPMN", "Jira"],
+        "verbs": ["developed", "analyzed", "implemented", "maintained", "optimized", "tested"],
+        "objects": ["a monitoring system", "business processes", "reporting", "anti-fraud rules",
+                    "functional requirements", "a bank integration"],
+        "templates": ["{role}. {verb} {obj} using {skill} and {skill2}.",
+                      "{years} years of experience: {verb} {obj} ({skill}).",
+                      "Skills: {skill}, {skill2}. Worked on a project where I {verb} {obj}."],
+    },
+}
+
+
+def generate_resume_lines(lang: str, pages: int, seed: int = 0, duplicate_ratio: float = 0.2) -> List[str]:
+    """
+    Строки синтетического резюме. duplicate_ratio — доля строк, повторяющих уже встреченные
+    (как в резюме из шаблонов/портфолио), чтобы нагрузить дедупликацию.
+    """
+    rnd = random.Random(seed)
+    vocab = _VOCAB[lang]
+    lines: List[str] = []
+    for _ in range(pages * LINES_PER_PAGE):
+        if lines and rnd.random() < duplicate_ratio:
+            lines.append(rnd.choice(lines))
+            continue
+        skill, skill2 = rnd.sample(vocab["skills"], 2)
+        lines.append(rnd.choice(vocab["templates"]).format(
+            role=rnd.choice(vocab["roles"]).capitalize(), verb=rnd.choice(vocab["verbs"]),
+            obj=rnd.choice(vocab["objects"]), skill=skill, skill2=skill2, years=rnd.randint(1, 15),
+        ))
+    return lines
+
+
+def write_pdf(lines: List[str], path: str):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    if os.path.exists(BENCH_FONT):
+        pdf.add_font("Bench", "", BENCH_FONT, uni=True)
+        pdf.set_font("Bench", size=10)
+    else:
+        pdf.set_font("Arial", size=10)
+        lines = [line.encode("latin-1", errors="replace").decode("latin-1") for line in lines]
+    pdf.add_page()
+    for line in lines:
+        pdf.multi_cell(0, 6, line)
+    pdf.output(path)
+
+
+def write_docx(lines: List[str], path: str):
+    import docx
+
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(path)
+
+
+def _rtf_escape(text: str) -> str:
+    out = []
+    for ch in text:
+        if ch in "\\{}":
+            out.append("\\" + ch)
+        elif ord(ch) < 128:
+            out.append(ch)
+        else:
+            code = ord(ch)
+            out.append(f"\\u{code if code < 32768 else code - 65536}?")
+    return "".join(out)
+
+
+def write_rtf(lines: List[str], path: str):
+    body = "\n".join(f"{_rtf_escape(line)}\\par" for line in lines)
+    with open(path, "w", encoding="ascii") as f:
+        f.write("{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 Arial;}}\n" + body + "\n}")
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "rtf": write_rtf}
+
+
+def build_corpus(out_dir: str, formats=("pdf", "docx", "rtf"), langs=("ru", "en"),
+                 page_sizes=(1, 5, 20, 40)) -> List[Dict]:
+    """
+    Создаёт корпус резюме в out_dir (существующие файлы переиспользуются).
+    Возвращает [{"path", "format", "lang", "pages"}, ...].
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    corpus = []
+    for lang in langs:
+        for pages in page_sizes:
+            lines = generate_resume_lines(lang, pages, seed=pages)
+            for fmt in formats:
+                path = os.path.join(out_dir, f"resume_{lang}_{pages:02d}p.{fmt}")
+                if not os.path.exists(path):
+                    WRITERS[fmt](lines, path)
+                corpus.append({"path": path, "format": fmt, "lang": lang, "pages": pages})
+    return corpus
@@ -0,0 +1,176 @@
+# bench/run_bench.py
+"""
+Бенчмарк стадий разбора резюме на синтетическом корпусе.
+
+    python -m bench.run_bench --save-baseline          # записать bench/baseline.json
+    python -m bench.run_bench --threshold 0.2          # сравнить с baseline, код 1 при регрессии > 20%
+    python -m bench.run_bench --only pipe_vs_sequential
+
+Каждая стадия (extract_text_from_*, dedupe_text_combined, extract_skills_from_text, parse_vacancy)
+замеряется отдельно; в результат пишется медиана по повторам. Стадия pipe_vs_sequential сравнивает
+nlp(seg) по одному сегменту с pipe_docs() при разных размерах батча (по ней выбран NLP_PIPE_BATCH_SIZE);
+без установленной модели spaCy она пропускается.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "ai_hr_bench_corpus")
+# Размеры батча nlp.pipe, которые сравниваются в стадии pipe_vs_sequential
+PIPE_BATCH_SIZES = (16, 32, 64, 128, 256)
+
+
+def _median_time(func: Callable, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench_pipe_vs_sequential(repeats: int = 3, langs=("ru", "en"), pages: int = 20,
+                             batch_sizes=PIPE_BATCH_SIZES) -> Dict[str, float]:
+    """
+    "До/после" для spaCy: полный пайплайн nlp(seg) по каждому сегменту резюме против pipe_docs()
+    (батч nlp.pipe без лишних компонентов) для каждого размера батча.
+    Ключи: "pipe_vs_sequential/sequential/lang" и "pipe_vs_sequential/pipe_bs<N>/lang".
+    """
+    from bench.resume_corpus import generate_resume_lines
+    from nlp.nlp_pipeline import get_nlp, pipe_docs
+
+    results: Dict[str, float] = {}
+    for lang in langs:
+        nlp = get_nlp(lang)
+        if nlp is None:
+            print(f"pipe_vs_sequential/{lang}: модель spaCy не установлена, стадия пропущена")
+            continue
+        segments = generate_resume_lines(lang, pages, seed=pages)
+        results[f"pipe_vs_sequential/sequential/{lang}"] = _median_time(lambda: [nlp(seg) for seg in segments],
+                                                                         repeats)
+        for batch_size in batch_sizes:
+            results[f"pipe_vs_sequential/pipe_bs{batch_size}/{lang}"] = _median_time(
+                lambda: pipe_docs(segments, lang, "lemmas", batch_size=batch_size), repeats)
+    return results
+
+
+def run_benchmarks(corpus_dir: str = DEFAULT_CORPUS_DIR, repeats: int = 3, page_sizes=(1, 5, 20, 40)) -> Dict[str, float]:
+    """Медианное время (с) по каждой стадии: ключ "stage/format/lang/pages"."""
+    from bench.resume_corpus import build_corpus
+    from bot.data_loader import VacancyManager
+    from nlp import parser_resume
+    from nlp.parser_resume import dedupe_text_combined, extract_skills_from_text, warmup_models
+    from nlp.skill_index import build_skill_index
+    from nlp.vacancy_parcer import parse_vacancy
+
+    warmup_models()
+    corpus = build_corpus(corpus_dir, page_sizes=page_sizes)
+    extractors = {
+        "pdf": parser_resume.extract_text_from_pdf,
+        "docx": parser_resume.extract_text_from_docx,
+        "rtf": parser_resume.extract_text_from_rtf,
+    }
+
+    raw_vacancies = VacancyManager().load_vacancies()
+    results: Dict[str, float] = {}
+
+    results["parse_vacancy"] = _median_time(lambda: [parse_vacancy(v) for v in raw_vacancies], repeats)
+    skill_index = build_skill_index(parse_vacancy(raw_vacancies[0]))
+
+    for item in corpus:
+        extract = extractors[item["format"]]
+        results[f"extract_text_from_{item['format']}/{item['lang']}/{item['pages']}"] = _median_time(
+            lambda: extract(item["path"]), repeats)
+
+        # дедупликация и навыки не зависят от формата — меряем один раз на язык/размер (по docx)
+        if item["format"] != "docx":
+            continue
+        text = parser_resume._normalize_text(extract(item["path"]))
+        results[f"dedupe_text_combined/{item['lang']}/{item['pages']}"] = _median_time(
+            lambda: dedupe_text_combined(text, lang=item["lang"]), repeats)
+        deduped = dedupe_text_combined(text, lang=item["lang"])
+        results[f"extract_skills_from_text/{item['lang']}/{item['pages']}"] = _median_time(
+            lambda: extract_skills_from_text(deduped, None, skill_index=skill_index), repeats)
+
+    results.update(bench_pipe_vs_sequential(repeats))
+    return results
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], threshold: float,
+            min_seconds: float = 0.005) -> Dict[str, float]:
+    """
+    Стадии, замедлившиеся больше чем на threshold (доля) относительно baseline.
+    Совсем быстрые стадии (< min_seconds в baseline) не сравниваются — там шум больше сигнала.
+    """
+    regressions = {}
+    for key, base in baseline.items():
+        if key not in current or base < min_seconds:
+            continue
+        change = current[key] / base - 1
+        if change > threshold:
+            regressions[key] = change
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк стадий разбора резюме")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20, 40], help="размеры резюме в страницах")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как новый baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое замедление (0.2 = 20%%)")
+    parser.add_argument("--output", help="сохранить результаты текущего запуска в JSON")
+    parser.add_argument("--only", choices=["pipe_vs_sequential"], help="запустить только эту стадию")
+    args = parser.parse_args(argv)
+
+    if args.only == "pipe_vs_sequential":
+        from nlp.parser_resume import warmup_models
+
+        warmup_models()
+        results = bench_pipe_vs_sequential(args.repeats)
+    else:
+        results = run_benchmarks(args.corpus_dir, args.repeats, tuple(args.pages))
+    for key in sorted(results):
+        print(f"{key:50s} {results[key] * 1000:10.1f} ms")
+    for key in sorted(results):
+        if key.startswith("pipe_vs_sequential/pipe_bs"):
+            sequential = results[f"pipe_vs_sequential/sequential/{key.rsplit('/', 1)[1]}"]
+            print(f"{key:50s} ускорение x{sequential / results[key]:.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline сохранён: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Baseline не найден ({args.baseline}), запустите с --save-baseline")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nРегрессии больше {args.threshold:.0%}:")
+        for key, change in sorted(regressions.items(), key=lambda kv: -kv[1]):
+            print(f"  {key}: +{change:.0%} ({baseline[key] * 1000:.1f} -> {results[key] * 1000:.1f} ms)")
+        return 1
+    print(f"\nРегрессий больше {args.threshold:.0%} нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+# analysis_executor.py
+
+import asyncio
+import functools
+import math
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from logs.logger import logger
+
+# Настройки пула анализа (можно переопределить через .env)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", 20))
+ANALYSIS_TIMEOUT = float(os.getenv("ANALYSIS_TIMEOUT", 120))
+# Через столько секунд после таймаута зависший воркер завершается (пул пересоздаётся)
+ANALYSIS_KILL_GRACE = float(os.getenv("ANALYSIS_KILL_GRACE", 10))
+# По умолчанию воркеры стартуют через forkserver/spawn в фоновом прогреве после запуска бота и сами
+# загружают модели и индексы. pre-fork (1): модели грузятся до polling, воркеры создаются через fork
+# и наследуют их copy-on-write — меньше памяти на воркер, но бот начинает отвечать только после прогрева
+ANALYSIS_PREFORK = os.getenv("ANALYSIS_PREFORK", "0") == "1"
+# Ограничение адресного пространства воркера в МБ (0 — без ограничения), защита от "тяжёлых" файлов
+ANALYSIS_MAX_MEMORY_MB = int(os.getenv("ANALYSIS_MAX_MEMORY_MB", 0))
+
+
+class QueueFullError(Exception):
+    """Очередь анализа переполнена — задачу нужно повторить позже"""
+
+
+class AnalysisTimeoutError(Exception):
+    """Задача анализа не уложилась в отведённое время"""
+
+
+class AnalysisWorkerError(Exception):
+    """Задача роняет воркер (OOM, segfault, лимит памяти) — в том числе при повторе в отдельном процессе"""
+
+
+def current_rss_mb() -> float:
+    """RSS текущего процесса в МБ (Linux /proc, иначе пиковое значение из resource)"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _init_worker(warmup: bool = False):
+    """
+    Инициализация процесса-воркера: лимит памяти и лог его RSS на старте.
+    warmup — воркер запущен через forkserver/spawn и ничего не унаследовал: модели и индексы каталога
+    загружаются сразу, а не на первом резюме.
+    """
+    if ANALYSIS_MAX_MEMORY_MB > 0:
+        import resource
+        limit = ANALYSIS_MAX_MEMORY_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if warmup:
+        try:
+            from bot.data_loader import vacancy_manager
+            from nlp.parser_resume import warmup_models
+
+            warmup_models()
+            vacancy_manager.warmup()
+        except Exception as e:
+            # ошибка инициализатора сломала бы пул — догрузится в первой задаче
+            logger.error(f"Ошибка прогрева воркера анализа: {e}", exc_info=True)
+    logger.info(f"Воркер анализа запущен: pid={os.getpid()}, RSS={current_rss_mb():.0f} МБ")
+
+
+def _run_job(hard_limit: float, func, *args):
+    """
+    Выполняется в процессе-воркере. Если задача не закончилась за hard_limit секунд, процесс завершает
+    ядро (SIGALRM с действием по умолчанию) — даже если он завис в C-коде и не отпускает GIL.
+    """
+    armed = hard_limit > 0 and hasattr(signal, "alarm")
+    if armed:
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        signal.alarm(max(1, math.ceil(hard_limit)))
+    try:
+        return func(*args)
+    finally:
+        if armed:
+            signal.alarm(0)
+
+
+def run_resume_analysis(source, file_name: str, normalized_vacancy: Dict, skill_index: Dict,
+                        rank_catalog: bool = False, catalog_version=None) -> Dict:
+    """
+    Выполняется в процессе-воркере: парсинг резюме и анализ соответствия вакансии.
+    source — путь к файлу или содержимое в памяти (bytes), file_name — для определения формата.
+    Вакансия уже нормализована, индекс навыков построен VacancyManager при загрузке каталога.
+    rank_catalog — дополнительно считает топ подходящих вакансий. Матчер каталога с задачей не передаётся:
+    воркер берёт свой (унаследованный при fork или построенный при первой задаче) и перечитывает каталог,
+    если его версия отличается от catalog_version.
+    Возвращает {"parsed": ..., "analysis": ..., "top_vacancies": [(id, percent), ...], "timings": {...}}.
+    """
+    import time
+    from nlp.analyzer import analyze_resume_vs_vacancy
+    from nlp.multi_matcher import rank_vacancies
+    from nlp.parser_resume import parse_resume
+
+    multi_matcher = None
+    if rank_catalog:
+        from bot.data_loader import vacancy_manager
+        multi_matcher = vacancy_manager.get_multi_matcher(catalog_version)
+
+    timings = {}
+    parsed_data = parse_resume(source, skill_index=skill_index, multi_matcher=multi_matcher, file_name=file_name,
+                               timings=timings)
+    start = time.perf_counter()
+    analysis = analyze_resume_vs_vacancy(parsed_data, normalized_vacancy)
+    top_vacancies = []
+    if multi_matcher is not None:
+        top_vacancies = rank_vacancies(parsed_data.pop("vacancy_matches", {}), multi_matcher.skill_indexes)
+    timings["analyze"] = time.perf_counter() - start
+    return {"parsed": parsed_data, "analysis": analysis, "top_vacancies": top_vacancies, "timings": timings}
+
+
+class AnalysisExecutor:
+    """
+    Пул процессов для тяжёлых задач анализа резюме.
+    Держит ограниченную очередь: не больше workers + queue_size задач одновременно,
+    лишние задачи сразу отклоняются с QueueFullError.
+    """
+
+    def __init__(self, workers=ANALYSIS_WORKERS, queue_size=ANALYSIS_QUEUE_SIZE, timeout=ANALYSIS_TIMEOUT,
+                 prefork=ANALYSIS_PREFORK):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.prefork = prefork and "fork" in multiprocessing.get_all_start_methods()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pools_created = 0
+        # пул может пересоздаваться из обработчиков резюме после падения воркера
+        self._pool_lock = threading.Lock()
+        # слот задачи освобождается из потока пула, когда задача действительно завершилась
+        self._count_lock = threading.Lock()
+        self._in_flight = 0
+        # повторы после падения пула идут в отдельных процессах — не больше workers одновременно
+        self._isolated_slots = asyncio.Semaphore(workers)
+
+    @property
+    def in_flight(self) -> int:
+        """Количество задач в очереди и в работе (включая зависшие после таймаута, пока воркер не завершён)"""
+        return self._in_flight
+
+    @property
+    def is_full(self) -> bool:
+        """True, если новые задачи сейчас будут отклонены"""
+        return self._in_flight >= self.workers + self.queue_size
+
+    def _mp_context(self):
+        # fork — только для первого пула: он создаётся до polling, пока в процессе нет других потоков.
+        # Пул, пересозданный после падения воркера, стартует через forkserver/spawn: fork из
+        # многопоточного процесса может зависнуть на захваченной в другом потоке блокировке.
+        if self.prefork and self._pools_created == 0:
+            return multiprocessing.get_context("fork")
+        return self._restart_context()
+
+    @staticmethod
+    def _restart_context():
+        methods = multiprocessing.get_all_start_methods()
+        return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                mp_context = self._mp_context()
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context,
+                                                 initializer=_init_worker,
+                                                 initargs=(mp_context.get_start_method() != "fork",))
+                self._pools_created += 1
+                logger.info(f"Пул анализа запущен: воркеров={self.workers}, очередь={self.queue_size}, "
+                            f"старт воркеров={mp_context.get_start_method()}")
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        """Сломанный пул (воркер упал или завершён по таймауту) заменяется новым при следующей задаче"""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.error("Воркер анализа завершился аварийно, пул анализа будет пересоздан")
+
+    def _release(self):
+        with self._count_lock:
+            self._in_flight -= 1
+
+    def _on_done(self, pool: ProcessPoolExecutor, future):
+        # вызывается и для задач, снятых до старта; воркер, завершённый по таймауту, ломает пул — сразу заменяем
+        self._release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._reset_pool(pool)
+
+    def start(self):
+        """
+        Запускает воркеры заранее и ждёт их готовности. В pre-fork режиме вызывать после прогрева моделей
+        и до запуска других потоков (прогрев в main до polling) — тогда все воркеры наследуют загруженные
+        пайплайны; иначе — из фонового прогрева, воркеры загрузят модели сами.
+        """
+        pool = self._get_pool()
+        # fork-пул создаёт все процессы при первой задаче, forkserver/spawn — по процессу на задачу,
+        # пока нет свободного воркера
+        for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    async def submit(self, func, *args, timeout: Optional[float] = None):
+        """
+        Отправляет задачу в пул и ждёт результат.
+        QueueFullError — если очередь заполнена, AnalysisTimeoutError — если задача не успела,
+        AnalysisWorkerError — если задача роняет воркер и при повторе в отдельном процессе; задача,
+        которую задело падение чужого воркера, выполняется повторно без ошибки для пользователя.
+        При таймауте или отмене корутины задача снимается из очереди, если ещё не началась; начавшаяся
+        занимает слот очереди, пока не закончится, а через timeout + ANALYSIS_KILL_GRACE с её воркер завершается.
+        """
+        if self.is_full:
+            logger.warning(f"Очередь анализа переполнена: {self._in_flight} задач")
+            raise QueueFullError("analysis queue is full")
+
+        timeout = self.timeout if timeout is None else timeout
+        pool = self._get_pool()
+        try:
+            future = pool.submit(_run_job, timeout + ANALYSIS_KILL_GRACE, func, *args)
+        except BrokenProcessPool:
+            # пул сломался до этой задачи — она ещё не отправлена, запускаем её в новом пуле
+            self._reset_pool(pool)
+            pool = self._get_pool()
+            future = pool.submit(_run_job, timeout + ANALYSIS_KILL_GRACE, func, *args)
+        self._track(future, functools.partial(self._on_done, pool))
+
+        try:
+            return await self._wait(future, timeout)
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+        # падение одного воркера (OOM или завершение зависшей задачи) ломает весь пул, и задачи остальных
+        # пользователей получают BrokenProcessPool. Какая задача виновата, неизвестно, поэтому каждая
+        # повторяется в своём одноразовом процессе: виновная упадёт ещё раз одна, остальные выполнятся.
+        logger.warning("Пул анализа сломался во время задачи, повтор в отдельном процессе")
+        return await self._run_isolated(timeout, func, args)
+
+    def _track(self, future, on_done):
+        with self._count_lock:
+            self._in_flight += 1
+        future.add_done_callback(on_done)
+
+    async def _wait(self, future, timeout: float):
+        try:
+            # отмена asyncio-обёртки (таймаут wait_for или отмена корутины) снимает задачу из очереди пула
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Задача анализа превысила таймаут {timeout} с"
+                         + (f", воркер будет завершён через {ANALYSIS_KILL_GRACE:.0f} с" if future.running() else ""))
+            raise AnalysisTimeoutError(f"analysis timed out after {timeout}s")
+
+    async def _run_isolated(self, timeout: float, func, args):
+        async with self._isolated_slots:
+            pool = ProcessPoolExecutor(max_workers=1, mp_context=self._restart_context(), initializer=_init_worker,
+                                       initargs=(True,))
+            try:
+                future = pool.submit(_run_job, timeout + ANALYSIS_KILL_GRACE, func, *args)
+                self._track(future, lambda _: self._release())
+                try:
+                    return await self._wait(future, timeout)
+                except BrokenProcessPool as e:
+                    raise AnalysisWorkerError("analysis worker crashed") from e
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    async def analyze_resume(self, source, file_name: str, normalized_vacancy: Dict, skill_index: Dict,
+                             rank_catalog: bool = False, catalog_version=None,
+                             timeout: Optional[float] = None) -> Dict:
+        """Парсинг и анализ резюме (путь или bytes) в пуле процессов"""
+        return await self.submit(run_resume_analysis, source, file_name, normalized_vacancy, skill_index,
+                                 rank_catalog, catalog_version, timeout=timeout)
+
+    def shutdown(self):
+        """Останавливает пул, отменяя задачи, которые ещё не начались"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            logger.info("Пул анализа остановлен")
+
+
+# общий экземпляр пула анализа
+analysis_executor = AnalysisExecutor()
@@ -0,0 +1,327 @@
+# bulk_screen.py
+"""
+Офлайн-скрининг пачки резюме без бота.
+
+    python -m bot.bulk_screen data/inbox --vacancy-id 1 --vacancy-id 2 -o results.jsonl
+    python -m bot.bulk_screen resumes.zip --vacancy-id 1 -o results.csv --workers 8
+
+Вход — папка (рекурсивно) или архив .zip/.tar(.gz). Результаты пишутся построчно по мере
+готовности (JSONL или CSV по расширению), повторный запуск пропускает уже обработанные файлы.
+Недописанная последняя строка прерванного запуска отбрасывается при продолжении.
+
+Если воркер падает (OOM, segfault), пул пересоздаётся, а файлы упавшей пачки разбираются
+повторно по одному: строку с ошибкой получает только файл, на котором воркер падает и в одиночку.
+Строки с ошибками считаются обработанными и при следующем запуске не повторяются — чтобы
+разобрать такие файлы заново, удалите их строки из файла результатов.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Tuple
+
+from bot.data_loader import VACANCIES_FILE, VacancyManager
+from logs.logger import logger
+
+RESUME_EXTENSIONS = (".pdf", ".docx", ".rtf")
+CSV_FIELDS = ["file", "vacancy_id", "vacancy_title", "hard_score", "soft_score", "cases_score",
+              "total_score", "skills", "red_flags", "error"]
+
+# Сколько резюме воркер разбирает и оценивает за одну задачу
+SCREEN_BATCH_SIZE = 8
+
+# Контекст воркера: нормализованные вакансии, индексы навыков и матчер (передаются один раз)
+_worker_context: Dict = {}
+
+
+def _init_screen_worker(context: Dict):
+    _worker_context.update(context)
+
+
+def iter_resumes(path: str) -> Iterator[Tuple[str, object]]:
+    """(имя, источник) для каждого резюме: путь для файлов из папки, bytes для файлов из архива."""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.lower().endswith(RESUME_EXTENSIONS):
+                    full = os.path.join(root, name)
+                    yield os.path.relpath(full, path), full
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(RESUME_EXTENSIONS):
+                    yield info.filename, zf.read(info)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as tf:
+            for member in tf:
+                if member.isfile() and member.name.lower().endswith(RESUME_EXTENSIONS):
+                    yield member.name, tf.extractfile(member).read()
+    else:
+        raise ValueError(f"Ожидалась папка или архив .zip/.tar: {path}")
+
+
+def _error_rows(name: str, vacancy_ids, error: str) -> List[Dict]:
+    return [{"file": name, "vacancy_id": vac_id, "error": error} for vac_id in vacancy_ids]
+
+
+def screen_batch(items: List[Tuple[str, object]]) -> List[List[Dict]]:
+    """
+    Выполняется в воркере: разбор пачки резюме и оценка по всем выбранным вакансиям.
+    Векторы фрагментов резюме считаются один раз на пачку, каждая вакансия оценивается
+    против всей пачки одним матричным умножением. Возвращает строки результата по каждому резюме.
+    """
+    from nlp.analyzer import analyze_resumes_vs_vacancy, embed_resumes
+    from nlp.parser_resume import parse_resume
+
+    parsed_vacancies = _worker_context["parsed"]
+    results: List[List[Dict]] = [[] for _ in items]
+    ok, parsed_resumes = [], []
+    for i, (name, source) in enumerate(items):
+        try:
+            parsed_resumes.append(parse_resume(source, multi_matcher=_worker_context["matcher"], file_name=name))
+            ok.append(i)
+        except Exception as e:
+            results[i] = _error_rows(name, parsed_vacancies, str(e))
+    if not parsed_resumes:
+        return results
+
+    embedded = embed_resumes(parsed_resumes)
+    for vac_id, vacancy in parsed_vacancies.items():
+        batch = []
+        for parsed in parsed_resumes:
+            skills_detailed = parsed["vacancy_matches"].get(vac_id, [])
+            batch.append(dict(parsed, skills=[s["skill"] for s in skills_detailed], skills_detailed=skills_detailed))
+        for i, parsed_for_vacancy, analysis in zip(ok, batch, analyze_resumes_vs_vacancy(batch, vacancy, embedded)):
+            results[i].append({
+                "file": items[i][0],
+                "vacancy_id": vac_id,
+                "vacancy_title": vacancy["title"],
+                "hard_score": analysis["hard_score"],
+                "soft_score": analysis["soft_score"],
+                "cases_score": analysis["cases_score"],
+                "total_score": analysis["total_score"],
+                "skills": parsed_for_vacancy["skills"],
+                "red_flags": analysis["red_flags"],
+                "error": None,
+            })
+    return results
+
+
+class ResultWriter:
+    """Построчная запись результатов в JSONL или CSV, flush после каждого резюме."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_csv = path.lower().endswith(".csv")
+        if os.path.exists(path):
+            self._drop_partial_tail()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._f = open(path, "a", encoding="utf-8", newline="")
+        self._csv = csv.DictWriter(self._f, fieldnames=CSV_FIELDS) if self.is_csv else None
+        if self._csv and is_new:
+            self._csv.writeheader()
+
+    def _is_complete(self, record: bytes) -> bool:
+        # запись целая, если дописана до перевода строки и разбирается
+        if not record.endswith((b"\n", b"\r")):
+            return False
+        try:
+            line = record.decode("utf-8")
+            if self.is_csv:
+                return len(next(csv.reader([line]))) == len(CSV_FIELDS)
+            json.loads(line)
+            return True
+        except (UnicodeDecodeError, ValueError, StopIteration, csv.Error):
+            return False
+
+    def _drop_partial_tail(self):
+        """
+        Обрезает файл после последней целой записи: убитый посреди записи запуск оставляет
+        недописанную строку, и продолжение дописывало бы новые строки к ней.
+        """
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = len(data)
+        while end > 0:
+            start = data.rfind(b"\n", 0, end - 1) + 1
+            if self._is_complete(data[start:end]):
+                break
+            end = start
+        if end < len(data):
+            logger.warning(f"{self.path}: отброшена недописанная запись ({len(data) - end} байт) прерванного запуска")
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+
+    def done_files(self) -> set:
+        """Файлы, уже записанные в результат (для продолжения прерванного запуска)."""
+        done = set()
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            if self.is_csv:
+                rows = csv.DictReader(f)
+            else:
+                rows = []
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        # битая строка посреди файла — файл будет разобран заново
+                        continue
+            for row in rows:
+                if row.get("file"):
+                    done.add(row["file"])
+        return done
+
+    @staticmethod
+    def _csv_value(value):
+        if isinstance(value, list):
+            value = "; ".join(value)
+        if value is None:
+            return ""
+        # одна запись — одна строка файла: по ней продолжение находит недописанную запись
+        return " ".join(value.splitlines()) if isinstance(value, str) else value
+
+    def write(self, rows: List[Dict]):
+        for row in rows:
+            if self._csv:
+                self._csv.writerow({field: self._csv_value(row.get(field)) for field in CSV_FIELDS})
+            else:
+                self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def run(input_path: str, vacancy_ids: List[int], output: str, workers: int, vacancies_file: str) -> Dict:
+    from nlp.parser_resume import warmup_models
+
+    warmup_models()
+    # файл читается только как json: sqlite-бэкенд (VACANCY_BACKEND) импортировал бы его в общую базу
+    # бота и удалил бы из каталога все вакансии, которых нет в этом файле
+    manager = VacancyManager(vacancies_file, backend="json")
+    indexes = manager.build_indexes_for(vacancy_ids)
+    missing = [vac_id for vac_id in vacancy_ids if vac_id not in indexes["parsed"]]
+    if missing:
+        raise ValueError(f"Вакансии с ID={missing} не найдены в {vacancies_file}")
+    parsed, matcher = indexes["parsed"], indexes["multi_matcher"]
+
+    writer = ResultWriter(output)
+    done = writer.done_files()
+    if done:
+        logger.info(f"Продолжение скрининга: {len(done)} резюме уже обработаны, пропускаем")
+
+    # fork (где доступен) — воркеры наследуют загруженные модели; пул, пересозданный после падения
+    # воркера, стартует через forkserver/spawn (в процессе уже работают потоки пула)
+    methods = multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context("fork") if "fork" in methods else None
+    restart_context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    counters = {"processed": 0, "errors": 0, "retried": 0}
+    pools = []
+    pending: Dict = {}  # future -> (пачка, пул)
+    retry: List = []  # пачки из одного файла после падения воркера
+
+    def _new_pool(context):
+        pools.append(ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_screen_worker,
+                                         initargs=({"parsed": parsed, "matcher": matcher},)))
+
+    def _replace_pool(pool):
+        if pools[-1] is pool:
+            logger.error("Воркер скрининга упал, пул пересоздаётся")
+            pool.shutdown(wait=False, cancel_futures=True)
+            _new_pool(restart_context)
+
+    def _collect(future):
+        batch, pool = pending.pop(future)
+        try:
+            results = future.result()
+        except BrokenProcessPool as e:
+            _replace_pool(pool)
+            if len(batch) > 1:
+                # неизвестно, на каком файле упал воркер, — разбираем пачку по одному
+                counters["retried"] += len(batch)
+                retry.extend([item] for item in batch)
+                return
+            results = [_error_rows(batch[0][0], vacancy_ids, f"воркер упал: {e}")]
+        except Exception as e:
+            logger.error(f"Ошибка пачки скрининга: {e}", exc_info=True)
+            results = [_error_rows(name, vacancy_ids, str(e)) for name, _ in batch]
+        for rows in results:
+            writer.write(rows)
+            counters["processed"] += 1
+            counters["errors"] += bool(rows and rows[0].get("error"))
+
+    def _submit(batch):
+        # ограничиваем окно отправленных задач, чтобы не держать в памяти весь архив
+        while len(pending) >= workers * 2:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                _collect(future)
+        pool = pools[-1]
+        try:
+            future = pool.submit(screen_batch, batch)
+        except BrokenProcessPool:
+            _replace_pool(pool)
+            pool = pools[-1]
+            future = pool.submit(screen_batch, batch)
+        pending[future] = (batch, pool)
+
+    start = time.perf_counter()
+    _new_pool(mp_context)
+    try:
+        batch = []
+        for name, source in iter_resumes(input_path):
+            if name in done:
+                continue
+            batch.append((name, source))
+            if len(batch) >= SCREEN_BATCH_SIZE:
+                _submit(batch)
+                batch = []
+        if batch:
+            _submit(batch)
+
+        while pending or retry:
+            while retry:
+                _submit(retry.pop(0))
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                _collect(future)
+    finally:
+        pools[-1].shutdown()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        **counters,
+        "skipped": len(done),
+        "elapsed_s": elapsed,
+        "resumes_per_sec": counters["processed"] / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Массовый скрининг резюме по вакансиям")
+    parser.add_argument("input", help="папка с резюме или архив .zip/.tar(.gz)")
+    parser.add_argument("--vacancy-id", type=int, action="append", required=True, dest="vacancy_ids",
+                        help="id вакансии из vacancies.json (можно указать несколько раз)")
+    parser.add_argument("-o", "--output", default="screening_results.jsonl", help="файл результатов .jsonl или .csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--vacancies-file", default=VACANCIES_FILE)
+    args = parser.parse_args(argv)
+
+    stats = run(args.input, args.vacancy_ids, args.output, args.workers, args.vacancies_file)
+    print(f"Обработано резюме: {stats['processed']} (пропущено ранее обработанных: {stats['skipped']}, "
+          f"ошибок: {stats['errors']})")
+    print(f"Время: {stats['elapsed_s']:.1f} с, скорость: {stats['resumes_per_sec']:.2f} резюме/с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
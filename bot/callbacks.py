@@ -6,3 +6,4 @@ VIEW_VACANCY = r"^vac_\d+$"
 BACK_TO_MENU = r"^back_to_menu$"
 BACK_TO_LIST = r"^back_to_list$"
 BACK_TO_CHOOSE = r"^back_to_choose$"
+START_INTERVIEW = r"^interview_start$"
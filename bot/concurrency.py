@@ -0,0 +1,114 @@
+# concurrency.py
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Dict, Hashable, Optional
+
+from telegram.ext import BaseUpdateProcessor
+
+from bot.analysis_executor import ANALYSIS_QUEUE_SIZE, ANALYSIS_WORKERS
+
+# Настройки конкурентной обработки (можно переопределить через .env)
+# Сколько апдейтов (разных пользователей) обрабатывается одновременно
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", 64))
+# Сколько handle_resume одновременно скачивают и анализируют файл
+RESUME_MAX_CONCURRENT = int(os.getenv("RESUME_MAX_CONCURRENT", ANALYSIS_WORKERS + ANALYSIS_QUEUE_SIZE))
+# Лимит загрузок резюме на пользователя: не больше RESUME_RATE_LIMIT за RESUME_RATE_WINDOW секунд (0 — без лимита)
+RESUME_RATE_LIMIT = int(os.getenv("RESUME_RATE_LIMIT", 3))
+RESUME_RATE_WINDOW = float(os.getenv("RESUME_RATE_WINDOW", 60))
+
+
+def update_key(update: object) -> Optional[Hashable]:
+    """Ключ упорядочивания апдейта: пользователь, иначе чат; None — апдейт без владельца"""
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return ("user", user.id)
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return ("chat", chat.id)
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Апдейты разных пользователей обрабатываются параллельно, апдейты одного пользователя —
+    строго по очереди. Место в общем лимите занимается только после того, как подошла очередь
+    пользователя, поэтому один пользователь с пачкой сообщений не блокирует остальных.
+    """
+
+    def __init__(self, max_concurrent_updates: int = UPDATE_CONCURRENCY):
+        super().__init__(max_concurrent_updates)
+        # ключ -> [lock, число апдейтов, ждущих или выполняющихся под этим lock]
+        self._user_locks: Dict[Hashable, list] = {}
+        self._pending = 0
+
+    @property
+    def pending_updates(self) -> int:
+        """Апдейты, которые ждут своей очереди или обрабатываются (для остановки без потерь)"""
+        return self._pending
+
+    async def process_update(self, update: object, coroutine: Awaitable) -> None:
+        self._pending += 1
+        try:
+            key = update_key(update)
+            if key is None:
+                await super().process_update(update, coroutine)
+                return
+
+            entry = self._user_locks.get(key)
+            if entry is None:
+                entry = self._user_locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    await super().process_update(update, coroutine)
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._user_locks.pop(key, None)
+        finally:
+            self._pending -= 1
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class RateLimiter:
+    """Скользящее окно: не больше limit событий за window секунд на ключ"""
+
+    def __init__(self, limit: int = RESUME_RATE_LIMIT, window: float = RESUME_RATE_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._events: Dict[Hashable, deque] = {}
+
+    def retry_after(self, key: Hashable) -> float:
+        """
+        Регистрирует событие и возвращает 0, если лимит не превышен,
+        иначе — сколько секунд осталось до освобождения места в окне (событие не учитывается).
+        """
+        if self.limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        events = self._events.setdefault(key, deque())
+        while events and now - events[0] >= self.window:
+            events.popleft()
+        if len(events) >= self.limit:
+            return self.window - (now - events[0])
+        events.append(now)
+        # словарь не растёт бесконечно: пустые окна неактивных пользователей убираем
+        if len(self._events) > 10000:
+            self._events = {k: v for k, v in self._events.items() if v and now - v[-1] < self.window}
+        return 0.0
+
+
+# общий лимит тяжёлых задач handle_resume и лимит загрузок на пользователя
+resume_semaphore = asyncio.Semaphore(RESUME_MAX_CONCURRENT)
+resume_rate_limiter = RateLimiter()
@@ -2,6 +2,8 @@
 
 import json
 import os
+import threading
+from bot.vacancy_db import VacancyDB
 from logs.logger import logger
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,41 +16,283 @@ os.makedirs(RESUMES_DIR, exist_ok=True)
 VACANCIES_FILE = os.path.join(VACANCIES_DIR, "vacancies.json")
 
 
+VACANCIES_RELOAD_INTERVAL = float(os.getenv("VACANCIES_RELOAD_INTERVAL", 5))
+# Где держать каталог: json — целиком в памяти, sqlite — в bot.vacancy_db (для больших выгрузок)
+VACANCY_BACKEND = os.getenv("VACANCY_BACKEND", "json")
+# Сколько вакансий показывать кнопками в меню (остальные — через поиск)
+VACANCY_MENU_LIMIT = int(os.getenv("VACANCY_MENU_LIMIT", 50))
+# sqlite: по сколько вакансий читать из базы при пересчёте индексов навыков
+VACANCY_INDEX_BATCH = int(os.getenv("VACANCY_INDEX_BATCH", 500))
+
+
 class VacancyManager:
-    """Менеджер для работы с вакансиями"""
+    """
+    Менеджер для работы с вакансиями.
+    Каталог хранится как неизменяемый снимок (список, индекс по id, нормализованные вакансии,
+    индексы навыков и матчер). Перезагрузка собирает новый снимок и подменяет его одним
+    присваиванием, поэтому обработчики никогда не видят каталог в промежуточном состоянии.
+    Список и индекс по id доступны сразу после чтения файла; нормализация, векторы и индексы
+    навыков (spaCy/numpy) строятся при первом обращении или заранее через warmup().
+    С backend="sqlite" файл инкрементально импортируется в VacancyDB, меню и поиск идут
+    запросами к базе, а полная вакансия читается только при обращении к ней по id.
+    Индексы навыков для матчера хранятся в базе и пересчитываются только для изменившихся
+    вакансий; нормализация и векторы строятся лениво — для вакансии, к которой обратились.
+    """
 
-    def __init__(self, vacancies_file=VACANCIES_FILE):
+    def __init__(self, vacancies_file=VACANCIES_FILE, backend=VACANCY_BACKEND):
         self.vacancies_file = vacancies_file
-        self._vacancies_cache = None  # Кэш для ускорения повторного доступа
+        self.db = VacancyDB() if backend == "sqlite" else None
+        self._snapshot = None  # Кэш для ускорения повторного доступа
+        self._mtime = None  # mtime файла, из которого собран текущий снимок
+        self._reload_lock = threading.Lock()
+        self._indexes_lock = threading.Lock()
+        self._watcher = None
+        self._stop_event = threading.Event()
         logger.info(f"VacancyManager инициализирован с файлом: {self.vacancies_file}")
 
-    def load_vacancies(self):
-        """Загрузка всех вакансий из файла JSON"""
-        if self._vacancies_cache is None:
-            if not os.path.exists(self.vacancies_file):
-                logger.error(f"Файл вакансий не найден: {self.vacancies_file}")
+    def _read_file(self):
+        if not os.path.exists(self.vacancies_file):
+            logger.error(f"Файл вакансий не найден: {self.vacancies_file}")
+            raise FileNotFoundError(f"Файл вакансий не найден: {self.vacancies_file}")
+        mtime = os.path.getmtime(self.vacancies_file)
+        try:
+            with open(self.vacancies_file, "r", encoding="utf-8") as f:
+                vacancies = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Ошибка при разборе JSON файла {self.vacancies_file}: {e}", exc_info=True)
+            raise
+        logger.info(f"Вакансии загружены из {self.vacancies_file}, всего {len(vacancies)} вакансий")
+        return vacancies, mtime
+
+    @staticmethod
+    def _parse_vacancy(vacancy):
+        """Нормализованная вакансия с векторами требований/обязанностей для analyze_resume_vs_vacancy"""
+        from nlp.analyzer import build_vacancy_vectors
+        from nlp.vacancy_parcer import parse_vacancy
+
+        parsed = parse_vacancy(vacancy)
+        parsed["vectors"] = build_vacancy_vectors(parsed)
+        return parsed
+
+    @classmethod
+    def _build_indexes(cls, vacancies):
+        """Нормализует вакансии и строит индексы (один раз на загрузку каталога)"""
+        from nlp.multi_matcher import MultiVacancyMatcher
+        from nlp.skill_index import build_skill_index
+
+        parsed = {v["id"]: cls._parse_vacancy(v) for v in vacancies}
+        skill_index = {vac_id: build_skill_index(p) for vac_id, p in parsed.items()}
+        logger.info(f"Индексы навыков и векторы требований построены для {len(skill_index)} вакансий")
+        return {"parsed": parsed, "skill_index": skill_index, "multi_matcher": MultiVacancyMatcher(skill_index)}
+
+    def _build_db_indexes(self):
+        """
+        sqlite: индексы навыков пересчитываются только для новых и изменившихся вакансий (без векторов),
+        остальные читаются из базы. Нормализованные вакансии заполняются лениво в get_parsed_vacancy.
+        """
+        from nlp.multi_matcher import MultiVacancyMatcher
+        from nlp.skill_index import SKILL_INDEX_VERSION, build_skill_index
+        from nlp.vacancy_parcer import parse_vacancy
+
+        stale = self.db.stale_skill_indexes(SKILL_INDEX_VERSION)
+        for start in range(0, len(stale), VACANCY_INDEX_BATCH):
+            batch = stale[start:start + VACANCY_INDEX_BATCH]
+            vacancies = self.db.get_many(vac_id for vac_id, _ in batch)
+            self.db.store_skill_indexes(
+                [(vac_id, content_hash, build_skill_index(parse_vacancy(vacancies[vac_id])))
+                 for vac_id, content_hash in batch if vac_id in vacancies],
+                SKILL_INDEX_VERSION,
+            )
+        skill_index = self.db.load_skill_indexes()
+        logger.info(f"Индексы навыков загружены для {len(skill_index)} вакансий, пересчитано {len(stale)}")
+        return {"parsed": {}, "skill_index": skill_index, "multi_matcher": MultiVacancyMatcher(skill_index)}
+
+    def build_indexes_for(self, vac_ids):
+        """
+        Нормализованные вакансии, индексы навыков и матчер только для vac_ids (офлайн-скрининг),
+        без индексов всего каталога и без изменения текущего снимка. Ненайденных id в результате нет.
+        """
+        vacancies = [vac for vac in (self.get_vacancy_by_id(vac_id) for vac_id in vac_ids) if vac is not None]
+        return self._build_indexes(vacancies)
+
+    def _catalog_indexes(self, snapshot):
+        if self.db is not None:
+            return self._build_db_indexes()
+        return self._build_indexes(snapshot["vacancies"])
+
+    def _import_file(self):
+        """sqlite: переносит изменения файла в базу; без файла работаем с уже импортированным каталогом"""
+        if not os.path.exists(self.vacancies_file):
+            if self.db.count() == 0:
+                logger.error(f"Файл вакансий не найден, каталог пуст: {self.vacancies_file}")
                 raise FileNotFoundError(f"Файл вакансий не найден: {self.vacancies_file}")
-            try:
-                with open(self.vacancies_file, "r", encoding="utf-8") as f:
-                    self._vacancies_cache = json.load(f)
-                logger.info(f"Вакансии загружены из {self.vacancies_file}, всего {len(self._vacancies_cache)} вакансий")
-            except json.JSONDecodeError as e:
-                logger.error(f"Ошибка при разборе JSON файла {self.vacancies_file}: {e}", exc_info=True)
-                raise
-        return self._vacancies_cache
+            return None
+        mtime = os.path.getmtime(self.vacancies_file)
+        self.db.import_json(self.vacancies_file)
+        return mtime
+
+    def _reload(self):
+        """Собирает новый снимок каталога и атомарно подменяет текущий"""
+        with self._reload_lock:
+            if self.db is not None:
+                # список целиком и индекс по id в памяти не держим — только кэш прочитанных вакансий
+                mtime = self._import_file()
+                snapshot = {"vacancies": None, "by_id": {}, "indexes": None}
+            else:
+                vacancies, mtime = self._read_file()
+                snapshot = {"vacancies": vacancies, "by_id": {v["id"]: v for v in vacancies}, "indexes": None}
+            # если индексы уже использовались — строим их до подмены, чтобы обработчики не ждали
+            if self._snapshot is not None and self._snapshot["indexes"] is not None:
+                snapshot["indexes"] = self._catalog_indexes(snapshot)
+            self._snapshot, self._mtime = snapshot, mtime
+        return snapshot
+
+    def _all_vacancies(self, snapshot):
+        if snapshot["vacancies"] is None:
+            snapshot["vacancies"] = list(self.db.iter_all())
+        return snapshot["vacancies"]
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._reload()
+        return snapshot
+
+    def _get_indexes(self):
+        snapshot = self._get_snapshot()
+        indexes = snapshot["indexes"]
+        if indexes is None:
+            with self._indexes_lock:
+                if snapshot["indexes"] is None:
+                    snapshot["indexes"] = self._catalog_indexes(snapshot)
+                indexes = snapshot["indexes"]
+        return indexes
+
+    def warmup(self):
+        """Строит индексы каталога заранее (из фонового прогрева после старта бота)"""
+        self._get_indexes()
+
+    def load_vacancies(self):
+        """Все вакансии каталога (список словарей)"""
+        return self._all_vacancies(self._get_snapshot())
+
+    def list_summaries(self, limit=VACANCY_MENU_LIMIT, offset=0):
+        """Страница каталога для меню: [{"id", "title", "city", "employment_type"}, ...]"""
+        snapshot = self._get_snapshot()
+        if self.db is not None:
+            return self.db.list_summaries(limit, offset)
+        return [{"id": v["id"], "title": v["title"], "city": v.get("city"), "employment_type": v.get("employment_type")}
+                for v in snapshot["vacancies"][offset:offset + limit]]
+
+    def search(self, text, city=None, employment_type=None, limit=10):
+        """
+        Поиск вакансий по названию, требованиям и обязанностям (все слова запроса, по началу слова).
+        sqlite — FTS5 с ранжированием, json — перебор каталога в памяти.
+        """
+        snapshot = self._get_snapshot()
+        if self.db is not None:
+            return self.db.search(text, city, employment_type, limit)
+        words = [w for w in text.lower().split() if w]
+        found = []
+        for v in snapshot["vacancies"]:
+            if (city and v.get("city") != city) or (employment_type and v.get("employment_type") != employment_type):
+                continue
+            haystack = " ".join([v["title"], *v.get("requirements", []), *v.get("responsibilities", [])]).lower()
+            if all(w in haystack for w in words):
+                found.append({"id": v["id"], "title": v["title"], "city": v.get("city"),
+                              "employment_type": v.get("employment_type")})
+                if len(found) >= limit:
+                    break
+        return found
+
+    def get_parsed_vacancy(self, vac_id):
+        """
+        Нормализованная вакансия (результат parse_vacancy с векторами) по id или None.
+        sqlite: строится при первом обращении к вакансии и кэшируется в текущем снимке.
+        """
+        parsed_by_id = self._get_indexes()["parsed"]
+        parsed = parsed_by_id.get(vac_id)
+        if parsed is None and self.db is not None:
+            vacancy = self.get_vacancy_by_id(vac_id)
+            if vacancy is not None:
+                parsed = parsed_by_id.setdefault(vac_id, self._parse_vacancy(vacancy))
+        return parsed
+
+    def get_skill_index(self, vac_id):
+        """Предкомпилированный индекс навыков вакансии по id или None"""
+        return self._get_indexes()["skill_index"].get(vac_id)
+
+    @property
+    def catalog_version(self):
+        """Версия текущего снимка — mtime файла, из которого он собран (совпадает в процессах-воркерах)"""
+        self._get_snapshot()
+        return self._mtime
+
+    def get_multi_matcher(self, version=None):
+        """
+        Матчер для сопоставления резюме со всеми вакансиями за один проход.
+        version — версия каталога у вызывающего (воркер анализа получает её вместо самого матчера):
+        если снимок этого процесса от другой версии файла, каталог перечитывается.
+        """
+        if version is not None and version != self.catalog_version:
+            self.check_for_changes()
+        return self._get_indexes()["multi_matcher"]
 
     def get_vacancy_by_id(self, vac_id):
         """Возвращает словарь вакансии по её id или None"""
-        vacancies = self.load_vacancies()
-        vac = next((v for v in vacancies if v["id"] == vac_id), None)
+        snapshot = self._get_snapshot()
+        vac = snapshot["by_id"].get(vac_id)
+        if vac is None and self.db is not None:
+            vac = self.db.get(vac_id)
+            if vac is not None:
+                snapshot["by_id"][vac_id] = vac
         if vac:
-            logger.info(f"Найдена вакансия ID={vac_id}: {vac['title']}")
+            logger.debug(f"Найдена вакансия ID={vac_id}: {vac['title']}")
         else:
             logger.warning(f"Вакансия с ID={vac_id} не найдена")
         return vac
 
     def refresh_cache(self):
-        """Сбрасывает кэш и перезагружает вакансии из файла"""
-        self._vacancies_cache = None
+        """Перезагружает вакансии из файла и подменяет кэш"""
         logger.info("Кэш вакансий сброшен, выполняется перезагрузка")
-        return self.load_vacancies()
+        return self._all_vacancies(self._reload())
+
+    def check_for_changes(self):
+        """Перезагружает каталог, если файл изменился на диске. Возвращает True при перезагрузке"""
+        try:
+            mtime = os.path.getmtime(self.vacancies_file)
+        except OSError:
+            return False
+        if self._mtime is not None and mtime == self._mtime:
+            return False
+        try:
+            self._reload()
+        except Exception as e:
+            # битый файл не должен ломать работу — остаёмся на предыдущем снимке
+            logger.error(f"Не удалось перезагрузить вакансии, используется прежний каталог: {e}", exc_info=True)
+            self._mtime = mtime
+            return False
+        logger.info("Каталог вакансий перезагружен после изменения файла")
+        return True
+
+    def start_watcher(self, interval=VACANCIES_RELOAD_INTERVAL):
+        """Запускает фоновый поток, который следит за mtime файла вакансий"""
+        if self._watcher is not None:
+            return
+
+        def _watch():
+            while not self._stop_event.wait(interval):
+                self.check_for_changes()
+
+        self._watcher = threading.Thread(target=_watch, name="vacancies-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Слежение за {self.vacancies_file} запущено (интервал {interval} с)")
+
+    def stop_watcher(self):
+        """Останавливает фоновое слежение за файлом"""
+        self._stop_event.set()
+        self._watcher = None
+
+
+# общий экземпляр менеджера вакансий для всего процесса
+vacancy_manager = VacancyManager()
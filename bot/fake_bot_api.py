@@ -0,0 +1,290 @@
+# fake_bot_api.py
+"""
+Локальная заглушка Telegram Bot API для проверки бота без сети.
+
+    python -m bot.fake_bot_api --port 8081 --text /start --text "Список вакансий"
+    python -m bot.fake_bot_api --document resume.pdf --callback interview_start --voice answer.ogg
+
+Бот запускается отдельно с TELEGRAM_API_BASE_URL=http://127.0.0.1:8081 (любой TELEGRAM_TOKEN),
+в режиме вебхука — ещё с BOT_MODE=webhook и WEBHOOK_URL=http://127.0.0.1:8443.
+Заглушка отвечает на методы Bot API, запоминает отправленные ботом сообщения, доставляет
+апдейты на зарегистрированный вебхук (с секретом) или через getUpdates и отдаёт файлы документов.
+"""
+
+import argparse
+import asyncio
+import email.parser
+import itertools
+import json
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from bot.http_utils import http_response, read_http_request
+from logs.logger import logger
+
+# Заголовок с секретом вебхука (как у настоящего Bot API)
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+FAKE_BOT_USER = {"id": 100000, "is_bot": True, "first_name": "FakeBot", "username": "fake_hr_bot",
+                 "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+# Методы, которые отправляют или редактируют сообщение — отвечаем объектом Message
+_MESSAGE_METHODS = {"sendMessage", "editMessageText", "sendDocument", "sendVoice", "sendAudio", "sendPhoto",
+                    "editMessageReplyMarkup"}
+
+
+def _parse_params(headers: Dict[str, str], body: bytes) -> Dict:
+    """Параметры вызова Bot API: JSON, form-urlencoded (так шлёт PTB) или multipart с файлами"""
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+    if content_type.startswith("multipart/form-data"):
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+        raw = {}
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            raw[name] = payload if part.get_filename() else payload.decode("utf-8")
+    else:
+        raw = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+    params = {}
+    for key, value in raw.items():
+        # сложные параметры (reply_markup и т.п.) и числа приходят строкой JSON
+        try:
+            params[key] = json.loads(value) if isinstance(value, str) else value
+        except ValueError:
+            params[key] = value
+    return params
+
+
+class FakeBotApi:
+    """Состояние и HTTP-сервер заглушки Bot API"""
+
+    def __init__(self):
+        self.webhook_url = ""
+        self.webhook_secret = ""
+        self.sent: List[Dict] = []  # вызовы методов отправки: {"method", "params"}
+        self.files: Dict[str, bytes] = {}
+        self._updates: asyncio.Queue = asyncio.Queue()
+        self._sent_event = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self.bot_ready = False  # бот зарегистрировал вебхук или начал getUpdates
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Fake Bot API слушает http://{host}:{port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # --- апдейты от "пользователя" ---
+
+    def _message(self, user_id: int, **fields) -> Dict:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"},
+            **fields,
+        }
+
+    def text_update(self, user_id: int, text: str) -> Dict:
+        fields = {"text": text}
+        if text.startswith("/"):
+            fields["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self._update_ids), "message": self._message(user_id, **fields)}
+
+    def document_update(self, user_id: int, file_name: str, data: bytes) -> Dict:
+        file_id = f"doc{len(self.files) + 1}"
+        self.files[file_id] = data
+        document = {"file_id": file_id, "file_unique_id": file_id, "file_name": file_name, "file_size": len(data)}
+        return {"update_id": next(self._update_ids), "message": self._message(user_id, document=document)}
+
+    def voice_update(self, user_id: int, data: bytes, duration: int = 5) -> Dict:
+        file_id = f"voice{len(self.files) + 1}"
+        self.files[file_id] = data
+        voice = {"file_id": file_id, "file_unique_id": file_id, "duration": duration, "mime_type": "audio/ogg",
+                 "file_size": len(data)}
+        return {"update_id": next(self._update_ids), "message": self._message(user_id, voice=voice)}
+
+    def callback_update(self, user_id: int, data: str) -> Dict:
+        return {"update_id": next(self._update_ids), "callback_query": {
+            "id": str(next(self._message_ids)), "from": self._message(user_id)["from"], "chat_instance": "fake",
+            "data": data, "message": {**self._message(FAKE_BOT_USER["id"], text="меню"),
+                                      "chat": {"id": user_id, "type": "private"}},
+        }}
+
+    async def push_update(self, update: Dict) -> int:
+        """
+        Доставляет апдейт боту: POST на вебхук (с секретом), если он зарегистрирован,
+        иначе — в очередь getUpdates. Возвращает HTTP-статус вебхука (200 для getUpdates).
+        """
+        if not self.webhook_url:
+            await self._updates.put(update)
+            return 200
+        url = urlsplit(self.webhook_url)
+        body = json.dumps(update).encode("utf-8")
+        headers = [f"POST {url.path or '/'} HTTP/1.1", f"Host: {url.netloc}", "Content-Type: application/json",
+                   f"Content-Length: {len(body)}", "Connection: close"]
+        if self.webhook_secret:
+            headers.append(f"{SECRET_HEADER}: {self.webhook_secret}")
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        try:
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            status_line = (await reader.readline()).decode("latin-1")
+            return int(status_line.split(" ")[1])
+        finally:
+            writer.close()
+
+    async def wait_for_sent(self, count: int, timeout: float = 10.0) -> List[Dict]:
+        """Ждёт, пока бот отправит не меньше count сообщений, и возвращает их"""
+        deadline = time.monotonic() + timeout
+        while len(self.sent) < count:
+            self._sent_event.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._sent_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.sent
+
+    # --- Bot API ---
+
+    async def call(self, method: str, params: Dict):
+        if method in ("setWebhook", "getUpdates"):
+            self.bot_ready = True
+        if method == "getMe":
+            return FAKE_BOT_USER
+        if method == "setWebhook":
+            self.webhook_url = params.get("url", "")
+            self.webhook_secret = params.get("secret_token", "") or ""
+            logger.info(f"Fake Bot API: вебхук {self.webhook_url or 'снят'}")
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = self.webhook_secret = ""
+            return True
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": 0}
+        if method == "getUpdates":
+            return await self._get_updates(float(params.get("timeout", 0) or 0))
+        if method == "getFile":
+            file_id = params["file_id"]
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.files.get(file_id, b"")),
+                    "file_path": f"documents/{file_id}"}
+        if method in _MESSAGE_METHODS:
+            self.sent.append({"method": method, "params": params})
+            self._sent_event.set()
+            chat_id = params.get("chat_id", 0)
+            return {**self._message(FAKE_BOT_USER["id"], text=str(params.get("text", ""))),
+                    "chat": {"id": chat_id, "type": "private"}, "from": FAKE_BOT_USER}
+        # answerCallbackQuery, setMyCommands, sendChatAction и т.п.
+        return True
+
+    async def _get_updates(self, timeout: float) -> List[Dict]:
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self._updates.get(), min(timeout, 1.0) or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while not self._updates.empty():
+            updates.append(self._updates.get_nowait())
+        return updates
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await read_http_request(reader, max_body=50 * 1024 * 1024)
+            if request is None:
+                writer.write(http_response("400 Bad Request"))
+                return
+            method, path, headers, body = request
+            segments = path.split("?")[0].strip("/").split("/")
+            if method == "GET" and len(segments) >= 3 and segments[0] == "file":
+                # /file/bot<token>/documents/<file_id>
+                data = self.files.get(segments[-1])
+                writer.write(http_response("200 OK", data, "application/octet-stream") if data is not None
+                             else http_response("404 Not Found"))
+            elif len(segments) == 2 and segments[0].startswith("bot"):
+                result = await self.call(segments[1], _parse_params(headers, body))
+                payload = json.dumps({"ok": True, "result": result}, ensure_ascii=False).encode("utf-8")
+                writer.write(http_response("200 OK", payload))
+            else:
+                writer.write(http_response("404 Not Found"))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Fake Bot API: ошибка обработки запроса: {e}", exc_info=True)
+        finally:
+            writer.close()
+
+
+async def run_scenario(port: int, user_id: int, texts: List[str], documents: List[str], wait: float,
+                       callbacks: List[str] = (), voices: List[str] = ()) -> int:
+    """Поднимает заглушку, отправляет боту сообщения, документы, нажатия кнопок и голосовые и печатает ответы"""
+    api = FakeBotApi()
+    await api.start(port=port)
+    try:
+        if texts or documents or callbacks or voices:
+            print(f"Ожидание бота ({wait:.0f} с): TELEGRAM_API_BASE_URL=http://127.0.0.1:{port}")
+            # в режиме вебхука бот сначала регистрирует адрес; при polling апдейты уйдут в getUpdates
+            deadline = time.monotonic() + wait
+            while not api.bot_ready and time.monotonic() < deadline:
+                await asyncio.sleep(0.2)
+        updates = [api.text_update(user_id, text) for text in texts]
+        for path in documents:
+            with open(path, "rb") as f:
+                updates.append(api.document_update(user_id, path.rsplit("/", 1)[-1], f.read()))
+        updates += [api.callback_update(user_id, data) for data in callbacks]
+        for path in voices:
+            with open(path, "rb") as f:
+                updates.append(api.voice_update(user_id, f.read()))
+        for update in updates:
+            status = await api.push_update(update)
+            print(f"-> update {update['update_id']}: HTTP {status}")
+            before = len(api.sent)
+            await api.wait_for_sent(before + 1, timeout=wait)
+        for item in api.sent:
+            print(f"<- {item['method']}: {item['params'].get('text') or item['params'].get('caption', '')}")
+        return 0 if len(api.sent) >= len(updates) else 1
+    finally:
+        await api.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальная заглушка Telegram Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--text", action="append", default=[], help="текст сообщения пользователя (можно несколько)")
+    parser.add_argument("--document", action="append", default=[], help="путь к файлу резюме для отправки")
+    parser.add_argument("--callback", action="append", default=[], help="callback_data нажатой кнопки (interview_start)")
+    parser.add_argument("--voice", action="append", default=[], help="путь к OGG-файлу голосового ответа")
+    parser.add_argument("--wait", type=float, default=30, help="сколько ждать бота и его ответов, с")
+    parser.add_argument("--serve", action="store_true", help="просто работать как сервер до Ctrl+C")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        async def _serve():
+            api = FakeBotApi()
+            await api.start(port=args.port)
+            await asyncio.Event().wait()
+        try:
+            asyncio.run(_serve())
+        except KeyboardInterrupt:
+            pass
+        return 0
+    return asyncio.run(run_scenario(args.port, args.user_id, args.text, args.document, args.wait,
+                                    args.callback, args.voice))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# http_utils.py
+
+import asyncio
+from typing import Dict, Optional, Tuple
+
+# Предел тела запроса по умолчанию (апдейт Telegram — единицы КБ)
+MAX_BODY_BYTES = 1024 * 1024
+
+
+async def read_http_request(reader: asyncio.StreamReader,
+                            max_body: int = MAX_BODY_BYTES) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """
+    Читает один HTTP/1.1 запрос: (метод, путь, заголовки в нижнем регистре, тело).
+    None — соединение закрыто или запрос некорректен.
+    """
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    parts = request_line.split(" ")
+    if len(parts) != 3:
+        return None
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0) or 0)
+    if length > max_body:
+        return None
+    body = await reader.readexactly(length) if length else b""
+    return parts[0].upper(), parts[1], headers, body
+
+
+def http_response(status: str, body: bytes = b"", content_type: str = "application/json") -> bytes:
+    return (
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+    )
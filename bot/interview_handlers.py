@@ -0,0 +1,60 @@
+# interview_handlers.py
+
+import time
+from bot.data_loader import vacancy_manager
+from logs.logger import logger
+from voice.interview import interview_engine
+from voice.stt import STTError
+
+
+async def start_interview(update, context):
+    """Кнопка «Начать интервью» после успешного анализа резюме"""
+    query = update.callback_query
+    await query.answer()
+    user_id = query.from_user.id
+
+    try:
+        vac_id = context.user_data.get("selected_vacancy_id")
+        vac = vacancy_manager.get_vacancy_by_id(vac_id) if vac_id is not None else None
+        if not vac:
+            await query.message.reply_text("⚠ Вакансия не выбрана. Сначала выберите вакансию и загрузите резюме.")
+            return
+
+        await query.edit_message_reply_markup(reply_markup=None)
+        await query.message.reply_text("🎙 Начинаем интервью. Отвечайте на вопросы голосовыми сообщениями.")
+        await interview_engine.start(context.bot, query.message.chat_id, user_id, vac,
+                                     context.user_data.get("last_analysis"), store=context.user_data)
+
+    except Exception as e:
+        logger.error(f"Ошибка при запуске интервью пользователя {user_id}: {e}", exc_info=True)
+        await query.message.reply_text("Произошла ошибка при запуске интервью. Попробуйте снова.")
+
+
+async def handle_voice_answer(update, context):
+    """Голосовой ответ кандидата во время интервью"""
+    # момент получения ответа — от него считается задержка до следующего вопроса
+    received_at = time.perf_counter()
+    message = update.message
+    user_id = message.from_user.id
+
+    # после перезапуска бота сессия поднимается из сохранённого user_data
+    if not interview_engine.restore(user_id, context.user_data):
+        await message.reply_text("Голосовые ответы принимаются во время интервью. "
+                                 "Выберите вакансию и загрузите резюме, чтобы его пройти.")
+        return
+
+    try:
+        audio = message.voice or message.audio
+        result = await interview_engine.handle_answer(context.bot, message.chat_id, user_id, audio.file_id,
+                                                      received_at, store=context.user_data)
+        if result and result["finished"]:
+            # ответы сохраняются для отчёта HR
+            context.user_data["interview_history"] = result["history"]
+            logger.info(f"Пользователь {user_id} завершил интервью")
+
+    except STTError as e:
+        logger.warning(f"Не удалось распознать ответ пользователя {user_id}: {e}")
+        await message.reply_text("Не удалось распознать ответ. Пожалуйста, запишите его ещё раз.")
+    except Exception as e:
+        logger.error(f"Ошибка при обработке ответа интервью пользователя {user_id}: {e}", exc_info=True)
+        await message.reply_text("Произошла ошибка при обработке ответа. Попробуйте записать его ещё раз.")
@@ -1,24 +1,39 @@
 # main.py
+import asyncio
 import os
+import threading
+import time
 from dotenv import load_dotenv
+
+# Загрузка .env до импорта модулей бота — они читают настройки при импорте
+load_dotenv()
+
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
 from bot.utils import list_vacancies
 from logs.logger import logger
-from bot.data_loader import VacancyManager
-from bot.callbacks import SELECT_VACANCY, VIEW_VACANCY, BACK_TO_MENU
+from bot.data_loader import vacancy_manager
+from bot.callbacks import SELECT_VACANCY, VIEW_VACANCY, BACK_TO_MENU, START_INTERVIEW
 from bot.menu_handlers import start_menu, handle_main_menu_message, back_to_menu
 
-from bot.vacancy_handlers import choose_vacancy, vacancy_selected, show_vacancy_details, back_handler
+from bot.vacancy_handlers import choose_vacancy, vacancy_selected, show_vacancy_details, back_handler, find_vacancy
 from bot.resume_handlers import handle_resume
-
-# Загрузка токена из .env
-load_dotenv()
+from bot.interview_handlers import start_interview, handle_voice_answer
+from bot.resume_store import resume_store
+from bot.analysis_executor import analysis_executor, current_rss_mb
+from bot.concurrency import PerUserUpdateProcessor
+from bot.persistence import PERSISTENCE_PATH, SQLitePersistence
+from bot.metrics import metrics, start_metrics_server, stats_command
+from bot.webhook import BOT_MODE, TELEGRAM_API_BASE_URL, run_webhook
+from llm.llm_interface import llm_client
+from nlp.parser_resume import warmup_models
+from voice.interview import interview_engine
+from voice.stt import STT_PRELOAD, stt_service
+from voice.tts import tts_service
+
+# Токен из .env
 TOKEN = os.getenv("TELEGRAM_TOKEN")
 
-# экземпляр менеджера вакансий
-vacancy_manager = VacancyManager()
-
 
 async def handle_message(update, context):
     """
@@ -32,14 +47,15 @@ async def handle_message(update, context):
         if text == "Пройти интервью":
             await choose_vacancy(update, context)
         elif text == "Список вакансий":
-            vacancies = vacancy_manager.load_vacancies()
+            vacancies = vacancy_manager.list_summaries()
             await list_vacancies(update, context, vacancies)
         elif text == "Помощь":
             await update.message.reply_text(
                 "Инструкции по использованию бота:\n"
                 "- Выберите вакансию.\n"
                 "- Загрузите резюме.\n"
-                "- Пройдите голосовое интервью (если резюме подходит)."
+                "- Пройдите голосовое интервью (если резюме подходит).\n"
+                "- Поиск вакансии: /find аналитик sql"
             )
         elif text == "О боте":
             await update.message.reply_text(
@@ -54,13 +70,122 @@ async def handle_message(update, context):
         await update.message.reply_text("Произошла ошибка при обработке вашего сообщения. Попробуйте снова.")
 
 
+def warmup_models_and_indexes():
+    """spaCy модели и индексы каталога (нормализованные вакансии, векторы, индексы навыков, матчер)"""
+    timings = warmup_models()
+    for lang, seconds in timings.items():
+        logger.info(f"Модель spaCy '{lang}' загружена за {seconds:.1f} с")
+    vacancy_manager.warmup()
+    logger.info(f"RSS основного процесса после прогрева: {current_rss_mb():.0f} МБ")
+
+
+def warmup_before_polling():
+    """
+    pre-fork (ANALYSIS_PREFORK=1): модели и индексы грузятся, а воркеры анализа создаются через fork
+    в главном потоке до запуска polling. Кроме главного, в этот момент работает только поток-писатель
+    логов (QueueListener, стартует при импорте logs.logger): дочерний процесс не пользуется его очередью
+    и обработчиками, а запускает свои (register_at_fork в logs/logger.py); блокировки обработчиков
+    logging после fork переинициализирует сам. Потоки слежения за каталогом, очистки и прогрева
+    стартуют позже. Воркеры наследуют модели и индексы.
+    """
+    start = time.perf_counter()
+    try:
+        warmup_models_and_indexes()
+        analysis_executor.start()
+    except Exception as e:
+        # воркеры создадутся при первом резюме, модели и индексы загрузятся там же
+        logger.error(f"Ошибка прогрева: {e}", exc_info=True)
+    logger.info(f"Прогрев до запуска бота завершён за {time.perf_counter() - start:.1f} с")
+
+
+def warmup_in_background():
+    """
+    Прогрев после старта бота (по умолчанию, без pre-fork): меню и /start отвечают сразу, а в фоне
+    загружаются модели и индексы, стартуют воркеры анализа (forkserver/spawn, модели загружают сами),
+    затем Whisper.
+    """
+    start = time.perf_counter()
+    try:
+        if not analysis_executor.prefork:
+            warmup_models_and_indexes()
+            analysis_executor.start()
+    except Exception as e:
+        logger.error(f"Ошибка фонового прогрева: {e}", exc_info=True)
+    # Whisper грузим после fork воркеров анализа: им модель не нужна, а fork с потоками torch небезопасен
+    if STT_PRELOAD:
+        try:
+            stt_service.warmup()
+        except Exception as e:
+            # без модели работает всё, кроме голосового интервью; повторная попытка — на первом ответе
+            logger.error(f"Не удалось загрузить модель распознавания речи: {e}", exc_info=True)
+    logger.info(f"Фоновый прогрев завершён за {time.perf_counter() - start:.1f} с")
+
+
+async def on_startup(app):
+    """Запуск HTTP-эндпоинта метрик в event loop бота и фонового прогрева"""
+    metrics.register_gauge("analysis_queue_depth", lambda: analysis_executor.in_flight)
+    metrics.register_gauge("stt_queue_depth", lambda: stt_service.queue_depth)
+    metrics.register_gauge("interview_sessions", lambda: len(interview_engine.sessions))
+    if isinstance(app.persistence, SQLitePersistence):
+        metrics.register_gauge("persistence_pending_writes", lambda: app.persistence.pending_writes)
+    if STT_PRELOAD or not analysis_executor.prefork:
+        threading.Thread(target=warmup_in_background, name="warmup", daemon=True).start()
+    try:
+        app.bot_data["metrics_server"] = await start_metrics_server()
+    except OSError as e:
+        logger.error(f"Не удалось запустить эндпоинт метрик: {e}", exc_info=True)
+
+
+async def on_shutdown(app):
+    server = app.bot_data.get("metrics_server")
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    await llm_client.close()
+    await interview_engine.close()
+    stt_service.shutdown()
+    tts_service.shutdown()
+
+
 if __name__ == "__main__":
     try:
-        app = ApplicationBuilder().token(TOKEN).build()
+        # Каталог читается до polling (sqlite — импорт изменений файла)
+        vacancy_manager.list_summaries()
+        if analysis_executor.prefork:
+            warmup_before_polling()
+        # Горячая перезагрузка vacancies.json (поток стартует после fork воркеров анализа)
+        vacancy_manager.start_watcher()
+        # Очистка старых резюме по RESUME_RETENTION_DAYS (если срок задан)
+        resume_store.start_gc_worker()
+        # Лимиты кэша озвучки вопросов (TTS_CACHE_MAX_MB, TTS_CACHE_MAX_AGE_DAYS)
+        tts_service.start_gc_worker()
+
+        # Апдейты разных пользователей — параллельно, одного пользователя — по порядку
+        builder = (
+            ApplicationBuilder()
+            .token(TOKEN)
+            .concurrent_updates(PerUserUpdateProcessor())
+            .post_init(on_startup)
+            .post_shutdown(on_shutdown)
+        )
+        if PERSISTENCE_PATH:
+            # выбранная вакансия и состояние диалога переживают перезапуск бота
+            builder = builder.persistence(SQLitePersistence())
+        if TELEGRAM_API_BASE_URL:
+            # локальный Bot API (например, python -m bot.fake_bot_api)
+            base = TELEGRAM_API_BASE_URL.rstrip("/")
+            builder = builder.base_url(f"{base}/bot").base_file_url(f"{base}/file/bot")
+        app = builder.build()
 
         # Команда /start
         app.add_handler(CommandHandler("start", start_menu))
 
+        # Команда /find <слова> — поиск по названию, требованиям и обязанностям
+        app.add_handler(CommandHandler("find", find_vacancy))
+
+        # Команда /stats — метрики пайплайна (только для ADMIN_IDS)
+        app.add_handler(CommandHandler("stats", stats_command))
+
         # Обработка текстовых сообщений главного меню
         app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_main_menu_message))
 
@@ -68,13 +193,25 @@ if __name__ == "__main__":
         app.add_handler(CallbackQueryHandler(vacancy_selected, pattern=SELECT_VACANCY))
         app.add_handler(CallbackQueryHandler(show_vacancy_details, pattern=VIEW_VACANCY))
         app.add_handler(CallbackQueryHandler(back_to_menu, pattern=BACK_TO_MENU))
+        app.add_handler(CallbackQueryHandler(start_interview, pattern=START_INTERVIEW))
         app.add_handler(CallbackQueryHandler(back_handler, pattern=r"^back_to_"))
 
         # Обработка загруженных документов (резюме)
         app.add_handler(MessageHandler(filters.Document.ALL, handle_resume))
 
-        logger.info("Бот успешно запущен.")
-        app.run_polling()
+        # Голосовые ответы на вопросы интервью
+        app.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, handle_voice_answer))
+
+        if BOT_MODE == "webhook":
+            logger.info("Бот успешно запущен в режиме вебхука.")
+            asyncio.run(run_webhook(app))
+        else:
+            logger.info("Бот успешно запущен.")
+            app.run_polling()
 
     except Exception as e:
         logger.critical(f"Критическая ошибка при запуске бота: {e}", exc_info=True)
+    finally:
+        vacancy_manager.stop_watcher()
+        resume_store.stop_gc_worker()
+        analysis_executor.shutdown()
@@ -4,12 +4,9 @@ from telegram import ReplyKeyboardMarkup, KeyboardButton
 
 from bot.utils import list_vacancies
 from bot.vacancy_handlers import choose_vacancy
-from bot.data_loader import VacancyManager
+from bot.data_loader import vacancy_manager
 from logs.logger import logger
 
-# экземпляр VacancyManager
-vacancy_manager = VacancyManager()
-
 
 async def start_menu(update, context):
     """Приветствие при первом запуске"""
@@ -64,15 +61,16 @@ async def handle_main_menu_message(update, context):
         if text == "Пройти интервью":
             await choose_vacancy(update, context)
         elif text == "Список вакансий":
-            # используем vacancy_manager вместо прямого вызова load_vacancies
-            vacancies = vacancy_manager.load_vacancies()
+            # в меню — только названия первой страницы каталога, остальное через /find
+            vacancies = vacancy_manager.list_summaries()
             await list_vacancies(update, context, vacancies)
         elif text == "Помощь":
             await update.message.reply_text(
                 "Инструкции по использованию бота:\n"
                 "- Выберите вакансию.\n"
                 "- Загрузите резюме.\n"
-                "- Пройдите голосовое интервью (если резюме подходит)."
+                "- Пройдите голосовое интервью (если резюме подходит).\n"
+                "- Поиск вакансии: /find аналитик sql"
             )
         elif text == "О боте":
             await update.message.reply_text(
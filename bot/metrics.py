@@ -0,0 +1,196 @@
+# metrics.py
+
+import asyncio
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from bot.http_utils import http_response, read_http_request
+from logs.logger import logger
+
+# Порт HTTP-эндпоинта метрик на localhost (0 — не запускать)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+# Telegram id администраторов, которым доступна команда /stats (через запятую)
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x}
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Границы корзин безразмерных отношений (например, RTF распознавания речи)
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    Гистограмма задержек одной стадии: кумулятивные корзины для Prometheus
+    и окно последних наблюдений для перцентилей в /stats.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window: int = 1000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.total += value
+            self.count += 1
+            self._recent.append(value)
+
+    def percentiles(self, qs=(0.5, 0.95, 0.99)) -> Dict[float, float]:
+        with self._lock:
+            values = sorted(self._recent)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in qs}
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик пайплайна резюме: гистограммы задержек по стадиям, отдельные гистограммы
+    величин не в секундах, счётчики и gauge-функции.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.value_histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram()
+        hist.observe(seconds)
+
+    def observe_value(self, name: str, value: float, buckets=RATIO_BUCKETS):
+        """Наблюдение величины не в секундах — отдельная гистограмма ai_hr_<name>, не стадия."""
+        with self._lock:
+            hist = self.value_histograms.get(name)
+            if hist is None:
+                hist = self.value_histograms[name] = Histogram(buckets)
+        hist.observe(value)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Замер длительности блока кода как стадии stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, func: Callable[[], float]):
+        """Gauge, значение которого считывается в момент запроса метрик."""
+        self.gauges[name] = func
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus."""
+        lines: List[str] = ["# TYPE ai_hr_stage_seconds histogram"]
+        for stage, hist in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'ai_hr_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'ai_hr_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'ai_hr_stage_seconds_sum{{stage="{stage}"}} {hist.total}')
+            lines.append(f'ai_hr_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+        for name, hist in sorted(self.value_histograms.items()):
+            lines.append(f"# TYPE ai_hr_{name} histogram")
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'ai_hr_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'ai_hr_{name}_bucket{{le="+Inf"}} {hist.count}')
+            lines.append(f"ai_hr_{name}_sum {hist.total}")
+            lines.append(f"ai_hr_{name}_count {hist.count}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE ai_hr_{name}_total counter")
+            lines.append(f"ai_hr_{name}_total {value}")
+        for name, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            lines.append(f"# TYPE ai_hr_{name} gauge")
+            lines.append(f"ai_hr_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def render_stats(self) -> str:
+        """Краткая сводка для команды /stats: p50/p95/p99 по стадиям, счётчики и gauge отдельными разделами."""
+        lines = ["📈 Задержки по стадиям (p50 / p95 / p99, с):"]
+        for stage, hist in sorted(self.histograms.items()):
+            p = hist.percentiles()
+            if p:
+                lines.append(f"- {stage}: {p[0.5]:.2f} / {p[0.95]:.2f} / {p[0.99]:.2f} (n={hist.count})")
+        if len(lines) == 1:
+            lines.append("- пока нет данных")
+        if self.value_histograms:
+            lines.append("\n📐 Величины (p50 / p95 / p99):")
+            for name, hist in sorted(self.value_histograms.items()):
+                p = hist.percentiles()
+                if p:
+                    lines.append(f"- {name}: {p[0.5]:.2f} / {p[0.95]:.2f} / {p[0.99]:.2f} (n={hist.count})")
+        if self.counters:
+            lines.append("\n🔢 Счётчики:")
+            lines.extend(f"- {name}: {value}" for name, value in sorted(self.counters.items()))
+        gauges = []
+        for name, func in sorted(self.gauges.items()):
+            try:
+                gauges.append(f"- {name}: {func()}")
+            except Exception:
+                continue
+        if gauges:
+            lines.append("\n📊 Текущие значения:")
+            lines.extend(gauges)
+        return "\n".join(lines)
+
+
+# общий реестр метрик процесса
+metrics = MetricsRegistry()
+
+
+async def _handle_metrics_request(reader, writer):
+    try:
+        request = await read_http_request(reader)
+        path = request[1].split("?")[0] if request else ""
+        if path == "/metrics":
+            writer.write(http_response("200 OK", metrics.render_prometheus().encode("utf-8"), PROMETHEUS_CONTENT_TYPE))
+        else:
+            writer.write(http_response("404 Not Found", b"not found\n", PROMETHEUS_CONTENT_TYPE))
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1") -> Optional[asyncio.AbstractServer]:
+    """Запускает HTTP-эндпоинт /metrics на localhost в текущем event loop."""
+    if not port:
+        return None
+    server = await asyncio.start_server(_handle_metrics_request, host, port)
+    logger.info(f"Эндпоинт метрик: http://{host}:{port}/metrics")
+    return server
+
+
+async def stats_command(update, context):
+    """Команда /stats — сводка метрик, только для администраторов из ADMIN_IDS"""
+    user_id = update.effective_user.id if update.effective_user else None
+    if user_id not in ADMIN_IDS:
+        logger.warning(f"Пользователь {user_id} запросил /stats без прав администратора")
+        return
+    await update.message.reply_text(metrics.render_stats())
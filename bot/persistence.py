@@ -0,0 +1,256 @@
+# persistence.py
+
+import asyncio
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from logs.logger import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Файл состояния диалогов (пусто — без сохранения между перезапусками)
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", os.path.join(BASE_DIR, "data", "state", "bot_state.sqlite"))
+# Как часто PTB передаёт изменённые user_data/chat_data в persistence, секунды
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", 5))
+# Изменения копятся и пишутся одной транзакцией: через FLUSH_DELAY секунд или по достижении BATCH_SIZE
+PERSISTENCE_FLUSH_DELAY = float(os.getenv("PERSISTENCE_FLUSH_DELAY", 1))
+PERSISTENCE_BATCH_SIZE = int(os.getenv("PERSISTENCE_BATCH_SIZE", 500))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_data (
+    id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (name, key)
+);
+"""
+
+# Ключ отложенной записи: (таблица, id) для user_data/chat_data, ("conversations", (name, key)) для диалогов
+_PendingKey = Tuple[str, object]
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранение user_data/chat_data и состояний ConversationHandler построчно в SQLite.
+    Данные пользователя читаются из базы при первом его апдейте после старта (а не все сразу),
+    изменения копятся в памяти и пишутся пачкой в одной транзакции в фоновом потоке —
+    в отличие от PicklePersistence, объём записи не зависит от общего числа пользователей.
+    bot_data и callback_data не сохраняются (в bot_data лежат объекты процесса).
+    """
+
+    def __init__(self, path: str = PERSISTENCE_PATH, update_interval: float = PERSISTENCE_UPDATE_INTERVAL,
+                 flush_delay: float = PERSISTENCE_FLUSH_DELAY, batch_size: int = PERSISTENCE_BATCH_SIZE):
+        super().__init__(store_data=PersistenceInput(bot_data=False, callback_data=False),
+                         update_interval=update_interval)
+        self.path = path
+        self.flush_delay = flush_delay
+        self.batch_size = batch_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending: Dict[_PendingKey, Optional[bytes]] = {}  # None — удалить строку
+        self._loaded = {"user_data": set(), "chat_data": set()}
+        self._loading: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # запись идёт из потоков asyncio.to_thread, доступ к соединению — под _db_lock
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    # --- чтение ---
+
+    def _load_row(self, table: str, row_id: int) -> Optional[Dict]:
+        with self._db_lock:
+            row = self._connect().execute(f"SELECT data FROM {table} WHERE id = ?", (row_id,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _load_conversations(self, name: str) -> Dict:
+        with self._db_lock:
+            rows = self._connect().execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def _refresh(self, table: str, row_id: int, data: Dict):
+        """
+        Подгружает строку в data один раз. Строка считается загруженной только после успешного
+        чтения: при ошибке следующий апдейт пользователя прочитает её снова. Одновременные
+        апдейты одного пользователя дожидаются одного чтения.
+        """
+        if row_id in self._loaded[table]:
+            return
+        key = (table, row_id)
+        load = self._loading.get(key)
+        if load is None:
+            load = self._loading[key] = asyncio.ensure_future(self._load_into(table, row_id, data))
+            load.add_done_callback(lambda _: self._loading.pop(key, None))
+        # shield: отмена одного апдейта не должна прерывать чтение для остальных
+        await asyncio.shield(load)
+
+    async def _load_into(self, table: str, row_id: int, data: Dict):
+        # свежие изменения этого процесса ещё могут ждать записи — они новее, чем строка в базе
+        if (table, row_id) not in self._pending:
+            stored = await asyncio.to_thread(self._load_row, table, row_id)
+            if stored:
+                for key, value in stored.items():
+                    data.setdefault(key, value)
+        self._loaded[table].add(row_id)
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        # пользователи подгружаются лениво в refresh_user_data
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return await asyncio.to_thread(self._load_conversations, name)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        await self._refresh("user_data", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        await self._refresh("chat_data", chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    # --- запись ---
+
+    def _stage(self, key: _PendingKey, value: Optional[bytes]):
+        self._pending[key] = value
+        # одна фоновая задача записи за раз: пачки не обгоняют друг друга
+        if self._flush_task is None or self._flush_task.done():
+            delay = 0 if len(self._pending) >= self.batch_size else self.flush_delay
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop(delay))
+
+    async def _flush_loop(self, delay: float):
+        await asyncio.sleep(delay)
+        while self._pending:
+            if not await self._write_pending():
+                # ошибка записи: пачка вернулась в очередь, следующая попытка — при следующем изменении
+                return
+            if self._pending and len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.flush_delay)
+
+    def _write_batch(self, batch: Dict[_PendingKey, Optional[bytes]]):
+        now = time.time()
+        rows = {"user_data": [], "chat_data": []}
+        deletes = {"user_data": [], "chat_data": []}
+        conversations, conversation_deletes = [], []
+        for (table, key), value in batch.items():
+            if table == "conversations":
+                if value is None:
+                    conversation_deletes.append(key)
+                else:
+                    conversations.append((*key, value))
+            elif value is None:
+                deletes[table].append((key,))
+            else:
+                rows[table].append((key, value, now))
+
+        with self._db_lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                for table in ("user_data", "chat_data"):
+                    conn.executemany(f"INSERT OR REPLACE INTO {table}(id, data, updated_at) VALUES (?, ?, ?)",
+                                     rows[table])
+                    conn.executemany(f"DELETE FROM {table} WHERE id = ?", deletes[table])
+                conn.executemany("INSERT OR REPLACE INTO conversations(name, key, state) VALUES (?, ?, ?)",
+                                 conversations)
+                conn.executemany("DELETE FROM conversations WHERE name = ? AND key = ?", conversation_deletes)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def _write_pending(self) -> bool:
+        if not self._pending:
+            return True
+        batch, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write_batch, batch)
+            logger.debug(f"Состояние диалогов сохранено: {len(batch)} записей")
+            return True
+        except Exception as e:
+            # возвращаем пачку в очередь, не затирая более свежие изменения
+            for key, value in batch.items():
+                self._pending.setdefault(key, value)
+            logger.error(f"Не удалось сохранить состояние диалогов ({len(batch)} записей): {e}", exc_info=True)
+            return False
+
+    @property
+    def pending_writes(self) -> int:
+        """Изменения, ещё не записанные в базу"""
+        return len(self._pending)
+
+    def _stage_row(self, table: str, row_id: int, data: Dict):
+        # PTB отмечает для записи каждого пользователя апдейта, даже если строка не прочиталась
+        # (ошибка чтения, апдейт без обработчика) — такой словарь не полный и затёр бы строку в базе
+        if row_id not in self._loaded[table]:
+            logger.debug(f"Состояние {table} {row_id} не загружено из базы, запись пропущена")
+            return
+        # сериализуем сразу — обработчики могут менять словарь до фактической записи
+        self._stage((table, row_id), pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        self._stage_row("user_data", user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        self._stage_row("chat_data", chat_id, data)
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        state = None if new_state is None else pickle.dumps(new_state, pickle.HIGHEST_PROTOCOL)
+        self._stage(("conversations", (name, json.dumps(list(key)))), state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded["user_data"].discard(user_id)
+        self._stage(("user_data", user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._loaded["chat_data"].discard(chat_id)
+        self._stage(("chat_data", chat_id), None)
+
+    async def flush(self) -> None:
+        """Вызывается PTB при остановке: дописывает все накопленные изменения"""
+        # дожидаемся текущей фоновой записи (не отменяем — пачка уже может писаться в потоке)
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self._write_pending()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        logger.info(f"Состояние диалогов сохранено в {self.path}")
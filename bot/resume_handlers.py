@@ -1,19 +1,32 @@
 # resume_handlers.py
 
-import os
-import time
-from bot.data_loader import RESUMES_DIR, VacancyManager
+import asyncio
+import logging
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.analysis_executor import analysis_executor, QueueFullError, AnalysisTimeoutError, AnalysisWorkerError
+from bot.concurrency import resume_rate_limiter, resume_semaphore
+from bot.data_loader import vacancy_manager
+from bot.metrics import metrics
+from bot.resume_store import resume_store
 from logs.logger import logger
 
-from nlp.analyzer import analyze_resume_vs_vacancy
-from nlp.parser_resume import parse_resume
-from nlp.vacancy_parcer import parse_vacancy
+# фоновые задачи архивации (держим ссылки, чтобы их не собрал GC до завершения)
+_archive_tasks = set()
 
-# экземпляр менеджера вакансий
-vacancy_manager = VacancyManager()
 
-# Убедимся, что папка для резюме существует
-os.makedirs(RESUMES_DIR, exist_ok=True)
+async def _archive_resume(data, file_name, user_id, username, vacancy_id):
+    """Сохраняет резюме в хранилище в фоне, не задерживая анализ"""
+    try:
+        sha256 = await asyncio.to_thread(resume_store.put, data, file_name, user_id, username, vacancy_id)
+        logger.info(f"Резюме пользователя {user_id} сохранено в хранилище: {file_name} -> {sha256[:12]}")
+    except Exception as e:
+        logger.error(f"Не удалось сохранить резюме {file_name} пользователя {user_id}: {e}", exc_info=True)
+
+
+def archive_resume_in_background(data, file_name, user_id, username, vacancy_id):
+    task = asyncio.create_task(_archive_resume(data, file_name, user_id, username, vacancy_id))
+    _archive_tasks.add(task)
+    task.add_done_callback(_archive_tasks.discard)
 
 
 async def handle_resume(update, context):
@@ -45,34 +58,85 @@ async def handle_resume(update, context):
             logger.warning(f"Пользователь {user_id} попытался загрузить резюме без выбора вакансии.")
             return
 
-        # Сохранение файла
-        timestamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
-        safe_file_name = file_name.replace(" ", "_")
-        unique_name = f"{user_id}_{username}_{vacancy_id}_{timestamp}_{safe_file_name}"
-        file_path = os.path.join(RESUMES_DIR, unique_name)
-
-        file = await message.document.get_file()
-        await file.download_to_drive(file_path)
-        logger.info(f"Пользователь {user_id} загрузил резюме: {file_name} -> {unique_name}")
-
-        await message.reply_text("📂 Резюме успешно загружено. Идёт анализ... ⏳")
-
-        # Получаем вакансию через VacancyManager
-        vac = vacancy_manager.get_vacancy_by_id(vacancy_id)
-        if not vac:
-            await message.reply_text("⚠ Вакансия не найдена.")
-            logger.error(f"Вакансия {vacancy_id} не найдена для пользователя {user_id}.")
+        # Лимит загрузок на пользователя — защита от спама файлами
+        retry_after = resume_rate_limiter.retry_after(user_id)
+        if retry_after:
+            metrics.inc("resume_rate_limited")
+            await message.reply_text(f"⏳ Слишком много резюме подряд. Попробуйте снова через {int(retry_after) + 1} с.")
+            logger.warning(f"Пользователь {user_id} превысил лимит загрузок резюме.")
             return
 
-        vacancy_skills = vac.get("requirements", [])
-        normalized_vacancy = parse_vacancy(vac)
-
-        # Парсинг резюме — передаём vacancy_id и vacancy_manager
-        parsed_data = parse_resume(file_path, vacancy_skills)
-        logger.info(f"Parsed resume data for user {user_id}: {parsed_data}")
+        if analysis_executor.is_full:
+            metrics.inc("analysis_rejected")
+            await message.reply_text("⏳ Сейчас много резюме в обработке. Попробуйте загрузить файл чуть позже.")
+            logger.warning(f"Очередь анализа заполнена, резюме пользователя {user_id} отклонено до загрузки.")
+            return
 
-        # Анализ соответствия вакансии
-        analysis = analyze_resume_vs_vacancy(parsed_data, normalized_vacancy)
+        # Скачивание и анализ — тяжёлая часть: одновременно их выполняют не больше RESUME_MAX_CONCURRENT обработчиков
+        if resume_semaphore.locked():
+            await message.reply_text("⏳ Резюме в очереди на обработку, это займёт немного больше времени.")
+        async with resume_semaphore:
+            # Загрузка в память: анализ не ждёт записи на диск, архивная копия пишется в фоне
+            with metrics.timer("download"):
+                file = await message.document.get_file()
+                data = bytes(await file.download_as_bytearray())
+            archive_resume_in_background(data, file_name, user_id, username, vacancy_id)
+            logger.info(f"Пользователь {user_id} загрузил резюме: {file_name} ({len(data)} байт)")
+
+            await message.reply_text("📂 Резюме успешно загружено. Идёт анализ... ⏳")
+
+            # Получаем вакансию через VacancyManager
+            vac = vacancy_manager.get_vacancy_by_id(vacancy_id)
+            if not vac:
+                await message.reply_text("⚠ Вакансия не найдена.")
+                logger.error(f"Вакансия {vacancy_id} не найдена для пользователя {user_id}.")
+                return
+
+            # Индексы каталога строятся прогревом; если резюме пришло раньше (или вакансию в sqlite-каталоге
+            # ещё не открывали) — нормализуем её вне event loop
+            normalized_vacancy = await asyncio.to_thread(vacancy_manager.get_parsed_vacancy, vacancy_id)
+
+            # Парсинг резюме и анализ соответствия вакансии — в пуле процессов, чтобы не блокировать event loop
+            try:
+                with metrics.timer("analysis_total"):
+                    result = await analysis_executor.analyze_resume(
+                        data,
+                        file_name,
+                        normalized_vacancy,
+                        vacancy_manager.get_skill_index(vacancy_id),
+                        rank_catalog=True,
+                        catalog_version=vacancy_manager.catalog_version,
+                    )
+            except QueueFullError:
+                metrics.inc("analysis_rejected")
+                await message.reply_text("⏳ Сейчас много резюме в обработке. Попробуйте снова через пару минут.")
+                logger.warning(f"Очередь анализа заполнена, резюме пользователя {user_id} отклонено.")
+                return
+            except AnalysisTimeoutError:
+                metrics.inc("analysis_timeouts")
+                await message.reply_text("⌛ Анализ резюме занял слишком много времени. Попробуйте отправить файл поменьше.")
+                logger.error(f"Таймаут анализа резюме пользователя {user_id}: {file_name}")
+                return
+            except AnalysisWorkerError:
+                metrics.inc("analysis_worker_crashes")
+                await message.reply_text("⚠ Не удалось обработать файл. Попробуйте загрузить резюме ещё раз.")
+                logger.error(f"Воркер анализа упал на резюме пользователя {user_id}: {file_name}")
+                return
+
+        parsed_data = result["parsed"]
+        analysis = result["analysis"]
+        top_vacancies = result.get("top_vacancies", [])
+
+        # Стадии, замеренные в воркере (extract, dedupe, tokens, skills, analyze)
+        timings = result.get("timings", {})
+        metrics.inc("parse_cache_hits" if timings.pop("cache_hit", False) else "parse_cache_misses")
+        for stage, seconds in timings.items():
+            metrics.observe(stage, seconds)
+        # raw_text в лог не пишем — только сводку; полные данные доступны на DEBUG
+        logger.info(f"Parsed resume for user {user_id}: {len(parsed_data.get('raw_text', ''))} chars, "
+                    f"skills={parsed_data.get('skills', [])}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Parsed resume data for user {user_id}: {parsed_data}")
         logger.info(f"Analysis results for user {user_id}, vacancy {vac.get('id')}: {analysis}")
 
         # --- Подготовка вывода по навыкам/опыту ---
@@ -118,14 +182,32 @@ async def handle_resume(update, context):
             # red_flags ожидается как список ключевых отсутствующих навыков
             response_text += f"⚠ Не хватает ключевых навыков: {', '.join(red_flags)}\n\n"
 
+        reply_markup = None
         if total_score >= 60:
             response_text += "✅ Кандидат проходит на следующий этап! Предлагаю пройти голосовое интервью."
+            # результат анализа нужен интервью: вопросы уточняют неподтверждённые требования
+            context.user_data["last_analysis"] = analysis
+            reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🎙 Начать интервью",
+                                                                       callback_data="interview_start")]])
         else:
             response_text += "❌ К сожалению, резюме не соответствует требованиям вакансии."
 
-        await message.reply_text(response_text)
+        # Топ вакансий, подходящих по навыкам (посчитан за тот же проход по резюме)
+        if top_vacancies:
+            lines = []
+            for top_id, percent in top_vacancies:
+                top_vac = vacancy_manager.get_vacancy_by_id(top_id)
+                if top_vac:
+                    lines.append(f"- {top_vac['title']}: {percent}%")
+            if lines:
+                response_text += "\n\n🔎 Вакансии, которые вам подходят:\n" + "\n".join(lines)
+
+        with metrics.timer("reply"):
+            await message.reply_text(response_text, reply_markup=reply_markup)
+        metrics.inc("resumes_processed")
 
     except Exception as e:
+        metrics.inc("errors")
         user_id = getattr(message.from_user, "id", "unknown")
         logger.error(f"Ошибка при обработке резюме пользователя {user_id}: {e}", exc_info=True)
         try:
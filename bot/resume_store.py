@@ -0,0 +1,260 @@
+# resume_store.py
+"""
+Хранилище загруженных резюме.
+
+Файлы лежат по хэшу содержимого: objects/ab/cd/<sha256>[.gz] — одинаковые загрузки хранятся
+один раз, каталоги остаются небольшими при любом числе резюме. Индекс в SQLite связывает каждый
+файл с загрузками (пользователь, вакансия, имя файла, время). Политика хранения удаляет старые
+загрузки и файлы, на которые больше никто не ссылается.
+
+    python -m bot.resume_store stats
+    python -m bot.resume_store gc --max-age-days 180 [--dry-run]
+    python -m bot.resume_store migrate        # перенос старых файлов из плоской папки RESUMES_DIR
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bot.data_loader import RESUMES_DIR
+from logs.logger import logger
+
+# Сжатие файлов на диске: gzip | none (сжатые форматы вроде DOCX хранятся как есть, если выигрыш мал)
+RESUME_STORE_COMPRESSION = os.getenv("RESUME_STORE_COMPRESSION", "gzip")
+# Срок хранения загрузок в днях (0 — хранить всегда) и период фоновой очистки в часах
+RESUME_RETENTION_DAYS = float(os.getenv("RESUME_RETENTION_DAYS", 0))
+RESUME_GC_INTERVAL_HOURS = float(os.getenv("RESUME_GC_INTERVAL_HOURS", 24))
+
+# Сжатый файл сохраняется, только если он меньше исходного хотя бы на эту долю
+_MIN_COMPRESSION_GAIN = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    compression TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+    user_id INTEGER,
+    username TEXT,
+    vacancy_id INTEGER,
+    file_name TEXT NOT NULL,
+    uploaded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_sha256 ON uploads(sha256);
+CREATE INDEX IF NOT EXISTS idx_uploads_user ON uploads(user_id);
+CREATE INDEX IF NOT EXISTS idx_uploads_time ON uploads(uploaded_at);
+"""
+
+# Имя файла в старом плоском архиве: {user_id}_{username}_{vacancy_id}_{YYYY-mm-dd_HH-MM-SS}_{file}
+_LEGACY_NAME = re.compile(r"^(\d+)_(.+)_(\d+)_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})_(.+)$")
+
+
+class ResumeStore:
+    """Content-addressed хранилище резюме с индексом загрузок и очисткой по сроку хранения"""
+
+    def __init__(self, root: str = RESUMES_DIR, compression: str = RESUME_STORE_COMPRESSION):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.sqlite")
+        self.compression = compression
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._gc_thread = None
+        self._stop_event = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            # вызывается из потоков asyncio.to_thread и потока очистки — доступ под _lock
+            self._conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _blob_path(self, sha256: str, compression: str) -> str:
+        suffix = ".gz" if compression == "gzip" else ""
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], sha256 + suffix)
+
+    def _write_blob(self, sha256: str, data: bytes) -> Tuple[int, str]:
+        payload, compression = data, "none"
+        if self.compression == "gzip":
+            compressed = gzip.compress(data, compresslevel=6, mtime=0)
+            if len(compressed) <= len(data) * (1 - _MIN_COMPRESSION_GAIN):
+                payload, compression = compressed, "gzip"
+        path = self._blob_path(sha256, compression)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # запись через временный файл: при сбое в хранилище не останется обрезанного файла
+        tmp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return len(payload), compression
+
+    def put(self, data: bytes, file_name: str, user_id: Optional[int] = None, username: Optional[str] = None,
+            vacancy_id: Optional[int] = None, uploaded_at: Optional[float] = None) -> str:
+        """Сохраняет загрузку; содержимое пишется на диск, только если такого файла ещё нет. Возвращает sha256"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            # файл и загрузка попадают в индекс вместе; IMMEDIATE — gc другого процесса не удалит
+            # найденный blob между проверкой и вставкой загрузки
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone() is None:
+                    stored_size, compression = self._write_blob(sha256, data)
+                    conn.execute("INSERT INTO blobs(sha256, size, stored_size, compression, created_at) "
+                                 "VALUES (?, ?, ?, ?, ?)", (sha256, len(data), stored_size, compression, now))
+                conn.execute("INSERT INTO uploads(sha256, user_id, username, vacancy_id, file_name, uploaded_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (sha256, user_id, username, vacancy_id, file_name, uploaded_at or now))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return sha256
+
+    def get(self, sha256: str) -> Optional[bytes]:
+        """Содержимое файла по хэшу или None"""
+        with self._lock:
+            row = self._connect().execute("SELECT compression FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            return None
+        with open(self._blob_path(sha256, row[0]), "rb") as f:
+            data = f.read()
+        return gzip.decompress(data) if row[0] == "gzip" else data
+
+    def uploads_for_user(self, user_id: int) -> List[Dict]:
+        """Загрузки пользователя, новые первыми"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT sha256, vacancy_id, file_name, uploaded_at FROM uploads WHERE user_id = ? "
+                "ORDER BY uploaded_at DESC", (user_id,)).fetchall()
+        return [{"sha256": r[0], "vacancy_id": r[1], "file_name": r[2], "uploaded_at": r[3]} for r in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Число загрузок и уникальных файлов, исходный и занятый на диске объём"""
+        with self._lock:
+            conn = self._connect()
+            uploads = conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+            blobs, size, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+        return {"uploads": uploads, "blobs": blobs, "bytes": size, "stored_bytes": stored}
+
+    def gc(self, max_age_days: float = RESUME_RETENTION_DAYS, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Удаляет загрузки старше max_age_days и файлы без оставшихся загрузок.
+        max_age_days <= 0 — загрузки не удаляются, чистятся только файлы без ссылок.
+        """
+        cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = 0
+                if cutoff is not None:
+                    expired = conn.execute("SELECT COUNT(*) FROM uploads WHERE uploaded_at < ?", (cutoff,)).fetchone()[0]
+                    conn.execute("DELETE FROM uploads WHERE uploaded_at < ?", (cutoff,))
+                orphans = conn.execute(
+                    "SELECT sha256, compression, stored_size FROM blobs "
+                    "WHERE NOT EXISTS (SELECT 1 FROM uploads WHERE uploads.sha256 = blobs.sha256)").fetchall()
+                conn.executemany("DELETE FROM blobs WHERE sha256 = ?", [(sha,) for sha, _, _ in orphans])
+                conn.execute("ROLLBACK" if dry_run else "COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            freed = sum(stored_size for _, _, stored_size in orphans)
+            if not dry_run:
+                # файлы удаляются после коммита индекса и под тем же lock, что и put:
+                # повторная загрузка того же файла не потеряет только что записанное содержимое
+                for sha256, compression, _ in orphans:
+                    try:
+                        os.remove(self._blob_path(sha256, compression))
+                    except FileNotFoundError:
+                        pass
+        result = {"expired_uploads": expired, "removed_blobs": len(orphans), "freed_bytes": freed}
+        logger.info(f"Очистка хранилища резюме{' (dry-run)' if dry_run else ''}: {result}")
+        return result
+
+    def migrate_legacy(self, legacy_dir: Optional[str] = None, remove: bool = True) -> int:
+        """Переносит файлы старого плоского архива (имя с user_id/vacancy_id/временем) в хранилище"""
+        legacy_dir = legacy_dir or self.root
+        moved = 0
+        for name in sorted(os.listdir(legacy_dir)):
+            path = os.path.join(legacy_dir, name)
+            match = _LEGACY_NAME.match(name)
+            if not match or not os.path.isfile(path):
+                continue
+            user_id, username, vacancy_id, timestamp, file_name = match.groups()
+            with open(path, "rb") as f:
+                data = f.read()
+            uploaded_at = time.mktime(time.strptime(timestamp, "%Y-%m-%d_%H-%M-%S"))
+            self.put(data, file_name, int(user_id), username, int(vacancy_id), uploaded_at)
+            if remove:
+                os.remove(path)
+            moved += 1
+        logger.info(f"Перенесено в хранилище резюме: {moved} файлов из {legacy_dir}")
+        return moved
+
+    def start_gc_worker(self, max_age_days: float = RESUME_RETENTION_DAYS,
+                        interval_hours: float = RESUME_GC_INTERVAL_HOURS):
+        """Фоновый поток, который периодически применяет политику хранения"""
+        if self._gc_thread is not None or max_age_days <= 0 or interval_hours <= 0:
+            return
+
+        def _run():
+            while not self._stop_event.wait(interval_hours * 3600):
+                try:
+                    self.gc(max_age_days)
+                except Exception as e:
+                    logger.error(f"Ошибка очистки хранилища резюме: {e}", exc_info=True)
+
+        self._gc_thread = threading.Thread(target=_run, name="resume-store-gc", daemon=True)
+        self._gc_thread.start()
+        logger.info(f"Очистка хранилища резюме: срок {max_age_days:g} дн., раз в {interval_hours:g} ч")
+
+    def stop_gc_worker(self):
+        self._stop_event.set()
+        self._gc_thread = None
+
+
+# общий экземпляр хранилища резюме
+resume_store = ResumeStore()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Хранилище резюме: статистика, очистка, миграция")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="объём и число файлов")
+    gc_parser = sub.add_parser("gc", help="удалить старые загрузки и файлы без ссылок")
+    gc_parser.add_argument("--max-age-days", type=float, default=RESUME_RETENTION_DAYS)
+    gc_parser.add_argument("--dry-run", action="store_true")
+    migrate_parser = sub.add_parser("migrate", help="перенести файлы из старой плоской папки")
+    migrate_parser.add_argument("--from-dir", default=RESUMES_DIR)
+    migrate_parser.add_argument("--keep", action="store_true", help="не удалять исходные файлы")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(resume_store.stats())
+    elif args.command == "gc":
+        print(resume_store.gc(args.max_age_days, dry_run=args.dry_run))
+    else:
+        print(f"Перенесено файлов: {resume_store.migrate_legacy(args.from_dir, remove=not args.keep)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,17 @@
 # utils.py
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from bot.data_loader import VacancyManager
-
-# экземпляр менеджера вакансий
-vacancy_manager = VacancyManager()
+from bot.data_loader import vacancy_manager
 
 
 # -------------------- Список вакансий --------------------
 async def list_vacancies(update, context, vacancies=None):
     """
     Отправляет список вакансий кнопками (инлайн-клавиатура).
-    Если vacancies не переданы, берёт их из VacancyManager.
+    Если vacancies не переданы, берёт первую страницу каталога из VacancyManager.
     """
     if vacancies is None:
-        vacancies = vacancy_manager.load_vacancies()
+        vacancies = vacancy_manager.list_summaries()
 
     keyboard = [[InlineKeyboardButton(v["title"], callback_data=f"vac_{v['id']}")] for v in vacancies]
     # Добавляем кнопку "Назад в меню"
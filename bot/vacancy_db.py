@@ -0,0 +1,316 @@
+# vacancy_db.py
+"""
+SQLite-каталог вакансий для больших выгрузок из ATS (VACANCY_BACKEND=sqlite).
+
+Вакансии хранятся построчно (полный JSON читается только при открытии конкретной вакансии),
+город и тип занятости проиндексированы, по названию, требованиям и обязанностям есть
+полнотекстовый поиск FTS5. Импорт из vacancies.json инкрементальный: переписываются только
+изменившиеся вакансии, исчезнувшие из файла — удаляются. Индексы навыков (данные матчера
+по всему каталогу) тоже хранятся в базе и пересчитываются только для изменившихся вакансий.
+
+    python -m bot.vacancy_db import [--json data/vacancies/vacancies.json]
+    python -m bot.vacancy_db search "аналитик sql" --city Москва
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from logs.logger import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VACANCY_DB_PATH = os.getenv("VACANCY_DB_PATH", os.path.join(BASE_DIR, "data", "vacancies", "vacancies.sqlite"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vacancies (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    city TEXT,
+    employment_type TEXT,
+    content_hash TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vacancies_city ON vacancies(city);
+CREATE INDEX IF NOT EXISTS idx_vacancies_employment ON vacancies(employment_type);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS skill_indexes (
+    id INTEGER PRIMARY KEY,
+    source_hash TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+# rowid FTS-таблицы совпадает с id вакансии
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS vacancies_fts USING fts5(
+    title, requirements, responsibilities,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_SUMMARY_COLUMNS = "v.id, v.title, v.city, v.employment_type"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _summary(row) -> Dict:
+    return {"id": row[0], "title": row[1], "city": row[2], "employment_type": row[3]}
+
+
+def _content_hash(vacancy: Dict) -> str:
+    return hashlib.sha1(json.dumps(vacancy, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _lower(value):
+    # lower() SQLite приводит к нижнему регистру только ASCII — кириллица в LIKE оставалась бы регистрозависимой
+    return value.lower() if isinstance(value, str) else value
+
+
+def fts_query(text: str) -> str:
+    """Запрос пользователя -> выражение FTS5: все слова (по префиксу), без спецсинтаксиса FTS"""
+    return " ".join(f'"{word}"*' for word in _WORD.findall(text.lower()))
+
+
+class VacancyDB:
+    """Каталог вакансий в SQLite: списки без деталей, вакансия по id, поиск и инкрементальный импорт"""
+
+    def __init__(self, path: str = VACANCY_DB_PATH):
+        self.path = path
+        self.has_fts = True
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # соединение открывается заново в каждом процессе (воркер анализа после fork)
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # используется из обработчиков и потока слежения за файлом — доступ под _lock
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._pid = os.getpid()
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.create_function("py_lower", 1, _lower, deterministic=True)
+            self._conn.executescript(_SCHEMA)
+            try:
+                self._conn.executescript(_FTS_SCHEMA)
+            except sqlite3.OperationalError:
+                # SQLite собран без FTS5 — поиск работает через LIKE
+                self.has_fts = False
+                logger.warning("SQLite без FTS5: поиск вакансий будет медленнее (LIKE)")
+        return self._conn
+
+    # --- импорт ---
+
+    def import_json(self, json_path: str) -> Dict[str, int]:
+        """
+        Синхронизирует каталог с JSON-файлом. Файл, не изменившийся с прошлого импорта
+        (размер и mtime), не читается вовсе. Возвращает число добавленных/обновлённых/удалённых.
+        """
+        stat = os.stat(json_path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM meta WHERE name = 'json_signature'").fetchone()
+            if row is not None and row[0] == signature:
+                return {"inserted": 0, "updated": 0, "deleted": 0}
+
+            with open(json_path, "r", encoding="utf-8") as f:
+                vacancies = json.load(f)
+            known = dict(conn.execute("SELECT id, content_hash FROM vacancies").fetchall())
+            result = {"inserted": 0, "updated": 0, "deleted": 0}
+            conn.execute("BEGIN")
+            try:
+                seen = set()
+                for vacancy in vacancies:
+                    vac_id = vacancy["id"]
+                    seen.add(vac_id)
+                    content_hash = _content_hash(vacancy)
+                    if known.get(vac_id) == content_hash:
+                        continue
+                    result["updated" if vac_id in known else "inserted"] += 1
+                    self._upsert(conn, vacancy, content_hash)
+                for vac_id in set(known) - seen:
+                    conn.execute("DELETE FROM vacancies WHERE id = ?", (vac_id,))
+                    conn.execute("DELETE FROM skill_indexes WHERE id = ?", (vac_id,))
+                    if self.has_fts:
+                        conn.execute("DELETE FROM vacancies_fts WHERE rowid = ?", (vac_id,))
+                    result["deleted"] += 1
+                conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('json_signature', ?)", (signature,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Импорт вакансий из {json_path}: {result}")
+        return result
+
+    def _upsert(self, conn: sqlite3.Connection, vacancy: Dict, content_hash: str):
+        conn.execute(
+            "INSERT OR REPLACE INTO vacancies(id, title, city, employment_type, content_hash, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (vacancy["id"], vacancy.get("title", ""), vacancy.get("city"), vacancy.get("employment_type"),
+             content_hash, json.dumps(vacancy, ensure_ascii=False)),
+        )
+        if self.has_fts:
+            conn.execute("DELETE FROM vacancies_fts WHERE rowid = ?", (vacancy["id"],))
+            conn.execute(
+                "INSERT INTO vacancies_fts(rowid, title, requirements, responsibilities) VALUES (?, ?, ?, ?)",
+                (vacancy["id"], vacancy.get("title", ""), "\n".join(vacancy.get("requirements", [])),
+                 "\n".join(vacancy.get("responsibilities", []))),
+            )
+
+    # --- чтение ---
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM vacancies").fetchone()[0]
+
+    def get(self, vac_id: int) -> Optional[Dict]:
+        """Полная вакансия по id или None"""
+        with self._lock:
+            row = self._connect().execute("SELECT data FROM vacancies WHERE id = ?", (vac_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict]:
+        """Полные вакансии по списку id: {id: вакансия}"""
+        ids = list(ids)
+        result = {}
+        with self._lock:
+            conn = self._connect()
+            # не больше 500 параметров в запросе (лимит SQLite по умолчанию — 999)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = conn.execute(f"SELECT id, data FROM vacancies WHERE id IN ({','.join('?' * len(chunk))})",
+                                    chunk).fetchall()
+                result.update((vac_id, json.loads(data)) for vac_id, data in rows)
+        return result
+
+    # --- индексы навыков ---
+
+    def stale_skill_indexes(self, version: str) -> List[Tuple[int, str]]:
+        """(id, content_hash) вакансий без сохранённого индекса навыков или с индексом от другой версии вакансии"""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT v.id, v.content_hash FROM vacancies v LEFT JOIN skill_indexes s ON s.id = v.id "
+                "WHERE s.source_hash IS NULL OR s.source_hash != v.content_hash || ':' || ? ORDER BY v.id",
+                (version,)).fetchall()
+
+    def store_skill_indexes(self, entries: Iterable[Tuple[int, str, Dict]], version: str):
+        """Сохраняет индексы навыков: [(id, content_hash вакансии, индекс build_skill_index), ...]"""
+        rows = [
+            (vac_id, f"{content_hash}:{version}", json.dumps(
+                {"id": index["id"], "skills": [dict(entry, lemmas=sorted(entry["lemmas"])) for entry in index["skills"]]},
+                ensure_ascii=False))
+            for vac_id, content_hash, index in entries
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO skill_indexes(id, source_hash, data) VALUES (?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def load_skill_indexes(self) -> Dict[int, Dict]:
+        """Индексы навыков всех вакансий каталога: {id: индекс в формате build_skill_index}"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT s.id, s.data FROM skill_indexes s JOIN vacancies v ON v.id = s.id ORDER BY s.id").fetchall()
+        indexes = {}
+        for vac_id, data in rows:
+            index = json.loads(data)
+            for entry in index["skills"]:
+                entry["lemmas"] = frozenset(entry["lemmas"])
+            indexes[vac_id] = index
+        return indexes
+
+    def iter_all(self) -> Iterator[Dict]:
+        """Все вакансии целиком (для построения индексов навыков)"""
+        with self._lock:
+            rows = self._connect().execute("SELECT data FROM vacancies ORDER BY id").fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    @staticmethod
+    def _filters(city: Optional[str], employment_type: Optional[str]):
+        clauses, params = [], []
+        if city:
+            clauses.append("v.city = ?")
+            params.append(city)
+        if employment_type:
+            clauses.append("v.employment_type = ?")
+            params.append(employment_type)
+        return clauses, params
+
+    def list_summaries(self, limit: int = 50, offset: int = 0, city: Optional[str] = None,
+                       employment_type: Optional[str] = None) -> List[Dict]:
+        """Страница каталога без деталей: [{"id", "title", "city", "employment_type"}, ...]"""
+        clauses, params = self._filters(city, employment_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM vacancies v {where} ORDER BY v.id LIMIT ? OFFSET ?",
+                (*params, limit, offset)).fetchall()
+        return [_summary(row) for row in rows]
+
+    def search(self, text: str, city: Optional[str] = None, employment_type: Optional[str] = None,
+               limit: int = 10) -> List[Dict]:
+        """Поиск по названию, требованиям и обязанностям; лучшие совпадения первыми"""
+        clauses, params = self._filters(city, employment_type)
+        query = fts_query(text)
+        if not query:
+            return self.list_summaries(limit, city=city, employment_type=employment_type)
+        with self._lock:
+            conn = self._connect()
+            if self.has_fts:
+                # название важнее требований и обязанностей
+                sql = (f"SELECT {_SUMMARY_COLUMNS} FROM vacancies_fts f JOIN vacancies v ON v.id = f.rowid "
+                       f"WHERE vacancies_fts MATCH ? {''.join(' AND ' + c for c in clauses)} "
+                       f"ORDER BY bm25(vacancies_fts, 10.0, 2.0, 1.0) LIMIT ?")
+                args = (query, *params, limit)
+            else:
+                words = _WORD.findall(text.lower())
+                clauses += ["py_lower(v.data) LIKE ?"] * len(words)
+                params += [f"%{word}%" for word in words]
+                sql = (f"SELECT {_SUMMARY_COLUMNS} FROM vacancies v WHERE {' AND '.join(clauses)} "
+                       f"ORDER BY v.id LIMIT ?")
+                args = (*params, limit)
+            rows = conn.execute(sql, args).fetchall()
+        return [_summary(row) for row in rows]
+
+
+def main(argv=None):
+    from bot.data_loader import VACANCIES_FILE
+
+    parser = argparse.ArgumentParser(description="SQLite-каталог вакансий: импорт и поиск")
+    parser.add_argument("--db", default=VACANCY_DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="инкрементальный импорт из JSON")
+    import_parser.add_argument("--json", default=VACANCIES_FILE)
+    search_parser = sub.add_parser("search", help="полнотекстовый поиск")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--city")
+    search_parser.add_argument("--employment-type")
+    search_parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    db = VacancyDB(args.db)
+    if args.command == "import":
+        print(db.import_json(args.json), f"всего: {db.count()}")
+    else:
+        for item in db.search(args.query, args.city, args.employment_type, args.limit):
+            print(f"{item['id']:>6}  {item['title']}  ({item['city'] or '—'}, {item['employment_type'] or '—'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
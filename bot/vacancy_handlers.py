@@ -1,12 +1,13 @@
 # vacancy_handlers.py
 
+import asyncio
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from bot.data_loader import VacancyManager
+from bot.data_loader import vacancy_manager
 from bot.utils import list_vacancies
 from logs.logger import logger
 
-# экземпляр менеджера вакансий
-vacancy_manager = VacancyManager()
+# Сколько найденных вакансий показывать кнопками на /find
+FIND_RESULTS_LIMIT = 10
 
 
 
@@ -14,8 +15,8 @@ vacancy_manager = VacancyManager()
 async def choose_vacancy(update, context):
     """Показывает список вакансий кнопками (инлайн)"""
     try:
-        vacancies = vacancy_manager.load_vacancies()
-        logger.info(f"Пользователь {update.effective_user.id} запросил список вакансий. Всего вакансий: {len(vacancies)}")
+        vacancies = vacancy_manager.list_summaries()
+        logger.info(f"Пользователь {update.effective_user.id} запросил список вакансий. Показано вакансий: {len(vacancies)}")
 
         keyboard = [[InlineKeyboardButton(v["title"], callback_data=f"select_{v['id']}")] for v in vacancies]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -101,6 +102,33 @@ async def show_vacancy_details(update, context):
         await query.message.reply_text("Произошла ошибка при отображении вакансии. Попробуйте снова.")
 
 
+async def find_vacancy(update, context):
+    """/find <слова> — поиск вакансий по названию, требованиям и обязанностям"""
+    user_id = update.effective_user.id
+    text = " ".join(context.args or [])
+    if not text:
+        await update.message.reply_text("Напишите, что искать, например: /find аналитик sql")
+        return
+
+    try:
+        # запрос к SQLite-каталогу — вне event loop
+        found = await asyncio.to_thread(vacancy_manager.search, text, limit=FIND_RESULTS_LIMIT)
+        logger.info(f"Пользователь {user_id} искал вакансии '{text}': найдено {len(found)}")
+        if not found:
+            await update.message.reply_text("По запросу ничего не найдено. Попробуйте другие слова.")
+            return
+
+        keyboard = [[InlineKeyboardButton(f"{v['title']} ({v['city']})" if v.get("city") else v["title"],
+                                          callback_data=f"vac_{v['id']}")] for v in found]
+        keyboard.append([InlineKeyboardButton("⬅ Назад в меню", callback_data="back_to_menu")])
+        await update.message.reply_text(f"Найденные вакансии по запросу «{text}»:",
+                                        reply_markup=InlineKeyboardMarkup(keyboard))
+
+    except Exception as e:
+        logger.error(f"Ошибка поиска вакансий пользователем {user_id}: {e}", exc_info=True)
+        await update.message.reply_text("Произошла ошибка при поиске вакансий. Попробуйте снова.")
+
+
 
 
 async def back_handler(update, context):
@@ -113,7 +141,7 @@ async def back_handler(update, context):
 
         if query.data == "back_to_list":
             logger.info(f"Пользователь {user_id} нажал 'Назад' к списку вакансий")
-            vacancies = vacancy_manager.load_vacancies()
+            vacancies = vacancy_manager.list_summaries()
             await list_vacancies(update, context, vacancies)
 
         elif query.data == "back_to_choose":
@@ -0,0 +1,162 @@
+# webhook.py
+
+import asyncio
+import hmac
+import json
+import os
+import signal
+import time
+from typing import Dict, Optional, Tuple
+
+from telegram import Update
+
+from bot.http_utils import http_response, read_http_request
+from logs.logger import logger
+
+# Режим получения апдейтов: polling | webhook (можно переопределить через .env)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Публичный адрес бота (https://bot.example.com); путь вебхука добавляется к нему
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8443))
+# Секрет, который Telegram передаёт в X-Telegram-Bot-Api-Secret-Token (задаётся в setWebhook)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Сколько секунд при остановке ждать обработки уже принятых апдейтов
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 30))
+# Адрес Bot API (для локального fake-сервера: http://127.0.0.1:8081), пусто — api.telegram.org
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+
+HEALTH_PATH = "/healthz"
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class WebhookServer:
+    """
+    HTTP-сервер вебхука на asyncio: принимает апдейты Telegram в очередь приложения
+    и отдаёт /healthz для балансировщика. При остановке сервер отвечает 503 и на новые апдейты
+    (Telegram повторит их на другую реплику), и на /healthz, пока обрабатываются уже принятые.
+    """
+
+    def __init__(self, app, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET):
+        self.app = app
+        self.path = path
+        self.secret = secret
+        self.draining = False
+        self.started_at = time.time()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._accepting = 0  # запросы, которые сейчас кладут апдейт в очередь
+
+    async def start(self, host: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Вебхук слушает http://{host}:{port}{self.path}, health: {HEALTH_PATH}")
+
+    def _pending_updates(self) -> int:
+        processor = self.app.update_processor
+        return self.app.update_queue.qsize() + self._accepting + getattr(processor, "pending_updates", 0)
+
+    def health(self) -> Tuple[str, Dict]:
+        status = "draining" if self.draining else "ok"
+        body = {"status": status, "pending_updates": self._pending_updates(),
+                "uptime_s": round(time.time() - self.started_at)}
+        return ("503 Service Unavailable" if self.draining else "200 OK"), body
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await read_http_request(reader)
+            if request is None:
+                writer.write(http_response("400 Bad Request"))
+                return
+            method, path, headers, body = request
+            path = path.split("?")[0]
+
+            if method == "GET" and path == HEALTH_PATH:
+                status, payload = self.health()
+                writer.write(http_response(status, json.dumps(payload).encode("utf-8")))
+            elif path != self.path:
+                writer.write(http_response("404 Not Found"))
+            elif method != "POST":
+                writer.write(http_response("405 Method Not Allowed"))
+            elif self.secret and not hmac.compare_digest(headers.get(SECRET_HEADER, ""), self.secret):
+                logger.warning("Запрос на вебхук с неверным секретом отклонён")
+                writer.write(http_response("403 Forbidden"))
+            elif self.draining:
+                # Telegram повторит доставку — апдейт заберёт другая реплика или этот процесс после рестарта
+                writer.write(http_response("503 Service Unavailable"))
+            else:
+                await self._accept_update(body, writer)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Ошибка обработки запроса вебхука: {e}", exc_info=True)
+        finally:
+            writer.close()
+
+    async def _accept_update(self, body: bytes, writer):
+        self._accepting += 1
+        try:
+            try:
+                update = Update.de_json(json.loads(body), self.app.bot)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Некорректный апдейт на вебхуке: {e}")
+                writer.write(http_response("400 Bad Request"))
+                return
+            await self.app.update_queue.put(update)
+            writer.write(http_response("200 OK", b"{}"))
+        finally:
+            self._accepting -= 1
+
+    async def drain(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        """Перестаёт принимать апдейты, ждёт обработки принятых (не дольше timeout) и закрывает сервер"""
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self._pending_updates() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        left = self._pending_updates()
+        if left:
+            logger.warning(f"Остановка вебхука: не дождались обработки {left} апдейтов за {timeout} с")
+        else:
+            logger.info("Вебхук остановлен, все принятые апдейты обработаны")
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def run_webhook(app, url: str = WEBHOOK_URL, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                      path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                      drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+    """
+    Запуск приложения в режиме вебхука до SIGINT/SIGTERM.
+    Вебхук регистрируется в Telegram, если задан url; при остановке не удаляется —
+    его продолжают обслуживать остальные реплики.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: остаётся KeyboardInterrupt
+            pass
+
+    await app.initialize()
+    # post_init/post_shutdown вызывает только run_polling/run_webhook самого PTB — здесь вызываем сами
+    if app.post_init:
+        await app.post_init(app)
+    server = WebhookServer(app, path, secret)
+    await server.start(listen, port)
+    if url:
+        await app.bot.set_webhook(url.rstrip("/") + path, secret_token=secret or None,
+                                  allowed_updates=Update.ALL_TYPES)
+        logger.info(f"Вебхук зарегистрирован: {url.rstrip('/')}{path}")
+    await app.start()
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Получен сигнал остановки, завершаем приём апдейтов")
+        await server.drain(drain_timeout)
+        await app.stop()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await app.shutdown()
@@ -0,0 +1,158 @@
+# fake_llm_server.py
+"""
+Локальная замена OpenAI-совместимого API для проверки интервью без сети и ключей.
+
+    python -m llm.fake_llm_server --port 8090 --first-token-ms 300 --token-ms 30
+
+Бот (или llm_interface) запускается с LLM_BASE_URL=http://127.0.0.1:8090/v1.
+Отвечает на POST /v1/chat/completions (обычный ответ и SSE-стрим) и GET /v1/models
+детерминированными вопросами интервью; задержки имитируют время до первого токена и скорость
+генерации, --fail-every N — каждый N-й запрос отвечает ошибкой --fail-status (по умолчанию 503;
+проверка повторов).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+from http import HTTPStatus
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bot.http_utils import http_response, read_http_request
+from logs.logger import logger
+
+FAKE_QUESTIONS = [
+    "Расскажите о своём опыте, который ближе всего к этой вакансии.",
+    "Какой проект за последний год вы считаете самым удачным и почему?",
+    "С какими инструментами из требований вакансии вы работали и в каких задачах?",
+    "Опишите ситуацию, когда вам пришлось быстро разобраться в новой области.",
+    "Как вы расставляете приоритеты, когда задач больше, чем времени?",
+    "Расскажите о случае, когда вы не согласились с коллегой, и чем всё закончилось.",
+    "Что для вас важно в следующем месте работы?",
+]
+
+_COUNT = re.compile(r"Составь (\d+) вопрос")
+
+
+def fake_reply(messages: List[Dict]) -> str:
+    """Детерминированный ответ: набор вопросов на question_set_messages, иначе один вопрос"""
+    match = _COUNT.search(" ".join(m.get("content", "") for m in messages))
+    if match:
+        return "\n".join(FAKE_QUESTIONS[i % len(FAKE_QUESTIONS)] for i in range(int(match.group(1))))
+    if messages and "оценка" in messages[0].get("content", ""):
+        return "оценка: 7; комментарий: ответ по существу, но без конкретных цифр."
+    digest = hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode("utf-8")).digest()
+    return FAKE_QUESTIONS[digest[0] % len(FAKE_QUESTIONS)]
+
+
+def _tokens(text: str) -> List[str]:
+    # «токены» — слова с пробелом перед ними, как куски в стриме настоящих моделей
+    return re.findall(r"\s*\S+", text)
+
+
+class FakeLLMServer:
+    """HTTP-сервер заглушки; requests — число запросов chat/completions (для проверки кэша и слияния)"""
+
+    def __init__(self, first_token_ms: float = 300, token_ms: float = 30, fail_every: int = 0,
+                 fail_status: int = 503):
+        self.first_token = first_token_ms / 1000
+        self.token_delay = token_ms / 1000
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8090):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Fake LLM API слушает http://{host}:{port}/v1")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await read_http_request(reader)
+            if request is None:
+                writer.write(http_response("400 Bad Request"))
+                return
+            method, path, _, body = request
+            path = path.split("?")[0].rstrip("/")
+            if method == "GET" and path == "/v1/models":
+                payload = {"object": "list", "data": [{"id": "fake-interviewer", "object": "model"}]}
+                writer.write(http_response("200 OK", json.dumps(payload).encode("utf-8")))
+            elif method == "POST" and path == "/v1/chat/completions":
+                await self._chat(json.loads(body or b"{}"), writer)
+            else:
+                writer.write(http_response("404 Not Found"))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Fake LLM API: ошибка обработки запроса: {e}", exc_info=True)
+        finally:
+            writer.close()
+
+    async def _chat(self, params: Dict, writer):
+        self.requests += 1
+        if self.fail_every and self.requests % self.fail_every == 0:
+            status = HTTPStatus(self.fail_status)
+            error = json.dumps({"error": {"message": status.phrase}}).encode("utf-8")
+            writer.write(http_response(f"{status.value} {status.phrase}", error))
+            return
+        text = fake_reply(params.get("messages", []))
+        model = params.get("model", "fake-interviewer")
+        created = int(time.time())
+        await asyncio.sleep(self.first_token)
+
+        if not params.get("stream"):
+            await asyncio.sleep(self.token_delay * len(_tokens(text)))
+            payload = {
+                "id": f"chatcmpl-{self.requests}", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(_tokens(text)), "total_tokens": 0},
+            }
+            writer.write(http_response("200 OK", json.dumps(payload, ensure_ascii=False).encode("utf-8")))
+            return
+
+        # SSE без Content-Length: конец ответа — закрытие соединения
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        for i, token in enumerate(_tokens(text)):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            chunk = {"id": f"chatcmpl-{self.requests}", "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            writer.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await writer.drain()
+        writer.write(b"data: [DONE]\n\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальная замена OpenAI-совместимого API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--first-token-ms", type=float, default=300, help="задержка до первого токена")
+    parser.add_argument("--token-ms", type=float, default=30, help="задержка между токенами")
+    parser.add_argument("--fail-every", type=int, default=0, help="каждый N-й запрос отвечает ошибкой")
+    parser.add_argument("--fail-status", type=int, default=503, help="HTTP-статус ошибки (429, 500, 503...)")
+    args = parser.parse_args(argv)
+
+    async def _serve():
+        server = FakeLLMServer(args.first_token_ms, args.token_ms, args.fail_every, args.fail_status)
+        await server.start(args.host, args.port)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+# llm_interface.py
+"""
+Асинхронный клиент OpenAI-совместимого API (/chat/completions) для динамических вопросов интервью.
+
+- общий пул HTTP-соединений на процесс (httpx, уже зависимость python-telegram-bot)
+  и ограничение числа одновременных запросов;
+- повтор при сетевых ошибках, 429 и 5xx с экспоненциальной задержкой (учитывает Retry-After);
+- одинаковые одновременные промпты отправляются одним запросом, готовые ответы хранятся
+  в TTL/LRU-кэше — базовые вопросы вакансии у всех кандидатов совпадают;
+- стриминг токенов в сообщение Telegram с ограничением частоты edit_message_text.
+
+Для проверки без сети: python -m llm.fake_llm_server и LLM_BASE_URL=http://127.0.0.1:8090/v1
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+
+from bot.metrics import metrics
+from logs.logger import logger
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://127.0.0.1:8090/v1")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.3))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", 300))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+# Одновременных запросов к API (и размер пула соединений)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+# Кэш ответов: число промптов и время жизни, секунды (0 — без кэша)
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 512))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+# Не чаще одного edit_message_text за столько секунд при стриминге в Telegram
+LLM_STREAM_EDIT_INTERVAL = float(os.getenv("LLM_STREAM_EDIT_INTERVAL", 1.0))
+
+# Ответы API, после которых запрос имеет смысл повторить
+_RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Хвост промежуточного текста при стриминге: кандидат видит, что ответ ещё пишется
+_STREAM_CURSOR = " …"
+
+
+class LLMError(Exception):
+    """Запрос к LLM не удался (после всех повторов) или ответ некорректен"""
+
+
+class TTLCache:
+    """LRU-кэш с временем жизни записей (используется только из event loop)"""
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        # пустой ответ (стрим без кусков, content=null) не кэшируем — иначе он отдавался бы всем повторам
+        if self.maxsize <= 0 or self.ttl <= 0 or not value:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    if retry_after:
+        try:
+            return min(float(retry_after), 30.0)
+        except ValueError:
+            pass
+    # экспонента с джиттером, чтобы повторы разных запросов не шли одной волной
+    return min(8.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+class LLMClient:
+    """Клиент chat completions с пулом соединений, повторами, слиянием одинаковых запросов и кэшем"""
+
+    def __init__(self, base_url: str = LLM_BASE_URL, api_key: str = LLM_API_KEY, model: str = LLM_MODEL,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 timeout: float = LLM_TIMEOUT, cache_size: int = LLM_CACHE_SIZE, cache_ttl: float = LLM_CACHE_TTL,
+                 edit_interval: float = LLM_STREAM_EDIT_INTERVAL):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.edit_interval = edit_interval
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, headers=headers,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _payload(self, messages: List[Dict], temperature: Optional[float], max_tokens: Optional[int]) -> Dict:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": LLM_TEMPERATURE if temperature is None else temperature,
+            "max_tokens": max_tokens or LLM_MAX_TOKENS,
+        }
+
+    @staticmethod
+    def _key(payload: Dict) -> str:
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # --- обычный запрос ---
+
+    async def _post(self, payload: Dict) -> str:
+        import httpx
+
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    response = await client.post("/chat/completions", json=payload)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise LLMError(f"LLM недоступна: {e}") from e
+                delay = _retry_delay(attempt)
+                logger.warning(f"Ошибка соединения с LLM ({e}), повтор через {delay:.1f} с")
+            else:
+                if response.status_code < 400:
+                    metrics.observe("llm_request", time.perf_counter() - start)
+                    try:
+                        return response.json()["choices"][0]["message"]["content"]
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        raise LLMError(f"Некорректный ответ LLM: {response.text[:200]}") from e
+                if response.status_code not in _RETRY_STATUSES or attempt >= self.max_retries:
+                    raise LLMError(f"LLM ответила HTTP {response.status_code}: {response.text[:200]}")
+                delay = _retry_delay(attempt, response.headers.get("retry-after"))
+                logger.warning(f"LLM ответила HTTP {response.status_code}, повтор через {delay:.1f} с")
+            metrics.inc("llm_retries")
+            await asyncio.sleep(delay)
+        raise LLMError("LLM: исчерпаны повторы")
+
+    async def _complete_and_cache(self, payload: Dict, key: str) -> str:
+        text = await self._post(payload)
+        self.cache.set(key, text)
+        return text
+
+    async def complete(self, messages: List[Dict], temperature: Optional[float] = None,
+                       max_tokens: Optional[int] = None, use_cache: bool = True) -> str:
+        """
+        Текст ответа модели. С use_cache одинаковый промпт берётся из кэша, а одновременные
+        одинаковые промпты ждут один общий запрос; use_cache=False — всегда новый запрос.
+        """
+        payload = self._payload(messages, temperature, max_tokens)
+        if not use_cache:
+            return await self._post(payload)
+        key = self._key(payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.inc("llm_cache_hits")
+            return cached
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._complete_and_cache(payload, key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            metrics.inc("llm_inflight_merged")
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    # --- стриминг ---
+
+    async def stream(self, messages: List[Dict], temperature: Optional[float] = None,
+                     max_tokens: Optional[int] = None, use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Куски текста ответа по мере генерации (SSE). Запрос повторяется, только если не пришло
+        ни одного куска. Полный ответ попадает в тот же кэш, что и у complete().
+        """
+        import httpx
+
+        payload = self._payload(messages, temperature, max_tokens)
+        key = self._key(payload)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.inc("llm_cache_hits")
+                yield cached
+                return
+
+        client = self._get_client()
+        parts: List[str] = []
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    async with client.stream("POST", "/chat/completions", json={**payload, "stream": True}) as response:
+                        if response.status_code >= 400:
+                            body = (await response.aread()).decode("utf-8", "replace")
+                            if response.status_code not in _RETRY_STATUSES or attempt >= self.max_retries:
+                                raise LLMError(f"LLM ответила HTTP {response.status_code}: {body[:200]}")
+                            retry_after = response.headers.get("retry-after")
+                        else:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                try:
+                                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                                except (ValueError, KeyError, IndexError, TypeError) as e:
+                                    raise LLMError(f"Некорректный кусок стрима LLM: {data[:200]}") from e
+                                if delta:
+                                    if not parts:
+                                        metrics.observe("llm_first_token", time.perf_counter() - start)
+                                    parts.append(delta)
+                                    yield delta
+                            metrics.observe("llm_request", time.perf_counter() - start)
+                            self.cache.set(key, "".join(parts))
+                            return
+            except httpx.TransportError as e:
+                if parts or attempt >= self.max_retries:
+                    raise LLMError(f"Стрим LLM прерван: {e}") from e
+                logger.warning(f"Ошибка соединения с LLM при стриминге ({e}), повтор")
+            delay = _retry_delay(attempt, retry_after)
+            metrics.inc("llm_retries")
+            await asyncio.sleep(delay)
+        raise LLMError("LLM: исчерпаны повторы")
+
+    async def stream_to_message(self, message, messages: List[Dict], **kwargs) -> str:
+        """
+        Стримит ответ в уже отправленное сообщение бота (текст заменяется по мере генерации).
+        Промежуточные правки — не чаще edit_interval секунд (лимиты Telegram на редактирование),
+        финальный текст отправляется всегда. Возвращает полный ответ.
+        """
+        from telegram.error import BadRequest, RetryAfter
+
+        shown = ""
+        next_edit = 0.0
+
+        async def _edit(new_text: str, final: bool):
+            nonlocal shown, next_edit
+            if new_text == shown:
+                return
+            for _ in range(2 if final else 1):
+                try:
+                    await message.edit_text(new_text)
+                    break
+                except RetryAfter as e:
+                    # промежуточную правку пропускаем, финальную — повторяем после паузы
+                    next_edit = time.monotonic() + e.retry_after
+                    if not final:
+                        return
+                    await asyncio.sleep(e.retry_after)
+                except BadRequest as e:
+                    if "not modified" not in str(e).lower():
+                        raise
+                    break
+            else:
+                # обе попытки упёрлись в RetryAfter — в сообщении остался прежний текст
+                logger.warning("Telegram не принял финальную правку стрима LLM (RetryAfter)")
+                return
+            shown = new_text
+            next_edit = max(next_edit, time.monotonic() + self.edit_interval)
+
+        text = ""
+        async for chunk in self.stream(messages, **kwargs):
+            text += chunk
+            if time.monotonic() >= next_edit and text.strip():
+                await _edit(text + _STREAM_CURSOR, final=False)
+        if text.strip():
+            await _edit(text, final=True)
+        return text
+
+
+# общий клиент LLM для всего процесса
+llm_client = LLMClient()
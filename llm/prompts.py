@@ -0,0 +1,98 @@
+# prompts.py
+"""
+Промпты голосового интервью в формате chat messages (OpenAI-совместимый API).
+Тексты детерминированы по входным данным: одинаковая вакансия и история дают одинаковый
+промпт — на этом держится кэш ответов в llm_interface.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+INTERVIEWER_SYSTEM = (
+    "Ты — HR-специалист, который проводит короткое голосовое интервью с кандидатом на вакансию. "
+    "Говоришь по-русски, вежливо и по делу. Вопросы будут озвучены голосом, поэтому пиши простыми "
+    "фразами без списков, markdown и эмодзи. Один вопрос — не длиннее двух предложений."
+)
+
+# Сколько последних реплик диалога передавать модели
+HISTORY_TURNS = 6
+
+_QUESTION_LINE = re.compile(r"^\s*(?:\d+[.)]|[-•*])\s*")
+
+
+def _vacancy_brief(vacancy: Dict) -> str:
+    """Короткое описание вакансии для промпта (сырой словарь или результат parse_vacancy)"""
+    parts = [f"Вакансия: {vacancy.get('title', '')}"]
+    if vacancy.get("experience"):
+        parts.append(f"Опыт: {vacancy['experience']}")
+    if vacancy.get("requirements"):
+        parts.append("Требования: " + "; ".join(vacancy["requirements"]))
+    if vacancy.get("responsibilities"):
+        parts.append("Обязанности: " + "; ".join(vacancy["responsibilities"]))
+    return "\n".join(parts)
+
+
+def _analysis_brief(analysis: Optional[Dict]) -> str:
+    """Итог анализа резюме (analyze_resume_vs_vacancy): на что обратить внимание в интервью"""
+    if not analysis:
+        return ""
+    text = (f"Оценка резюме: hard skills {analysis.get('hard_score', 0)}%, soft skills {analysis.get('soft_score', 0)}%, "
+            f"опыт по обязанностям {analysis.get('cases_score', 0)}%.")
+    if analysis.get("red_flags"):
+        text += " В резюме не подтверждены: " + "; ".join(analysis["red_flags"]) + "."
+    return text
+
+
+def question_set_messages(vacancy: Dict, count: int = 5) -> List[Dict]:
+    """
+    Базовый набор вопросов по вакансии — общий для всех кандидатов
+    (его заранее озвучивает voice.tts, ответ кэшируется).
+    """
+    return [
+        {"role": "system", "content": INTERVIEWER_SYSTEM},
+        {"role": "user", "content": (
+            f"{_vacancy_brief(vacancy)}\n\n"
+            f"Составь {count} вопросов для интервью по этой вакансии: от общего опыта к ключевым требованиям. "
+            f"Каждый вопрос с новой строки, без нумерации и пояснений."
+        )},
+    ]
+
+
+def next_question_messages(vacancy: Dict, history: List[Dict], analysis: Optional[Dict] = None) -> List[Dict]:
+    """
+    Следующий вопрос с учётом ответов кандидата.
+    history — [{"question": ..., "answer": ...}, ...] в порядке интервью.
+    """
+    messages = [
+        {"role": "system", "content": INTERVIEWER_SYSTEM},
+        {"role": "user", "content": "\n".join(filter(None, [
+            _vacancy_brief(vacancy),
+            _analysis_brief(analysis),
+            "Задавай по одному вопросу. Уточняй то, что кандидат ответил расплывчато, "
+            "и проверяй требования, не подтверждённые резюме.",
+        ]))},
+    ]
+    for turn in history[-HISTORY_TURNS:]:
+        messages.append({"role": "assistant", "content": turn["question"]})
+        messages.append({"role": "user", "content": turn.get("answer") or "(кандидат не ответил)"})
+    messages.append({"role": "user", "content": "Задай следующий вопрос."})
+    return messages
+
+
+def evaluate_answer_messages(vacancy: Dict, question: str, answer: str) -> List[Dict]:
+    """Короткая оценка одного ответа для отчёта HR (0–10 и одно предложение обоснования)"""
+    return [
+        {"role": "system", "content": "Ты оцениваешь ответы кандидата на интервью. Отвечай строго в формате "
+                                      "«оценка: N; комментарий: ...», где N от 0 до 10."},
+        {"role": "user", "content": f"{_vacancy_brief(vacancy)}\n\nВопрос: {question}\nОтвет кандидата: {answer}"},
+    ]
+
+
+def parse_questions(text: str) -> List[str]:
+    """Ответ модели на question_set_messages -> список вопросов (убирает нумерацию и пустые строки)"""
+    questions = []
+    for line in text.splitlines():
+        line = _QUESTION_LINE.sub("", line).strip()
+        if line:
+            questions.append(line)
+    return questions
@@ -1,6 +1,10 @@
 # logger.py
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 
 # Папка для логов
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "log-output")
@@ -9,25 +13,124 @@ os.makedirs(LOG_DIR, exist_ok=True)  # создаём папку, если её
 # Файл логов
 LOG_FILE = os.path.join(LOG_DIR, "ai_hr_bot.log")
 
-# Настройка логирования
+# Настройки (можно переопределить через .env)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json (JSON lines)
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")  # size | time
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", 20))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 7))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", 2000))
+
+
+def _truncate(message: str) -> str:
+    if LOG_MAX_MESSAGE_CHARS and len(message) > LOG_MAX_MESSAGE_CHARS:
+        return f"{message[:LOG_MAX_MESSAGE_CHARS]}… [+{len(message) - LOG_MAX_MESSAGE_CHARS} символов]"
+    return message
+
+
+class TruncatingFormatter(logging.Formatter):
+    """Текстовый формат с обрезкой слишком длинных сообщений."""
+
+    def formatMessage(self, record):
+        record.message = _truncate(record.message)
+        return super().formatMessage(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Кладёт запись в очередь, оставляя traceback отдельно от текста сообщения
+    (стандартный QueueHandler склеивает их, и обрезка съела бы traceback).
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "message": _truncate(record.getMessage()),
+        }
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _make_formatter():
+    if LOG_FORMAT == "json":
+        return JsonLinesFormatter(datefmt="%Y-%m-%d %H:%M:%S")
+    return TruncatingFormatter("%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
+
+def _make_file_handler(rotating: bool = True):
+    if not rotating:
+        # в дочерних процессах ротацию делает только основной процесс; WatchedFileHandler
+        # переоткрывает файл, когда тот переименован при ротации
+        return logging.handlers.WatchedFileHandler(LOG_FILE, encoding="utf-8")
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=int(LOG_MAX_MB * 1024 * 1024), backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+
+
+def _start_listener(log_queue, rotating: bool = True):
+    """Фоновый поток, который пишет записи из очереди в файл и консоль."""
+    formatter = _make_formatter()
+
+    # Лог в файл
+    file_handler = _make_file_handler(rotating)
+    file_handler.setFormatter(formatter)
+
+    # Лог в консоль
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+# Настройка логирования: в горячем пути logger.info только кладёт запись в очередь
 logger = logging.getLogger("AI_HR_Bot")
 logger.setLevel(logging.INFO)
 
-# Формат логов
-formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+_queue = queue.SimpleQueue()
+_listener = None
 
-# Лог в файл
-file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
-file_handler.setFormatter(formatter)
+if not logger.handlers:
+    _queue_handler = _QueueHandler(_queue)
+    logger.addHandler(_queue_handler)
+    _listener = _start_listener(_queue)
 
-# Лог в консоль
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
+    def _stop_listener():
+        # дописываем оставшиеся в очереди записи при завершении процесса
+        if _listener is not None:
+            _listener.stop()
 
-# Добавляем обработчики к логгеру
-if not logger.handlers:
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    def _restart_listener_in_child():
+        # поток-писатель не переживает fork — запускаем свой в процессе-воркере
+        # на новой очереди (записи, скопированные из родителя, допишет сам родитель)
+        global _listener
+        child_queue = queue.SimpleQueue()
+        _queue_handler.queue = child_queue
+        _listener = _start_listener(child_queue, rotating=False)
+
+    atexit.register(_stop_listener)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_listener_in_child)
 
 
 logger.info("Логгер инициализирован. Логи сохраняются в 'logs/log-output/'")
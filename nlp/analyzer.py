@@ -1,11 +1,159 @@
 # analyzer.py
 
-def analyze_resume_vs_vacancy(parsed_resume, normalized_vacancy):
-    # Заглушка
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from nlp.nlp_pipeline import pipe_docs
+
+# Маркеры soft-skill требований (коммуникация, командная работа и т.п.)
+SOFT_SKILL_MARKERS = (
+    "коммуникаб", "коммуникац", "команд", "ответствен", "презентац", "переговор", "обучаем",
+    "самостоятельн", "инициатив", "стрессоустойчив", "клиентоориент", "лидер",
+    "communication", "team", "responsib", "presentation", "negotiat", "leadership", "self-motivated",
+)
+
+# Веса итоговой оценки: hard skills, soft skills, кейсы (опыт выполнения обязанностей вакансии)
+SCORE_WEIGHTS = {"hard": 0.6, "soft": 0.15, "cases": 0.25}
+
+# Косинусное сходство векторов ниже LOW — "не про это", выше HIGH — полное совпадение
+SIM_LOW = 0.55
+SIM_HIGH = 0.85
+# Hard-требование с покрытием ниже этого порога считается отсутствующим (red flag)
+RED_FLAG_COVERAGE = 0.4
+
+_SENTENCE_SPLIT = re.compile(r"[.;!?•\n]+")
+_SENTENCE_MAX_WORDS = 12
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _embed(texts: List[str]) -> np.ndarray:
+    """Матрица единичных векторов текстов (пустая, если модель недоступна)."""
+    docs = pipe_docs(texts, "ru", stage="vectors")
+    if not docs:
+        return np.zeros((len(texts), 0), dtype=np.float32)
+    return _unit_rows(np.vstack([doc.vector for doc in docs]))
+
+
+def _is_soft(requirement: str) -> bool:
+    req = requirement.lower()
+    return any(marker in req for marker in SOFT_SKILL_MARKERS)
+
+
+def build_vacancy_vectors(normalized_vacancy: Dict) -> Dict:
+    """
+    Векторы требований и обязанностей вакансии (считаются один раз при загрузке каталога).
+    soft_mask отмечает soft-skill требования, остальные считаются hard.
+    """
+    requirements = normalized_vacancy.get("requirements", [])
+    responsibilities = normalized_vacancy.get("responsibilities", [])
     return {
-        "hard_score": 0,
-        "soft_score": 0,
-        "cases_score": 0,
-        "total_score": 0,
-        "red_flags": []
+        "requirements": requirements,
+        "responsibilities": responsibilities,
+        "req_matrix": _embed([r.lower() for r in requirements]),
+        "resp_matrix": _embed([r.lower() for r in responsibilities]),
+        "soft_mask": np.array([_is_soft(r) for r in requirements], dtype=bool),
     }
+
+
+def split_sentences(text: str) -> List[str]:
+    """Разбивает текст резюме на короткие фрагменты для сравнения с требованиями."""
+    sentences = []
+    for part in _SENTENCE_SPLIT.split(text or ""):
+        words = part.split()
+        for i in range(0, len(words), _SENTENCE_MAX_WORDS):
+            chunk = words[i:i + _SENTENCE_MAX_WORDS]
+            if len(chunk) >= 2:
+                sentences.append(" ".join(chunk))
+    return sentences
+
+
+def embed_resumes(parsed_resumes: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Векторы фрагментов всех резюме одной матрицей и смещения начала каждого резюме.
+    Можно посчитать один раз и переиспользовать для нескольких вакансий.
+    """
+    sentences, offsets = [], []
+    for parsed in parsed_resumes:
+        offsets.append(len(sentences))
+        sentences.extend(split_sentences(parsed.get("raw_text", "")))
+    return _embed(sentences), np.array(offsets, dtype=np.int64)
+
+
+def _best_per_resume(sims: np.ndarray, offsets: np.ndarray, n_rows: int) -> np.ndarray:
+    """Максимум сходства по фрагментам каждого резюме: (n_resumes, n_targets)."""
+    n_resumes, n_targets = len(offsets), sims.shape[1] if sims.ndim == 2 else 0
+    best = np.zeros((n_resumes, n_targets), dtype=np.float32)
+    if n_rows == 0 or n_targets == 0:
+        return best
+    # у резюме без фрагментов offset совпадает со следующим — такие строки остаются нулями
+    non_empty = np.append(offsets[1:], n_rows) > offsets
+    best[non_empty] = np.maximum.reduceat(sims, offsets[non_empty], axis=0)
+    return best
+
+
+def _coverage(similarity: np.ndarray) -> np.ndarray:
+    return np.clip((similarity - SIM_LOW) / (SIM_HIGH - SIM_LOW), 0.0, 1.0)
+
+
+def analyze_resumes_vs_vacancy(parsed_resumes: List[Dict], normalized_vacancy: Dict,
+                               embedded: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> List[Dict]:
+    """
+    Оценка пачки резюме против одной вакансии.
+    Фрагменты всех резюме сравниваются со всеми требованиями и обязанностями одним
+    матричным умножением; покрытие требования — максимум из семантического сходства
+    и найденного парсером совпадения навыка (skills_detailed).
+    embedded — результат embed_resumes, если векторы резюме уже посчитаны.
+    """
+    vectors = normalized_vacancy.get("vectors") or build_vacancy_vectors(normalized_vacancy)
+    sent_matrix, offsets = embedded if embedded is not None else embed_resumes(parsed_resumes)
+    req_matrix, resp_matrix = vectors["req_matrix"], vectors["resp_matrix"]
+    n_req = len(vectors["requirements"])
+
+    if sent_matrix.shape[1] and (n_req or len(vectors["responsibilities"])):
+        targets = np.vstack([m for m in (req_matrix, resp_matrix) if m.shape[1]])
+        sims = sent_matrix @ targets.T
+    else:
+        sims = np.zeros((len(sent_matrix), n_req + len(vectors["responsibilities"])), dtype=np.float32)
+    best = _coverage(_best_per_resume(sims, offsets, len(sent_matrix)))
+
+    req_index = {req: i for i, req in enumerate(vectors["requirements"])}
+    soft_mask = vectors["soft_mask"]
+    results = []
+    for r, parsed in enumerate(parsed_resumes):
+        req_cov = best[r, :n_req].copy()
+        for match in parsed.get("skills_detailed", []):
+            i = req_index.get(match["skill"])
+            if i is not None:
+                req_cov[i] = max(req_cov[i], match["score"] / 100)
+        resp_cov = best[r, n_req:]
+
+        scores = {
+            "hard": float(req_cov[~soft_mask].mean()) if (~soft_mask).any() else None,
+            "soft": float(req_cov[soft_mask].mean()) if soft_mask.any() else None,
+            "cases": float(resp_cov.mean()) if resp_cov.size else None,
+        }
+        present = {k: v for k, v in scores.items() if v is not None}
+        weight = sum(SCORE_WEIGHTS[k] for k in present)
+        total = sum(SCORE_WEIGHTS[k] * v for k, v in present.items()) / weight if weight else 0.0
+
+        red_flags = [vectors["requirements"][i] for i in np.flatnonzero(~soft_mask & (req_cov < RED_FLAG_COVERAGE))]
+        results.append({
+            "hard_score": round((scores["hard"] or 0) * 100),
+            "soft_score": round((scores["soft"] or 0) * 100),
+            "cases_score": round((scores["cases"] or 0) * 100),
+            "total_score": round(total * 100),
+            "red_flags": red_flags,
+        })
+    return results
+
+
+def analyze_resume_vs_vacancy(parsed_resume, normalized_vacancy):
+    """Оценка одного резюме против вакансии: hard/soft/cases/total в процентах и red_flags."""
+    return analyze_resumes_vs_vacancy([parsed_resume], normalized_vacancy)[0]
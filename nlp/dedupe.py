@@ -0,0 +1,70 @@
+# nlp/dedupe.py
+
+from typing import List, Sequence
+
+import numpy as np
+from datasketch import MinHash, MinHashLSH
+from rapidfuzz import fuzz
+
+
+def _char_shingles(text: str, k: int = 3) -> set:
+    """Множество символьных k-грамм сегмента (для MinHash)."""
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def _minhash(text: str, num_perm: int) -> MinHash:
+    m = MinHash(num_perm=num_perm)
+    m.update_batch([sh.encode("utf-8") for sh in _char_shingles(text)])
+    return m
+
+
+def fuzzy_dedupe_lsh(
+        segments: Sequence[str],
+        fuzzy_threshold: int = 82,
+        lsh_threshold: float = 0.3,
+        num_perm: int = 64
+) -> List[str]:
+    """
+    Fuzzy-фильтр повторов через MinHash LSH.
+    LSH отбирает кандидатов среди уже оставленных сегментов, и только с ними
+    сегмент сравнивается через fuzz.partial_ratio — вместо сравнения со всеми.
+    lsh_threshold — порог Жаккара для кандидатов: чем ниже, тем ближе результат
+    к полному попарному сравнению (и тем больше проверок partial_ratio).
+    """
+    lsh = MinHashLSH(threshold=lsh_threshold, num_perm=num_perm)
+    kept: List[str] = []
+    for seg in segments:
+        mh = _minhash(seg, num_perm)
+        candidates = lsh.query(mh)
+        if any(fuzz.partial_ratio(seg, kept[idx]) >= fuzzy_threshold for idx in candidates):
+            continue
+        lsh.insert(len(kept), mh)
+        kept.append(seg)
+    return kept
+
+
+def semantic_dedupe_vectors(vectors: np.ndarray, threshold: float = 0.90) -> List[int]:
+    """
+    Семантический фильтр: оставляет индексы сегментов, косинусное сходство которых
+    со всеми ранее оставленными ниже threshold.
+    vectors — матрица (n_segments, dim) векторов сегментов (doc.vector).
+    Нулевые векторы, как и в spaCy doc.similarity, дают сходство 0.
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    kept_idx: List[int] = []
+    kept = np.empty_like(unit)
+    for i in range(n):
+        k = len(kept_idx)
+        if k and float(np.max(kept[:k] @ unit[i])) >= threshold:
+            continue
+        kept[k] = unit[i]
+        kept_idx.append(i)
+    return kept_idx
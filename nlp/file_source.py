@@ -0,0 +1,55 @@
+# nlp/file_source.py
+
+import io
+import os
+from contextlib import contextmanager, nullcontext
+from typing import BinaryIO, Union
+
+# Источник резюме: путь к файлу, содержимое в памяти или открытый бинарный файл
+Source = Union[str, os.PathLike, bytes, bytearray, BinaryIO]
+
+
+def is_path(source: Source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def read_source_bytes(source: Source) -> bytes:
+    """Содержимое источника целиком в виде bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if is_path(source):
+        with open(source, "rb") as f:
+            return f.read()
+    source.seek(0)
+    return source.read()
+
+
+def picklable_source(source: Source) -> Union[str, os.PathLike, bytes]:
+    """Путь или bytes — то, что можно передать в другой процесс."""
+    return source if is_path(source) or isinstance(source, bytes) else read_source_bytes(source)
+
+
+def source_size(source: Source) -> int:
+    """Размер источника в байтах без чтения содержимого."""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if is_path(source):
+        return os.path.getsize(source)
+    pos = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(pos)
+    return size
+
+
+@contextmanager
+def open_source(source: Source):
+    """Бинарный файловый объект для источника (файл закрывается, только если открыт здесь)."""
+    if is_path(source):
+        with open(source, "rb") as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+    else:
+        source.seek(0)
+        with nullcontext(source) as f:
+            yield f
@@ -0,0 +1,131 @@
+# nlp/multi_matcher.py
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик: поиск всех фраз за один проход по тексту."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self.patterns: List[str] = []
+
+    def add(self, pattern: str) -> int:
+        """Добавляет фразу, возвращает её номер."""
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self.patterns.append(pattern)
+        self._out[node].append(len(self.patterns) - 1)
+        return len(self.patterns) - 1
+
+    def build(self):
+        """Строит fail-ссылки (BFS по бору)."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> set:
+        """Номера всех фраз, встретившихся в тексте."""
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found.update(self._out[node])
+        return found
+
+
+class MultiVacancyMatcher:
+    """
+    Сопоставление резюме сразу со всеми вакансиями каталога.
+    Строится из индексов навыков (build_skill_index) один раз при загрузке каталога;
+    одинаковые требования разных вакансий проверяются один раз.
+    """
+
+    def __init__(self, skill_indexes: Dict):
+        self.skill_indexes = skill_indexes
+        self._automaton = AhoCorasick()
+        self._phrase_ids: Dict[str, int] = {}
+        self._lemma_to_phrases: Dict[str, set] = {}
+
+        for index in skill_indexes.values():
+            for entry in index["skills"]:
+                phrase = entry["phrase"]
+                if phrase not in self._phrase_ids:
+                    self._phrase_ids[phrase] = self._automaton.add(phrase)
+                for lemma in entry["lemmas"]:
+                    self._lemma_to_phrases.setdefault(lemma, set()).add(phrase)
+        self._automaton.build()
+
+    def match(self, text_norm: str, token_set: set, fuzzy_threshold: int = 75,
+              fuzzy_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Dict]]:
+        """
+        Один проход по резюме — совпадения навыков для всех вакансий.
+        Fuzzy-сравнение (partial_ratio по всему тексту) дорогое, поэтому выполняется только для вакансий
+        из fuzzy_ids (None — для всех); остальные сопоставляются по фразам и леммам.
+        Возвращает {vacancy_id: [{"skill", "match_type", "score"}, ...]} в формате extract_skills_from_text.
+        """
+        from rapidfuzz import fuzz
+
+        patterns = self._automaton.patterns
+        phrase_hits = {patterns[i] for i in self._automaton.find_all(text_norm)}
+        token_hits = set()
+        for lemma in token_set:
+            token_hits.update(self._lemma_to_phrases.get(lemma, ()))
+
+        fuzzy_ids = None if fuzzy_ids is None else set(fuzzy_ids)
+        fuzzy_cache: Dict[str, int] = {}
+        results: Dict[int, List[Dict]] = {}
+        for vac_id, index in self.skill_indexes.items():
+            fuzzy = fuzzy_ids is None or vac_id in fuzzy_ids
+            vac_results = []
+            for entry in index["skills"]:
+                phrase = entry["phrase"]
+                if phrase in phrase_hits:
+                    vac_results.append({"skill": entry["skill"], "match_type": "phrase", "score": 100})
+                elif phrase in token_hits:
+                    vac_results.append({"skill": entry["skill"], "match_type": "token", "score": 90})
+                elif fuzzy:
+                    if phrase not in fuzzy_cache:
+                        fuzzy_cache[phrase] = int(fuzz.partial_ratio(phrase, text_norm))
+                    if fuzzy_cache[phrase] >= fuzzy_threshold:
+                        vac_results.append({"skill": entry["skill"], "match_type": "fuzzy",
+                                            "score": fuzzy_cache[phrase]})
+            results[vac_id] = vac_results
+        return results
+
+
+def rank_vacancies(matches: Dict[int, List[Dict]], skill_indexes: Dict, top_n: int = 3) -> List[Tuple[int, int]]:
+    """
+    Лучшие вакансии по покрытию требований: [(vacancy_id, percent), ...] по убыванию.
+    Процент — сумма score найденных навыков относительно максимума по всем требованиям.
+    """
+    ranked = []
+    for vac_id, vac_matches in matches.items():
+        total = len(skill_indexes[vac_id]["skills"])
+        if not total or not vac_matches:
+            continue
+        percent = round(sum(m["score"] for m in vac_matches) / total)
+        ranked.append((vac_id, percent))
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked[:top_n]
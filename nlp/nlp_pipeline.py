@@ -0,0 +1,60 @@
+# nlp/nlp_pipeline.py
+
+import os
+import threading
+from typing import Iterable, List
+
+from logs.logger import logger
+
+# Размер батча для nlp.pipe (можно переопределить через .env); сравнение размеров и замер против
+# nlp(seg) по одному сегменту — стадия pipe_vs_sequential в bench/run_bench.py
+PIPE_BATCH_SIZE = int(os.getenv("NLP_PIPE_BATCH_SIZE", 64))
+
+# Какие компоненты пайплайна нужны каждой стадии. Токенизатор работает всегда,
+# is_stop и статические векторы (doc.vector) берутся из словаря без компонентов.
+# Лемматизаторы ru (pymorphy) и en (rule) опираются на POS, поэтому для лемм
+# оставляем tok2vec + morphologizer/tagger + attribute_ruler; parser и ner не нужны никогда.
+STAGE_COMPONENTS = {
+    "vectors": set(),
+    "lemmas": {"tok2vec", "morphologizer", "tagger", "attribute_ruler", "lemmatizer"},
+}
+
+# Ленивая загрузка spaCy моделей
+_nlp_cache = {}
+# фоновый прогрев и построение индексов по первому резюме могут запросить модель одновременно
+_nlp_lock = threading.Lock()
+
+
+def get_nlp(lang: str = "ru"):
+    """Ленивая загрузка spaCy модели. Если модель не установлена — возвращает None."""
+    if lang in _nlp_cache:
+        return _nlp_cache[lang]
+    with _nlp_lock:
+        if lang not in _nlp_cache:
+            import spacy
+            model_name = "ru_core_news_lg" if lang == "ru" else "en_core_web_sm"
+            try:
+                _nlp_cache[lang] = spacy.load(model_name)
+            except Exception as e:
+                logger.warning(f"spaCy модель '{model_name}' не найдена ({e}), извлечение навыков будет ограничено")
+                _nlp_cache[lang] = None
+    return _nlp_cache[lang]
+
+
+def pipe_docs(texts: Iterable[str], lang: str = "ru", stage: str = "lemmas",
+              batch_size: int = PIPE_BATCH_SIZE) -> List:
+    """
+    Прогоняет тексты батчами через nlp.pipe, оставляя только компоненты стадии.
+    Возвращает список Doc в порядке текстов или [] если модель недоступна.
+    """
+    texts = list(texts)
+    nlp = get_nlp(lang)
+    if nlp is None or not texts:
+        return []
+
+    keep = STAGE_COMPONENTS[stage]
+    # disable только на этот вызов: select_pipes меняет общий для процесса nlp, а pipe_docs
+    # одновременно вызывают поток слежения за каталогом и обработчики (asyncio.to_thread)
+    disable = [name for name in nlp.pipe_names if name not in keep]
+    return list(nlp.pipe(texts, batch_size=batch_size, disable=disable))
+
@@ -0,0 +1,174 @@
+# nlp/parse_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", os.path.join(BASE_DIR, "data", "cache", "parse_cache.sqlite"))
+PARSE_CACHE_MAX_MB = float(os.getenv("PARSE_CACHE_MAX_MB", 200))
+# Как часто (с) процесс сбрасывает накопленные время доступа и счётчики в базу
+PARSE_CACHE_FLUSH_INTERVAL = float(os.getenv("PARSE_CACHE_FLUSH_INTERVAL", 30))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    key TEXT PRIMARY KEY,
+    normalized_text TEXT NOT NULL,
+    deduped_text TEXT NOT NULL,
+    tokens TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_parse_cache_access ON parse_cache(last_access);
+CREATE TABLE IF NOT EXISTS parse_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO parse_cache_stats(name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    # соединение в autocommit: несколько изменений — одна транзакция записи
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def content_key(data: bytes, parser_version: str) -> str:
+    """Ключ кэша: sha256 содержимого файла + версия парсера."""
+    return f"{hashlib.sha256(data).hexdigest()}:{parser_version}"
+
+
+class ParseCache:
+    """
+    Постоянный кэш результатов извлечения текста в SQLite (content-addressed).
+    Хранит нормализованный текст, текст после дедупликации и множество токенов/лемм.
+    При превышении max_bytes вытесняет давно не использованные записи.
+    Счётчики попаданий/промахов хранятся в той же базе — общие для всех воркеров.
+    Чтение из кэша ничего не пишет: время доступа и счётчики копятся в памяти процесса и
+    сбрасываются одной транзакцией при записи в кэш или раз в flush_interval секунд, чтобы
+    воркеры не упирались в блокировку записи SQLite на каждом попадании.
+    """
+
+    def __init__(self, path: str = PARSE_CACHE_PATH, max_bytes: int = int(PARSE_CACHE_MAX_MB * 1024 * 1024),
+                 flush_interval: float = PARSE_CACHE_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._pending_access: Dict[str, float] = {}
+        self._pending_stats: Dict[str, int] = {}
+        self._last_flush = time.monotonic()
+
+    def _connect(self) -> sqlite3.Connection:
+        # соединение открывается лениво и заново в каждом процессе (после fork)
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            if self._pid is not None:
+                # накопленное родителем до fork сбросит сам родитель
+                self._pending_access.clear()
+                self._pending_stats.clear()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _bump(self, name: str, delta: int = 1):
+        self._pending_stats[name] = self._pending_stats.get(name, 0) + delta
+
+    def _write_pending(self, conn: sqlite3.Connection):
+        # вызывается внутри транзакции записи
+        if self._pending_access:
+            conn.executemany("UPDATE parse_cache SET last_access = MAX(last_access, ?) WHERE key = ?",
+                             [(ts, key) for key, ts in self._pending_access.items()])
+        if self._pending_stats:
+            conn.executemany("UPDATE parse_cache_stats SET value = value + ? WHERE name = ?",
+                             [(delta, name) for name, delta in self._pending_stats.items()])
+        self._pending_access.clear()
+        self._pending_stats.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """Сбрасывает накопленные время доступа и счётчики в базу одной транзакцией."""
+        if not self._pending_access and not self._pending_stats:
+            return
+        conn = self._connect()
+        with _transaction(conn):
+            self._write_pending(conn)
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Возвращает {"normalized_text", "deduped_text", "tokens"} или None."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT normalized_text, deduped_text, tokens FROM parse_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._bump("misses")
+        else:
+            self._pending_access[key] = time.time()
+            self._bump("hits")
+        self._maybe_flush()
+        if row is None:
+            return None
+        return {"normalized_text": row[0], "deduped_text": row[1], "tokens": set(json.loads(row[2]))}
+
+    def put(self, key: str, normalized_text: str, deduped_text: str, tokens: set):
+        """Сохраняет результат разбора и при необходимости вытесняет старые записи."""
+        conn = self._connect()
+        tokens_json = json.dumps(sorted(tokens), ensure_ascii=False)
+        size = len(normalized_text.encode("utf-8")) + len(deduped_text.encode("utf-8")) + len(tokens_json.encode("utf-8"))
+        now = time.time()
+        with _transaction(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO parse_cache(key, normalized_text, deduped_text, tokens, size, created_at, "
+                "last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, normalized_text, deduped_text, tokens_json, size, now, now),
+            )
+            # время доступа нужно вытеснению актуальным — сбрасываем накопленное в той же транзакции
+            self._write_pending(conn)
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # вытесняем до 90% лимита, чтобы не чистить на каждой записи
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM parse_cache ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        conn.execute("UPDATE parse_cache_stats SET value = value + ? WHERE name = 'evictions'", (evicted,))
+
+    def stats(self) -> Dict[str, int]:
+        """Счётчики hits/misses/evictions, число записей и занятый объём в байтах."""
+        self.flush()
+        conn = self._connect()
+        stats = dict(conn.execute("SELECT name, value FROM parse_cache_stats").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parse_cache").fetchone()
+        stats.update({"entries": entries, "bytes": size})
+        return stats
+
+
+# общий экземпляр кэша разбора
+parse_cache = ParseCache()
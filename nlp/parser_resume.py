@@ -2,31 +2,39 @@
 
 import os
 import re
+import sqlite3
+import time
 from typing import Dict, List, Optional
 
-import numpy as np
-import pdfplumber
-import docx
-from rapidfuzz import fuzz
-from striprtf.striprtf import rtf_to_text
-from torch import cosine_similarity
+# numpy, docx, rapidfuzz, striprtf, pdfminer/pdfplumber и datasketch импортируются внутри стадий,
+# которые их используют: импорт модуля (и бота, который его подтягивает) остаётся быстрым
 
+from logs.logger import logger
+from nlp.file_source import Source, is_path, open_source, read_source_bytes
+from nlp.multi_matcher import MultiVacancyMatcher
+from nlp.nlp_pipeline import get_nlp, pipe_docs
+from nlp.parse_cache import content_key, parse_cache
+from nlp.skill_index import build_skill_index, is_valid_skill_token
 from nlp.vacancy_parcer import parse_vacancy
 
-# Ленивая загрузка spaCy моделей
-_nlp_cache = {}
+# Версия парсера: входит в ключ кэша, повышать при изменении извлечения/дедупликации/токенизации
+PARSER_VERSION = "1"
 
-def get_nlp(lang: str = "ru"):
-    """Ленивая загрузка spaCy модели. Если модель не установлена — возвращает None."""
-    import spacy
-    if lang not in _nlp_cache:
-        model_name = "ru_core_news_lg" if lang == "ru" else "en_core_web_sm"
-        try:
-            _nlp_cache[lang] = spacy.load(model_name)
-        except Exception as e:
-            print(f"[WARN] spaCy model '{model_name}' not found ({e}). Skills extraction will be limited.")
-            _nlp_cache[lang] = None
-    return _nlp_cache[lang]
+
+def warmup_models(langs=("ru", "en")) -> Dict[str, float]:
+    """
+    Заранее загружает spaCy модели (вызывается при старте бота до запуска воркеров).
+    Возвращает время загрузки каждой модели в секундах.
+    """
+    timings = {}
+    for lang in langs:
+        start = time.perf_counter()
+        nlp = get_nlp(lang)
+        if nlp is not None:
+            # прогон короткого текста инициализирует ленивые таблицы лемматизатора/векторов
+            nlp("warmup прогрев")
+        timings[lang] = time.perf_counter() - start
+    return timings
 
 
 def _normalize_text(text: str) -> str:
@@ -38,17 +46,21 @@ def _normalize_text(text: str) -> str:
     return text
 
 
-def extract_text_from_rtf(file_path: str) -> str:
-    """Извлекает текст из RTF файла через striprtf."""
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        rtf_content = f.read()
+def extract_text_from_rtf(source: Source) -> str:
+    """Извлекает текст из RTF (путь, bytes или бинарный файл) через striprtf."""
+    from striprtf.striprtf import rtf_to_text
+
+    rtf_content = read_source_bytes(source).decode("utf-8", errors="ignore")
     text = rtf_to_text(rtf_content)
     return text
 
 
-def extract_text_from_docx(file_path: str) -> str:
-    """Извлекает текст из DOCX файла, включая таблицы."""
-    doc = docx.Document(file_path)
+def extract_text_from_docx(source: Source) -> str:
+    """Извлекает текст из DOCX (путь, bytes или бинарный файл), включая таблицы."""
+    import docx
+
+    with open_source(source) as f:
+        doc = docx.Document(f)
     full_text = []
 
     # Текст из параграфов
@@ -66,24 +78,31 @@ def extract_text_from_docx(file_path: str) -> str:
     return "\n".join(full_text)
 
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Извлекает текст из PDF файла через pdfplumber."""
-    with pdfplumber.open(file_path) as pdf:
-        pages = [page.extract_text() for page in pdf.pages]
-        text = "\n".join(filter(None, pages))
-    return text
+def extract_text_from_pdf(source: Source) -> str:
+    """
+    Извлекает текст из PDF (путь, bytes или бинарный файл) постранично с лимитами на размер, число страниц и время.
+    Текстовый слой читается без layout-анализа, pdfplumber — только там, где он нужен.
+    """
+    from nlp.pdf_extractor import extract_pdf_text
 
+    return extract_pdf_text(source)
 
-def extract_text_from_file(file_path: str) -> str:
-    """Извлекает текст из PDF, DOCX или RTF файла."""
-    ext = os.path.splitext(file_path)[1].lower()
+
+def extract_text_from_file(source: Source, file_name: Optional[str] = None) -> str:
+    """
+    Извлекает текст из PDF, DOCX или RTF.
+    source — путь, bytes или бинарный файл; для содержимого в памяти формат берётся из file_name.
+    """
+    if file_name is None and is_path(source):
+        file_name = os.fspath(source)
+    ext = os.path.splitext(file_name or "")[1].lower()
 
     if ext == ".pdf":
-        text = extract_text_from_pdf(file_path)
+        text = extract_text_from_pdf(source)
     elif ext == ".docx":
-        text = extract_text_from_docx(file_path)
+        text = extract_text_from_docx(source)
     elif ext == ".rtf":
-        text = extract_text_from_rtf(file_path)
+        text = extract_text_from_rtf(source)
     else:
         raise ValueError(f"Unsupported file format: {ext}")
 
@@ -100,7 +119,9 @@ def dedupe_text_combined(
         fuzzy_threshold: int = 82,
         nlp_threshold: float = 0.90,
         lang: str = "ru",
-        overlap: Optional[int] = 5
+        overlap: Optional[int] = 5,
+        lsh_threshold: float = 0.3,
+        num_perm: int = 64
 ) -> str:
     """
     Профессиональная очистка текста от повторов:
@@ -110,7 +131,12 @@ def dedupe_text_combined(
     - nlp_threshold: косинусное сходство spaCy
     - lang: 'ru' или 'en'
     - overlap: количество слов для перекрытия при скользящем окне
+    - lsh_threshold: порог Жаккара для отбора кандидатов MinHash LSH (точность vs скорость)
+    - num_perm: число перестановок MinHash
     """
+    import numpy as np
+    from nlp.dedupe import fuzzy_dedupe_lsh, semantic_dedupe_vectors
+
     nlp = get_nlp(lang)
     if not nlp:
         print("[WARN] NLP модель не доступна, будет использован только fuzzy фильтр.")
@@ -132,117 +158,144 @@ def dedupe_text_combined(
             segments.append(" ".join(chunk))
         i += chunk_size - overlap
 
-    # 1️⃣ Быстрый fuzzy фильтр
-    deduped_segments = []
-    for seg in segments:
-        if any(fuzz.partial_ratio(seg, ds) >= fuzzy_threshold for ds in deduped_segments):
-            continue
-        deduped_segments.append(seg)
-
-    # 2️⃣ Косинусное сходство через spaCy
-    if nlp:
-        final_segments = []
-        docs = [nlp(seg) for seg in deduped_segments]
-        for doc in docs:
-            if any(doc.similarity(fdoc) >= nlp_threshold for fdoc in final_segments):
-                continue
-            final_segments.append(doc)
-        return " ".join([d.text for d in final_segments])
+    # 1️⃣ Быстрый fuzzy фильтр: кандидаты через MinHash LSH, проверка partial_ratio
+    deduped_segments = fuzzy_dedupe_lsh(segments, fuzzy_threshold, lsh_threshold, num_perm)
+
+    # 2️⃣ Косинусное сходство по матрице векторов сегментов
+    if nlp and deduped_segments:
+        # Для векторов компоненты не нужны — только токенизатор и статические векторы
+        vectors = np.vstack([doc.vector for doc in pipe_docs(deduped_segments, lang, stage="vectors")])
+        kept_idx = semantic_dedupe_vectors(vectors, nlp_threshold)
+        return " ".join(deduped_segments[idx] for idx in kept_idx)
 
     # Если NLP не доступна, возвращаем результат только с fuzzy
     return " ".join(deduped_segments)
 
 
-def _is_valid_skill_token(token_text: str) -> bool:
-    """
-    Проверка, что токен может быть техническим навыком.
-    Разрешаем буквы, цифры и ограниченный набор спецсимволов (+ # . - /).
-    """
-    token_text = token_text.lower()
-    if token_text in {"c++", "c#", ".net"}:
-        return True
-    return bool(re.match(r"^[a-zа-я0-9+#./-]+$", token_text, flags=re.IGNORECASE))
-
-
-
-def extract_skills_from_text(text: str, vacancy_data: Dict, fuzzy_threshold: int = 75) -> List[Dict]:
-    """
-    Находит навыки из vacancy_data['requirements'] в тексте резюме.
-    Возвращает список словарей: {"skill": ..., "match_type": "phrase|token|fuzzy", "score": int}.
-    """
-    if not vacancy_data or "requirements" not in vacancy_data:
-        return []
-
-    # Нормализуем текст один раз
-    text_norm = text.lower()
-
-    # Загружаем NLP (лениво)
-    nlp_ru = get_nlp("ru")
-    nlp_en = get_nlp("en")
-
-    # Токены резюме (леммы + тех. токены)
+def resume_token_set(text_norm: str) -> set:
+    """Токены резюме (леммы + тех. токены): батчем, без parser/ner."""
     token_set: set = set()
-    if nlp_ru:
-        for t in nlp_ru(text_norm):
-            if not t.is_stop and _is_valid_skill_token(t.text):
-                token_set.add((t.lemma_ or t.text).lower())
-    if nlp_en:
-        for t in nlp_en(text_norm):
-            if not t.is_stop and _is_valid_skill_token(t.text):
-                token_set.add((t.lemma_ or t.text).lower())
+    for lang in ("ru", "en"):
+        for doc in pipe_docs([text_norm], lang, stage="lemmas"):
+            for t in doc:
+                if not t.is_stop and is_valid_skill_token(t.text):
+                    token_set.add((t.lemma_ or t.text).lower())
+    return token_set
 
-    results: List[Dict] = []
-    required_skills = [s for s in vacancy_data.get("requirements", []) if isinstance(s, str) and s.strip()]
 
-    for skill in required_skills:
-        sk_norm = skill.lower()
+def match_skill_index(text_norm: str, token_set: set, skill_index: Dict, fuzzy_threshold: int = 75) -> List[Dict]:
+    """Сопоставление резюме с предкомпилированным индексом навыков вакансии."""
+    from rapidfuzz import fuzz
 
+    results: List[Dict] = []
+    for entry in skill_index["skills"]:
         # 1) Фразовое совпадение
-        if sk_norm in text_norm:
-            results.append({"skill": skill, "match_type": "phrase", "score": 100})
+        if entry["phrase"] in text_norm:
+            results.append({"skill": entry["skill"], "match_type": "phrase", "score": 100})
             continue
 
-        # 2) Токен-совпадение (считаем леммы навыка только если до сюда дошли)
-        skill_token_list: List[str] = []
-        if nlp_ru:
-            for t in nlp_ru(sk_norm):
-                if _is_valid_skill_token(t.text):
-                    skill_token_list.append((t.lemma_ or t.text).lower())
-        if nlp_en:
-            for t in nlp_en(sk_norm):
-                if _is_valid_skill_token(t.text):
-                    skill_token_list.append((t.lemma_ or t.text).lower())
-
-        if skill_token_list and any(tok in token_set for tok in skill_token_list):
-            results.append({"skill": skill, "match_type": "token", "score": 90})
+        # 2) Токен-совпадение по заранее посчитанным леммам
+        if entry["lemmas"] and not entry["lemmas"].isdisjoint(token_set):
+            results.append({"skill": entry["skill"], "match_type": "token", "score": 90})
             continue
 
         # 3) Fuzzy-совпадение (опечатки/варианты)
-        fscore = int(fuzz.partial_ratio(sk_norm, text_norm))
+        fscore = int(fuzz.partial_ratio(entry["phrase"], text_norm))
         if fscore >= fuzzy_threshold:
-            results.append({"skill": skill, "match_type": "fuzzy", "score": fscore})
+            results.append({"skill": entry["skill"], "match_type": "fuzzy", "score": fscore})
 
     return results
 
 
+def extract_skills_from_text(text: str, vacancy_data: Dict, fuzzy_threshold: int = 75,
+                             skill_index: Optional[Dict] = None) -> List[Dict]:
+    """
+    Находит навыки из vacancy_data['requirements'] в тексте резюме.
+    skill_index — готовый индекс из VacancyManager; если не передан, строится на лету.
+    Возвращает список словарей: {"skill": ..., "match_type": "phrase|token|fuzzy", "score": int}.
+    """
+    if skill_index is None:
+        if not vacancy_data or "requirements" not in vacancy_data:
+            return []
+        skill_index = build_skill_index(vacancy_data)
 
+    # Нормализуем текст один раз
+    text_norm = text.lower()
+    return match_skill_index(text_norm, resume_token_set(text_norm), skill_index, fuzzy_threshold)
 
 
 # ------------------- Основная функция -------------------
-def parse_resume(file_path: str, raw_vacancy: Dict = None) -> Dict:
+def parse_resume(source: Source, raw_vacancy: Dict = None, skill_index: Optional[Dict] = None,
+                 multi_matcher: Optional[MultiVacancyMatcher] = None, use_cache: bool = True,
+                 file_name: Optional[str] = None, timings: Optional[Dict] = None) -> Dict:
     """
     Парсит резюме, нормализует текст, извлекает навыки и структурированный опыт.
+    source — путь к файлу, bytes или бинарный файл (тогда нужен file_name для определения формата).
     raw_vacancy — это исходный словарь вакансии из базы данных.
+    skill_index — предкомпилированный индекс навыков вакансии (VacancyManager.get_skill_index).
+    multi_matcher — если передан, резюме за тот же проход сопоставляется со всеми вакансиями
+    (результат в parsed["vacancy_matches"]; при заданном skill_index fuzzy-поиск — только по его вакансии).
+    use_cache — брать текст/токены из кэша по хэшу содержимого файла (повторные загрузки).
+    timings — если передан словарь, в него пишется длительность стадий (с) и флаг cache_hit.
     """
-    text = extract_text_from_file(file_path)
-    text = dedupe_text_combined(text)
-
-    # Нормализуем и парсим данные вакансии (если передана)
-    vacancy_data = parse_vacancy(raw_vacancy) if raw_vacancy else None
+    timings = {} if timings is None else timings
+    mark = time.perf_counter()
+
+    def _stage(name):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = now - mark
+        mark = now
+
+    cached = None
+    if use_cache:
+        cache_key = content_key(read_source_bytes(source), PARSER_VERSION)
+        try:
+            cached = parse_cache.get(cache_key)
+        except (sqlite3.Error, OSError) as e:
+            # кэш — только ускорение: заблокированная или переполненная база не должна ломать разбор
+            logger.warning(f"Кэш разбора недоступен, резюме разбирается без него: {e}")
+        _stage("cache_lookup")
+    timings["cache_hit"] = bool(cached)
+
+    if cached:
+        text = cached["deduped_text"]
+        text_norm = text.lower()
+        token_set = cached["tokens"]
+    else:
+        normalized_text = extract_text_from_file(source, file_name)
+        _stage("extract")
+        text = dedupe_text_combined(normalized_text)
+        _stage("dedupe")
+        text_norm = text.lower()
+        token_set = resume_token_set(text_norm)
+        _stage("tokens")
+        if use_cache:
+            try:
+                parse_cache.put(cache_key, normalized_text, text, token_set)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Не удалось сохранить разбор резюме в кэш: {e}")
+            _stage("cache_store")
+
+    # Нормализуем и парсим данные вакансии (если передана и нет готового индекса)
+    if skill_index is None and raw_vacancy:
+        skill_index = build_skill_index(parse_vacancy(raw_vacancy))
+
+    vacancy_matches = None
+    if multi_matcher is not None:
+        # fuzzy — только для выбранной вакансии: для всего каталога это O(каталог) partial_ratio на резюме
+        fuzzy_ids = [skill_index["id"]] if skill_index is not None else None
+        vacancy_matches = multi_matcher.match(text_norm, token_set, fuzzy_ids=fuzzy_ids)
 
     # Извлекаем навыки (если есть данные вакансии)
-    skills_detailed = extract_skills_from_text(text, vacancy_data) if vacancy_data else []
+    if skill_index is None:
+        skills_detailed = []
+    elif vacancy_matches is not None and skill_index["id"] in vacancy_matches:
+        skills_detailed = vacancy_matches[skill_index["id"]]
+    else:
+        skills_detailed = match_skill_index(text_norm, token_set, skill_index)
     skills = [s["skill"] for s in skills_detailed]
+    _stage("skills")
 
     parsed = {
         "raw_text": text,
@@ -251,6 +304,8 @@ def parse_resume(file_path: str, raw_vacancy: Dict = None) -> Dict:
         "experience": [],
         "education": [],
     }
+    if vacancy_matches is not None:
+        parsed["vacancy_matches"] = vacancy_matches
     return parsed
 
 
@@ -0,0 +1,217 @@
+# nlp/pdf_extractor.py
+
+import io
+import multiprocessing
+import os
+import time
+from typing import Iterator, List, Optional
+
+from pdfminer.converter import PDFLayoutAnalyzer
+from pdfminer.layout import LTChar, LTContainer, LTPage
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+
+from logs.logger import logger
+from nlp.file_source import Source, is_path, open_source, picklable_source, source_size
+
+# Ограничения на обработку PDF (можно переопределить через .env)
+PDF_MAX_BYTES = int(float(os.getenv("PDF_MAX_MB", 20)) * 1024 * 1024)
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 50))
+PDF_TIME_LIMIT = float(os.getenv("PDF_TIME_LIMIT", 30))
+PDF_MAX_TEXT_CHARS = int(os.getenv("PDF_MAX_TEXT_CHARS", 200_000))
+# Документы от стольких страниц разбираются параллельно в нескольких процессах
+# (только вне процессов-воркеров: там параллельность уже даёт пул анализа/скрининга)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 16))
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", 4))
+
+# Если в тексте страницы пробельных символов меньше этой доли — слова "склеены",
+# и страницу нужно разобрать через pdfplumber с анализом раскладки
+_MIN_SPACE_RATIO = 0.05
+
+
+class PdfTooLargeError(ValueError):
+    """PDF превышает допустимый размер файла"""
+
+
+class _PdfTimeLimit(Exception):
+    """Разбор не уложился в лимит времени (прерывание посреди страницы)"""
+
+
+def count_pdf_pages(source: Source) -> int:
+    """Число страниц из каталога PDF без разбора самих страниц."""
+    with open_source(source) as fp:
+        doc = PDFDocument(PDFParser(fp))
+        try:
+            return int(resolve1(doc.catalog["Pages"])["Count"])
+        except (KeyError, TypeError, ValueError):
+            return sum(1 for _ in PDFPage.create_pages(doc))
+
+
+def _needs_layout(text: str) -> bool:
+    stripped = text.strip()
+    spaces = sum(1 for ch in stripped if ch.isspace())
+    return bool(stripped) and spaces / len(stripped) < _MIN_SPACE_RATIO
+
+
+class _TextLayer(PDFLayoutAnalyzer):
+    """
+    Текстовый слой страницы без анализа раскладки (laparams=None): символы в порядке вывода,
+    перевод строки — при смене базовой линии. Разбор прерывается _PdfTimeLimit, как только
+    наступил deadline (time.monotonic()), — проверка на каждой текстовой и графической операции,
+    поэтому «тяжёлая» страница не дорабатывается до конца. Без сигналов: SIGALRM (и общий с ним
+    ITIMER_REAL) занят жёстким лимитом задачи в воркере анализа, а проверка работает в любом потоке.
+    """
+
+    def __init__(self, rsrcmgr: PDFResourceManager, deadline: Optional[float] = None):
+        super().__init__(rsrcmgr, laparams=None)
+        self.deadline = deadline
+        self.text = ""
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise _PdfTimeLimit()
+
+    def render_string(self, *args, **kwargs):
+        self._check_deadline()
+        super().render_string(*args, **kwargs)
+
+    def paint_path(self, *args, **kwargs):
+        self._check_deadline()
+        super().paint_path(*args, **kwargs)
+
+    def receive_layout(self, ltpage: LTPage):
+        parts = []
+        prev = None
+        stack = [iter(ltpage)]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+            elif isinstance(item, LTChar):
+                if prev is not None and abs(item.y0 - prev.y0) > min(item.size, prev.size) / 2:
+                    parts.append("\n")
+                parts.append(item.get_text())
+                prev = item
+            elif isinstance(item, LTContainer):
+                stack.append(iter(item))
+        self.text = "".join(parts)
+
+
+def _iter_page_range(source, start: int, end: int, deadline: Optional[float] = None) -> Iterator[str]:
+    """
+    Текст страниц [start, end). Быстрый путь — текстовый слой через pdfminer без анализа раскладки
+    (_TextLayer); pdfplumber открывается только для страниц, где слова склеиваются.
+    source — путь или bytes: у pdfminer и pdfplumber должны быть независимые потоки.
+    При deadline разбор прерывается _PdfTimeLimit, в том числе посреди страницы pdfminer.
+    """
+    rsrc = PDFResourceManager(caching=True)
+    plumber = None
+    try:
+        with open_source(source) as fp:
+            for page_no, page in enumerate(PDFPage.get_pages(fp, maxpages=end)):
+                if page_no < start:
+                    continue
+                device = _TextLayer(rsrc, deadline)
+                device._check_deadline()
+                PDFPageInterpreter(rsrc, device).process_page(page)
+                text = device.text
+
+                if _needs_layout(text):
+                    import pdfplumber
+                    device._check_deadline()
+                    if plumber is None:
+                        plumber = pdfplumber.open(source if is_path(source) else io.BytesIO(source))
+                    plumber_page = plumber.pages[page_no]
+                    text = plumber_page.extract_text() or ""
+                    plumber_page.flush_cache()
+                yield text
+    finally:
+        if plumber is not None:
+            plumber.close()
+
+
+def _extract_page_range(source, start: int, end: int, deadline: float) -> List[str]:
+    """Выполняется в отдельном процессе: текст диапазона страниц (source — путь или bytes)."""
+    texts = []
+    try:
+        for text in _iter_page_range(source, start, end, deadline):
+            texts.append(text)
+    except _PdfTimeLimit:
+        # частичный результат диапазона; родитель остановится на нём
+        texts.append(None)
+    return texts
+
+
+def iter_pdf_pages(
+        source: Source,
+        max_pages: int = PDF_MAX_PAGES,
+        time_limit: float = PDF_TIME_LIMIT,
+        max_chars: int = PDF_MAX_TEXT_CHARS,
+        parallel_min_pages: int = PDF_PARALLEL_MIN_PAGES,
+        workers: int = PDF_PARALLEL_WORKERS,
+) -> Iterator[str]:
+    """
+    Потоково выдаёт текст страниц PDF по порядку (source — путь, bytes или бинарный файл).
+    При достижении лимита страниц, времени или объёма текста останавливается,
+    отдав всё, что успело извлечься (частичный результат).
+    Большие документы делятся на диапазоны страниц и разбираются в нескольких процессах,
+    если вызывающий сам не процесс-воркер (вложенный пул занял бы процессоры сверх пула анализа).
+    """
+    deadline = time.monotonic() + time_limit
+    source = picklable_source(source)
+    n_pages = min(count_pdf_pages(source), max_pages)
+    if n_pages <= 0:
+        return
+    chars = 0
+
+    if n_pages >= parallel_min_pages and workers > 1 and multiprocessing.parent_process() is None:
+        pages = _iter_parallel(source, n_pages, workers, deadline)
+    else:
+        pages = _iter_page_range(source, 0, n_pages, deadline)
+
+    try:
+        for text in pages:
+            if text is None:
+                raise _PdfTimeLimit()
+            if chars + len(text) > max_chars:
+                yield text[:max_chars - chars]
+                logger.warning(f"PDF: достигнут лимит текста {max_chars} символов, результат обрезан")
+                return
+            chars += len(text)
+            yield text
+    except _PdfTimeLimit:
+        logger.warning(f"PDF: превышен лимит времени {time_limit} с, результат частичный")
+    finally:
+        pages.close()
+
+
+def _iter_parallel(source, n_pages: int, workers: int, deadline: float) -> Iterator[Optional[str]]:
+    """Текст страниц из диапазонов, разобранных в отдельных процессах; None — лимит времени"""
+    chunk = -(-n_pages // workers)
+    ranges = [(start, min(start + chunk, n_pages)) for start in range(0, n_pages, chunk)]
+    pool = multiprocessing.Pool(processes=len(ranges))
+    try:
+        results = [pool.apply_async(_extract_page_range, (source, start, end, deadline)) for start, end in ranges]
+        for result in results:
+            try:
+                page_texts = result.get(timeout=max(0.0, deadline - time.monotonic()))
+            except multiprocessing.TimeoutError:
+                yield None
+                return
+            yield from page_texts
+            if page_texts and page_texts[-1] is None:
+                return
+    finally:
+        # зависшие на «тяжёлых» страницах процессы не дожидаемся — завершаем сразу
+        pool.terminate()
+
+
+def extract_pdf_text(source: Source, max_bytes: Optional[int] = PDF_MAX_BYTES, **limits) -> str:
+    """Текст PDF целиком (с учётом лимитов). Файлы больше max_bytes отклоняются."""
+    size = source_size(source)
+    if max_bytes is not None and size > max_bytes:
+        raise PdfTooLargeError(f"PDF is too large: {size} bytes (limit {max_bytes})")
+    return "\n".join(filter(None, iter_pdf_pages(source, **limits)))
@@ -0,0 +1,52 @@
+# nlp/skill_index.py
+
+import re
+from typing import Dict, List
+
+from nlp.nlp_pipeline import pipe_docs
+
+# Версия формата/алгоритма индекса: сохранённые индексы (sqlite-каталог) с другой версией пересчитываются
+SKILL_INDEX_VERSION = "1"
+
+
+def is_valid_skill_token(token_text: str) -> bool:
+    """
+    Проверка, что токен может быть техническим навыком.
+    Разрешаем буквы, цифры и ограниченный набор спецсимволов (+ # . - /).
+    """
+    token_text = token_text.lower()
+    if token_text in {"c++", "c#", ".net"}:
+        return True
+    return bool(re.match(r"^[a-zа-я0-9+#./-]+$", token_text, flags=re.IGNORECASE))
+
+
+def lemmatize_skills(phrases: List[str]) -> List[List[str]]:
+    """Леммы (ru + en) для каждой фразы навыка — один батч nlp.pipe на язык."""
+    lemmas: List[List[str]] = [[] for _ in phrases]
+    for lang in ("ru", "en"):
+        for i, doc in enumerate(pipe_docs(phrases, lang, stage="lemmas")):
+            for t in doc:
+                if is_valid_skill_token(t.text):
+                    lemmas[i].append((t.lemma_ or t.text).lower())
+    return lemmas
+
+
+def build_skill_index(vacancy_data: Dict) -> Dict:
+    """
+    Предкомпилированный индекс навыков вакансии (строится один раз при загрузке каталога).
+    vacancy_data — результат parse_vacancy. Для каждого требования хранит:
+    - skill: исходная строка требования
+    - phrase: нормализованная фраза (для фразового и fuzzy совпадения)
+    - lemmas: множество лемм (для токен-совпадения)
+    """
+    required_skills = [s for s in vacancy_data.get("requirements", []) if isinstance(s, str) and s.strip()]
+    phrases = [skill.lower() for skill in required_skills]
+    lemmas = lemmatize_skills(phrases)
+
+    return {
+        "id": vacancy_data.get("id"),
+        "skills": [
+            {"skill": skill, "phrase": phrase, "lemmas": frozenset(skill_lemmas)}
+            for skill, phrase, skill_lemmas in zip(required_skills, phrases, lemmas)
+        ],
+    }
@@ -0,0 +1,29 @@
+# tests/test_import_budget.py
+
+import os
+
+import pytest
+
+from bench.import_budget import DEFAULT_MODULES, HEAVY_MODULES, measure_imports
+
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", 1.5))
+
+# без зависимостей бота (python-telegram-bot, python-dotenv) импорт bot.main не проверить
+pytest.importorskip("telegram")
+pytest.importorskip("dotenv")
+
+
+@pytest.fixture(scope="module")
+def bot_import():
+    return measure_imports(DEFAULT_MODULES)
+
+
+def test_no_heavy_modules_on_import(bot_import):
+    _, loaded, _ = bot_import
+    assert not loaded.intersection(HEAVY_MODULES), "тяжёлые библиотеки должны грузиться стадиями или прогревом"
+
+
+def test_import_within_budget(bot_import):
+    elapsed, _, cumulative = bot_import
+    slowest = ", ".join(f"{name} {micros / 1000:.0f} ms" for micros, name in cumulative[:5])
+    assert elapsed <= IMPORT_BUDGET_S, f"импорт {elapsed:.3f} с > {IMPORT_BUDGET_S} с; самые медленные: {slowest}"
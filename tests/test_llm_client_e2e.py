@@ -0,0 +1,128 @@
+# tests/test_llm_client_e2e.py
+"""
+LLMClient против локальной замены OpenAI-совместимого API (llm/fake_llm_server.py):
+слияние одинаковых запросов, TTL-кэш, повторы на 429/5xx и стриминг в сообщение Telegram.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("telegram")
+
+from llm.fake_llm_server import FakeLLMServer, fake_reply  # noqa: E402
+from llm.llm_interface import LLMClient, LLMError  # noqa: E402
+
+MESSAGES = [{"role": "system", "content": "Ты интервьюер."},
+            {"role": "user", "content": "Задай следующий вопрос кандидату."}]
+
+
+class _Stand:
+    """Заглушка LLM на свободном порту и клиент к ней"""
+
+    def __init__(self, server_kwargs=None, **client_kwargs):
+        self.server = FakeLLMServer(**{"first_token_ms": 0, "token_ms": 0, **(server_kwargs or {})})
+        self.client_kwargs = client_kwargs
+        self.client = None
+
+    async def __aenter__(self):
+        await self.server.start(port=0)
+        port = self.server._server.sockets[0].getsockname()[1]
+        self.client = LLMClient(base_url=f"http://127.0.0.1:{port}/v1", model="fake-interviewer",
+                                **self.client_kwargs)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.close()
+        await self.server.stop()
+
+
+class _Message:
+    """Сообщение бота: запоминает правки текста и их время"""
+
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text):
+        self.edits.append((time.monotonic(), text))
+
+
+def test_identical_concurrent_prompts_share_one_request():
+    async def scenario():
+        async with _Stand({"first_token_ms": 200}) as stand:
+            answers = await asyncio.gather(*(stand.client.complete(MESSAGES) for _ in range(5)))
+            assert answers == [fake_reply(MESSAGES)] * 5
+            assert stand.server.requests == 1
+
+    asyncio.run(scenario())
+
+
+def test_cache_serves_repeats_until_ttl_expires():
+    async def scenario():
+        async with _Stand(cache_ttl=0.3) as stand:
+            first = await stand.client.complete(MESSAGES)
+            assert await stand.client.complete(MESSAGES) == first
+            assert stand.server.requests == 1
+            # стрим того же промпта берёт ответ из того же кэша
+            assert "".join([chunk async for chunk in stand.client.stream(MESSAGES)]) == first
+            assert stand.server.requests == 1
+            await stand.client.complete(MESSAGES, use_cache=False)
+            assert stand.server.requests == 2
+
+            await asyncio.sleep(0.4)
+            assert await stand.client.complete(MESSAGES) == first
+            assert stand.server.requests == 3
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retryable_errors_are_retried(status):
+    async def scenario():
+        # каждый второй запрос заглушки — ошибка: второй промпт проходит со второй попытки
+        async with _Stand({"fail_every": 2, "fail_status": status}, max_retries=2) as stand:
+            await stand.client.complete(MESSAGES)
+            other = [*MESSAGES, {"role": "user", "content": "Ещё вопрос."}]
+            assert await stand.client.complete(other) == fake_reply(other)
+            assert stand.server.requests == 3
+
+            streamed = [*MESSAGES, {"role": "user", "content": "И ещё один."}]
+            assert "".join([chunk async for chunk in stand.client.stream(streamed)]) == fake_reply(streamed)
+            assert stand.server.requests == 5
+
+    asyncio.run(scenario())
+
+
+def test_non_retryable_error_and_exhausted_retries_raise():
+    async def scenario():
+        async with _Stand({"fail_every": 1, "fail_status": 400}, max_retries=2) as stand:
+            with pytest.raises(LLMError, match="HTTP 400"):
+                await stand.client.complete(MESSAGES)
+            assert stand.server.requests == 1
+        async with _Stand({"fail_every": 1, "fail_status": 503}, max_retries=1) as stand:
+            with pytest.raises(LLMError, match="HTTP 503"):
+                await stand.client.complete(MESSAGES)
+            assert stand.server.requests == 2
+
+    asyncio.run(scenario())
+
+
+def test_stream_to_message_throttles_edits():
+    async def scenario():
+        interval = 0.1
+        async with _Stand({"token_ms": 20}, edit_interval=interval) as stand:
+            message = _Message()
+            text = await stand.client.stream_to_message(message, MESSAGES)
+            assert text == fake_reply(MESSAGES)
+            tokens = len(text.split())
+
+            times = [at for at, _ in message.edits]
+            # промежуточные правки не чаще edit_interval, финальная — полный текст без курсора
+            assert 1 < len(message.edits) < tokens
+            assert all(b - a >= interval * 0.9 for a, b in zip(times, times[1:-1]))
+            assert all(edit.endswith(" …") for _, edit in message.edits[:-1])
+            assert message.edits[-1][1] == text
+
+    asyncio.run(scenario())
@@ -0,0 +1,142 @@
+# tests/test_webhook_e2e.py
+"""
+Вебхук бота против локальной заглушки Bot API (bot/fake_bot_api.py): апдейты идут по HTTP
+с секретом, ответы бота — настоящими вызовами Bot API через python-telegram-bot.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("telegram")
+pytest.importorskip("dotenv")
+
+from telegram.ext import ApplicationBuilder, CommandHandler  # noqa: E402
+
+from bot.concurrency import PerUserUpdateProcessor  # noqa: E402
+from bot.fake_bot_api import FakeBotApi  # noqa: E402
+from bot.menu_handlers import start_menu  # noqa: E402
+from bot.webhook import HEALTH_PATH, WebhookServer  # noqa: E402
+
+SECRET = "test-secret"
+
+
+def _port(server) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+async def _get(port: int, path: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(body) if body else None
+
+
+class _Stand:
+    """Заглушка Bot API + приложение PTB + вебхук на свободных портах"""
+
+    def __init__(self):
+        self.api = FakeBotApi()
+        self.release_slow = asyncio.Event()
+        self.app = None
+        self.server = None
+        self.port = 0
+
+    async def __aenter__(self):
+        await self.api.start(port=0)
+        base = f"http://127.0.0.1:{_port(self.api._server)}"
+        self.app = (ApplicationBuilder().token("123:TEST").base_url(f"{base}/bot").base_file_url(f"{base}/file/bot")
+                    .concurrent_updates(PerUserUpdateProcessor()).build())
+        self.app.add_handler(CommandHandler("start", start_menu))
+        self.app.add_handler(CommandHandler("slow", self._slow))
+        await self.app.initialize()
+        self.server = WebhookServer(self.app, "/telegram", SECRET)
+        await self.server.start("127.0.0.1", 0)
+        self.port = _port(self.server._server)
+        await self.app.bot.set_webhook(f"http://127.0.0.1:{self.port}/telegram", secret_token=SECRET)
+        await self.app.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release_slow.set()
+        if not self.server.draining:
+            await self.server.drain(timeout=5)
+        await self.app.stop()
+        await self.app.shutdown()
+        await self.api.stop()
+
+    async def _slow(self, update, context):
+        await self.release_slow.wait()
+        await update.message.reply_text("готово")
+
+
+def test_update_is_delivered_with_secret():
+    async def scenario():
+        async with _Stand() as stand:
+            assert stand.api.webhook_secret == SECRET
+            assert await stand.api.push_update(stand.api.text_update(1, "/start")) == 200
+            sent = await stand.api.wait_for_sent(2, timeout=10)
+            assert [item["method"] for item in sent] == ["sendMessage", "sendMessage"]
+            assert sent[0]["params"]["chat_id"] == 1
+            assert "AI HR Bot" in sent[0]["params"]["text"]
+            assert "keyboard" in sent[1]["params"]["reply_markup"]
+
+    asyncio.run(scenario())
+
+
+def test_wrong_secret_is_rejected():
+    async def scenario():
+        async with _Stand() as stand:
+            stand.api.webhook_secret = "wrong"
+            assert await stand.api.push_update(stand.api.text_update(1, "/start")) == 403
+            stand.api.webhook_secret = ""
+            assert await stand.api.push_update(stand.api.text_update(1, "/start")) == 403
+            await asyncio.sleep(0.3)
+            assert stand.api.sent == []
+            assert stand.app.update_queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_health_check():
+    async def scenario():
+        async with _Stand() as stand:
+            status, body = await _get(stand.port, HEALTH_PATH)
+            assert status == 200
+            assert body["status"] == "ok"
+            assert body["pending_updates"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_drain_finishes_accepted_updates_and_rejects_new_ones():
+    async def scenario():
+        async with _Stand() as stand:
+            assert await stand.api.push_update(stand.api.text_update(1, "/slow")) == 200
+            # апдейт принят и обрабатывается
+            for _ in range(50):
+                if stand.server._pending_updates():
+                    break
+                await asyncio.sleep(0.05)
+            drain = asyncio.ensure_future(stand.server.drain(timeout=10))
+            await asyncio.sleep(0.2)
+
+            status, body = await _get(stand.port, HEALTH_PATH)
+            assert status == 503
+            assert body["status"] == "draining"
+            assert body["pending_updates"] >= 1
+            # новые апдейты не принимаются — Telegram повторит их на другую реплику
+            assert await stand.api.push_update(stand.api.text_update(2, "/start")) == 503
+            assert not drain.done()
+
+            stand.release_slow.set()
+            await asyncio.wait_for(drain, 10)
+            assert [item["params"]["text"] for item in stand.api.sent] == ["готово"]
+
+    asyncio.run(scenario())
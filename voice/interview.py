@@ -0,0 +1,284 @@
+# interview.py
+"""
+Голосовое интервью: вопрос голосом -> ответ голосовым -> следующий вопрос.
+
+Стадии хода перекрываются, а не складываются:
+- голосовое скачивается потоком и сразу идёт в ffmpeg (voice.stt декодирует, не дожидаясь конца файла);
+- следующий вопрос LLM генерирует стримом, озвучка стартует на первом законченном предложении,
+  и первое предложение уходит кандидату, пока дописываются остальные;
+- базовый набор вопросов вакансии (общий для кандидатов, из кэша LLM) озвучивается в фоне сразу
+  после старта интервью — пока кандидат отвечает, запасной следующий вопрос уже готов и задаётся
+  мгновенно, если LLM не успела к INTERVIEW_LLM_DEADLINE.
+
+Задержка «ответ получен -> первый звук следующего вопроса отправлен» пишется в метрику interview_turn.
+Сессия лежит и в user_data пользователя (сохраняется persistence), поэтому интервью переживает перезапуск бота.
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, List, MutableMapping, Optional
+
+from bot.metrics import metrics
+from llm import prompts
+from llm.llm_interface import LLMError, llm_client
+from logs.logger import logger
+from voice.stt import stt_service
+from voice.tts import TTSError, tts_service
+
+# Вопросов в интервью
+INTERVIEW_QUESTIONS = int(os.getenv("INTERVIEW_QUESTIONS", 5))
+# Сколько ждать первое предложение вопроса от LLM, прежде чем задать заранее озвученный вопрос, с
+INTERVIEW_LLM_DEADLINE = float(os.getenv("INTERVIEW_LLM_DEADLINE", 4))
+# Сколько ждать каждое следующее предложение, прежде чем закончить вопрос на уже отправленных, с
+INTERVIEW_SENTENCE_DEADLINE = float(os.getenv("INTERVIEW_SENTENCE_DEADLINE", 15))
+# Ключ сессии интервью в user_data
+SESSION_KEY = "interview_session"
+
+# Если LLM недоступна, интервью идёт по общим вопросам
+FALLBACK_QUESTIONS = [
+    "Расскажите коротко о себе и своём опыте, который относится к этой вакансии.",
+    "Какая задача из последнего места работы была для вас самой сложной и как вы её решили?",
+    "Какие инструменты и технологии из требований вакансии вы используете чаще всего?",
+    "Расскажите о случае, когда вам пришлось работать в сжатые сроки.",
+    "Почему вас заинтересовала эта вакансия?",
+]
+
+# Конец предложения — знак препинания, за которым уже пришёл пробел (в стриме предложение могло не закончиться)
+_SENTENCE_END = re.compile(r"[.!?…]+(?=\s)")
+
+_DOWNLOAD_CHUNK = 64 * 1024
+
+
+def pop_sentence(buffer: str):
+    """(первое законченное предложение или None, остаток буфера)"""
+    match = _SENTENCE_END.search(buffer)
+    if match is None:
+        return None, buffer
+    return buffer[:match.end()].strip(), buffer[match.end():]
+
+
+class InterviewEngine:
+    """
+    Сессии интервью по пользователям и конвейер хода: STT -> LLM -> TTS.
+    Сессия — обычный словарь; если передан store (user_data пользователя), она хранится и там,
+    и после перезапуска бота восстанавливается из него (restore).
+    Апдейты одного пользователя обрабатываются по очереди (PerUserUpdateProcessor),
+    поэтому ходы одной сессии не пересекаются.
+    """
+
+    def __init__(self, questions: int = INTERVIEW_QUESTIONS, llm_deadline: float = INTERVIEW_LLM_DEADLINE,
+                 sentence_deadline: float = INTERVIEW_SENTENCE_DEADLINE):
+        self.questions = questions
+        self.llm_deadline = llm_deadline
+        self.sentence_deadline = sentence_deadline
+        self.sessions: Dict[int, Dict] = {}
+        self._http = None
+        self._tasks = set()  # фоновые задачи (держим ссылки, чтобы их не собрал GC)
+
+    def active(self, user_id: int) -> bool:
+        return user_id in self.sessions
+
+    def restore(self, user_id: int, store: MutableMapping) -> bool:
+        """Поднимает сессию из user_data (после перезапуска бота). True, если интервью у пользователя идёт"""
+        if user_id in self.sessions:
+            return True
+        session = store.get(SESSION_KEY)
+        if not session:
+            return False
+        self.sessions[user_id] = session
+        logger.info(f"Пользователь {user_id}: интервью восстановлено после перезапуска, "
+                    f"вопрос {len(session['history'])} из {len(session['plan'])}")
+        return True
+
+    def _background(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # --- подготовка ---
+
+    async def plan_questions(self, vacancy: Dict) -> List[str]:
+        """Базовый набор вопросов вакансии: один запрос к LLM на вакансию (дальше — из кэша клиента)"""
+        try:
+            text = await llm_client.complete(prompts.question_set_messages(vacancy, self.questions))
+            questions = prompts.parse_questions(text)
+        except LLMError as e:
+            logger.warning(f"Не удалось получить вопросы по вакансии {vacancy.get('id')} от LLM: {e}")
+            questions = []
+        return list(dict.fromkeys(questions + FALLBACK_QUESTIONS))[:self.questions]
+
+    async def start(self, bot, chat_id: int, user_id: int, vacancy: Dict, analysis: Optional[Dict] = None,
+                    store: Optional[MutableMapping] = None):
+        """
+        Начинает интервью: готовит набор вопросов, озвучивает его в фоне и задаёт первый вопрос.
+        store — user_data пользователя: сессия сохраняется и в нём.
+        """
+        plan = await self.plan_questions(vacancy)
+        session = {"vacancy": vacancy, "analysis": analysis, "plan": plan, "history": [], "turn_latencies": []}
+        self.sessions[user_id] = session
+        if store is not None:
+            store[SESSION_KEY] = session
+        # пока кандидат отвечает, запасные вопросы уже озвучены и лежат в кэше TTS
+        self._background(tts_service.presynthesize(plan[1:]))
+        await self._send_part(bot, chat_id, plan[0])
+        session["history"].append({"question": plan[0], "answer": None})
+        logger.info(f"Пользователь {user_id}: начато интервью по вакансии {vacancy.get('id')}, вопросов: {len(plan)}")
+
+    def cancel(self, user_id: int, store: Optional[MutableMapping] = None) -> Optional[Dict]:
+        session = self.sessions.pop(user_id, None)
+        if store is not None:
+            session = store.pop(SESSION_KEY, None) or session
+        return session
+
+    # --- ход интервью ---
+
+    async def _iter_file(self, bot, file_id: str) -> AsyncIterator[bytes]:
+        """Куски голосового по мере скачивания (для локального Bot API без URL — файл целиком)"""
+        tg_file = await bot.get_file(file_id)
+        if tg_file.file_path and tg_file.file_path.startswith(("http://", "https://")):
+            if self._http is None:
+                import httpx
+
+                self._http = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0))
+            async with self._http.stream("GET", tg_file.file_path) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(_DOWNLOAD_CHUNK):
+                    yield chunk
+        else:
+            yield bytes(await tg_file.download_as_bytearray())
+
+    async def handle_answer(self, bot, chat_id: int, user_id: int, file_id: str,
+                            received_at: Optional[float] = None,
+                            store: Optional[MutableMapping] = None) -> Optional[Dict]:
+        """
+        Ход интервью по голосовому ответу: распознаёт его и задаёт следующий вопрос (или завершает).
+        received_at — time.perf_counter() получения апдейта, store — user_data пользователя (там же, где
+        сессия сохранена при start). Возвращает {"transcript", "finished", "latency", "timings", "history"}
+        или None, если интервью у пользователя не идёт.
+        """
+        session = self.sessions.get(user_id)
+        if session is None:
+            return None
+        received_at = received_at or time.perf_counter()
+
+        # STT: скачивание и декодирование идут одним потоком; STTError — ответ не засчитан, можно повторить
+        result = await stt_service.transcribe(self._iter_file(bot, file_id))
+        stt_done = time.perf_counter()
+        session["history"][-1]["answer"] = result["text"]
+
+        timings = {"stt": stt_done - received_at, "stt_rtf": result["rtf"]}
+        finished = len(session["history"]) >= len(session["plan"])
+        if finished:
+            await self._send_part(bot, chat_id, "Спасибо, это был последний вопрос. Интервью завершено.", voice=False)
+            self.cancel(user_id, store)
+            sent_at = time.perf_counter()
+        else:
+            fallback = session["plan"][len(session["history"])]
+            question, sent_at = await self._ask_next(bot, chat_id, session, fallback)
+            session["history"].append({"question": question, "answer": None})
+            timings["question"] = sent_at - stt_done
+
+        latency = sent_at - received_at
+        session["turn_latencies"].append(latency)
+        metrics.observe("interview_turn", latency)
+        metrics.observe("interview_stt", timings["stt"])
+        logger.info(f"Пользователь {user_id}: ход интервью {len(session['turn_latencies'])} — "
+                    f"ответ -> вопрос {latency:.2f} с (STT {timings['stt']:.2f} с, RTF {result['rtf']:.2f})")
+        return {"transcript": result["text"], "finished": finished, "latency": latency, "timings": timings,
+                "history": session["history"]}
+
+    async def _ask_next(self, bot, chat_id: int, session: Dict, fallback: str):
+        """
+        Следующий вопрос от LLM по ответу кандидата: предложения отправляются по мере генерации.
+        Нет первого предложения за llm_deadline — задаётся заранее озвученный вопрос из набора;
+        следующее предложение не пришло за sentence_deadline — вопрос заканчивается на отправленных.
+        Возвращает (текст вопроса, момент отправки первой части).
+        """
+        messages = prompts.next_question_messages(session["vacancy"], session["history"], session["analysis"])
+        sentences: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.ensure_future(self._generate_sentences(messages, sentences))
+        start = time.perf_counter()
+        try:
+            try:
+                first = await asyncio.wait_for(sentences.get(), self.llm_deadline)
+            except asyncio.TimeoutError:
+                first = None
+            if first is None:
+                metrics.inc("interview_llm_fallbacks")
+                logger.warning(f"LLM не прислала вопрос за {self.llm_deadline} с, задаём вопрос из набора")
+                return fallback, await self._send_part(bot, chat_id, fallback)
+
+            metrics.observe("interview_first_sentence", time.perf_counter() - start)
+            parts = [first]
+            sent_at = await self._send_part(bot, chat_id, first)
+            while True:
+                # зависший стрим не должен держать очередь апдейтов пользователя
+                try:
+                    sentence = await asyncio.wait_for(sentences.get(), self.sentence_deadline)
+                except asyncio.TimeoutError:
+                    metrics.inc("interview_llm_stalls")
+                    logger.warning(f"Стрим вопроса LLM замолчал на {self.sentence_deadline} с, "
+                                   f"вопрос заканчивается на {len(parts)} предложениях")
+                    break
+                if sentence is None:
+                    break
+                parts.append(sentence)
+                await self._send_part(bot, chat_id, sentence)
+            return " ".join(parts), sent_at
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    async def _generate_sentences(self, messages: List[Dict], out: asyncio.Queue):
+        """Стрим LLM -> очередь предложений; озвучка каждого предложения стартует сразу (None — конец)"""
+        buffer = ""
+        try:
+            async for chunk in llm_client.stream(messages, use_cache=False):
+                buffer += chunk
+                sentence, buffer = pop_sentence(buffer)
+                while sentence is not None:
+                    self._put_sentence(sentence, out)
+                    sentence, buffer = pop_sentence(buffer)
+            if buffer.strip():
+                self._put_sentence(buffer.strip(), out)
+        except LLMError as e:
+            logger.warning(f"Ошибка генерации вопроса: {e}")
+        finally:
+            out.put_nowait(None)
+
+    def _put_sentence(self, sentence: str, out: asyncio.Queue):
+        # синтез начинается сейчас; send_voice дождётся этого же синтеза через кэш TTS
+        self._background(self._prefetch_tts(sentence))
+        out.put_nowait(sentence)
+
+    @staticmethod
+    async def _prefetch_tts(text: str):
+        try:
+            await tts_service.synthesize(text)
+        except TTSError:
+            # причина залогируется при отправке, вопрос уйдёт текстом
+            pass
+
+    async def _send_part(self, bot, chat_id: int, text: str, voice: bool = True) -> float:
+        """Отправляет часть вопроса голосовым (с текстом в подписи); без TTS — текстом. Возвращает момент отправки"""
+        if voice:
+            try:
+                await tts_service.send_voice(bot, chat_id, text, caption=text)
+                return time.perf_counter()
+            except TTSError as e:
+                metrics.inc("interview_tts_failures")
+                logger.error(f"Не удалось озвучить вопрос, отправляем текстом: {e}")
+        await bot.send_message(chat_id, text)
+        return time.perf_counter()
+
+
+# общий движок интервью для всего процесса
+interview_engine = InterviewEngine()
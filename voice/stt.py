@@ -0,0 +1,356 @@
+# stt.py
+"""
+Распознавание голосовых ответов кандидата (Whisper, только CPU).
+
+Модель загружается при прогреве или первом запросе — своя у каждого воркера. Голосовое OGG/Opus
+декодируется ffmpeg в PCM 16 кГц через pipe — байты можно подавать по мере скачивания.
+VAD по энергии выкидывает тишину и режет запись на фрагменты до 30 с (окно Whisper); фрагменты
+всех пользователей попадают в общую очередь, и воркеры декодируют их пачками — Whisper всё равно
+дополняет каждый фрагмент до 30 с, поэтому пачка коротких ответов стоит почти как один.
+
+    python -m voice.stt answer.ogg [answer2.ogg ...]
+"""
+
+import asyncio
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from bot.metrics import metrics
+from logs.logger import logger
+
+# Модель Whisper: tiny | base | small | medium (на CPU разумны tiny/base/small)
+STT_MODEL = os.getenv("STT_MODEL", "base")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "ru")
+# int8-квантование линейных слоёв (torch dynamic quantization): в 1.5–2 раза быстрее на CPU
+STT_QUANTIZE = os.getenv("STT_QUANTIZE", "1") == "1"
+# Воркеры декодирования и потоки torch (общие для всех воркеров). У каждого воркера своя копия модели:
+# whisper.decode вешает на модель хуки kv-cache, и параллельные decode на одной модели портят друг другу кэш
+STT_WORKERS = int(os.getenv("STT_WORKERS", 1))
+STT_THREADS = int(os.getenv("STT_THREADS", max(1, (os.cpu_count() or 2) - 1)))
+# Пачка фрагментов на один проход модели и сколько ждать добора пачки, мс
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", 8))
+STT_BATCH_WAIT_MS = float(os.getenv("STT_BATCH_WAIT_MS", 30))
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+# Загружать модель при старте бота (фоновый прогрев), а не на первом голосовом ответе
+STT_PRELOAD = os.getenv("STT_PRELOAD", "1") == "1"
+
+SAMPLE_RATE = 16000
+CHUNK_MAX_S = 30  # окно Whisper
+
+# VAD: кадр, порог энергии (dBFS и запас над шумом), пауза, которая разрывает речь, и поля вокруг речи
+VAD_FRAME_MS = 30
+VAD_THRESHOLD_DB = float(os.getenv("STT_VAD_THRESHOLD_DB", -45))
+VAD_NOISE_MARGIN_DB = float(os.getenv("STT_VAD_NOISE_MARGIN_DB", 8))
+VAD_MIN_SILENCE_MS = 400
+VAD_MIN_SPEECH_MS = 150
+VAD_PAD_MS = 150
+
+# Фрагмент считается тишиной/шумом, если модель в этом уверена и текст маловероятен
+NO_SPEECH_PROB = 0.6
+NO_SPEECH_LOGPROB = -1.0
+
+
+class STTError(Exception):
+    """Голосовое сообщение не удалось декодировать или распознать"""
+
+
+# -------------------- Декодирование и VAD --------------------
+async def decode_to_pcm(source: Union[bytes, AsyncIterator[bytes]]):
+    """
+    OGG/Opus (или любой формат ffmpeg) -> float32 PCM моно 16 кГц.
+    source — байты целиком или асинхронный итератор кусков (например, по мере скачивания файла):
+    ffmpeg декодирует поток, не дожидаясь конца записи.
+    """
+    import numpy as np
+
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError as e:
+        raise STTError(f"ffmpeg не найден ({FFMPEG_BIN}), нужен для декодирования голосовых") from e
+
+    async def _feed():
+        try:
+            if isinstance(source, (bytes, bytearray)):
+                proc.stdin.write(source)
+                await proc.stdin.drain()
+            else:
+                async for chunk in source:
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg завершился раньше — причина будет в stderr
+            pass
+        finally:
+            proc.stdin.close()
+
+    try:
+        # stdin пишется параллельно с чтением stdout, иначе ffmpeg встанет на заполненном pipe
+        _, pcm, stderr = await asyncio.gather(_feed(), proc.stdout.read(), proc.stderr.read())
+    finally:
+        # источник упал (обрыв скачивания) или корутину отменили — ffmpeg не должен остаться висеть
+        if proc.returncode is None:
+            if not proc.stdin.is_closing():
+                proc.stdin.close()
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+        await proc.wait()
+    if proc.returncode != 0:
+        raise STTError(f"ffmpeg не смог декодировать аудио: {stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def split_speech(audio, sample_rate: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """
+    VAD по энергии кадров: [(начало, конец), ...] участков речи в сэмплах.
+    Порог — не ниже VAD_THRESHOLD_DB и на VAD_NOISE_MARGIN_DB выше уровня шума записи.
+    """
+    import numpy as np
+
+    frame = sample_rate * VAD_FRAME_MS // 1000
+    n = len(audio) // frame
+    if n == 0:
+        return []
+    frames = audio[:n * frame].reshape(n, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    noise_floor = float(np.percentile(energy_db, 10))
+    speech = energy_db > max(VAD_THRESHOLD_DB, noise_floor + VAD_NOISE_MARGIN_DB)
+
+    min_silence = math.ceil(VAD_MIN_SILENCE_MS / VAD_FRAME_MS)
+    min_speech = math.ceil(VAD_MIN_SPEECH_MS / VAD_FRAME_MS)
+    pad = VAD_PAD_MS // VAD_FRAME_MS
+    segments, start, silence = [], None, 0
+    for i, is_speech in enumerate(speech):
+        if is_speech:
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence >= min_silence:
+                segments.append((start, i - silence + 1))
+                start, silence = None, 0
+    if start is not None:
+        segments.append((start, n - silence))
+    return [(max(0, s - pad) * frame, min(n, e + pad) * frame) for s, e in segments if e - s >= min_speech]
+
+
+def group_chunks(segments: List[Tuple[int, int]], max_samples: int = CHUNK_MAX_S * SAMPLE_RATE):
+    """Склеивает соседние участки речи во фрагменты не длиннее окна модели, длинные — режет"""
+    chunks: List[Tuple[int, int]] = []
+    for start, end in segments:
+        while end - start > max_samples:
+            chunks.append((start, start + max_samples))
+            start += max_samples
+        if chunks and end - chunks[-1][0] <= max_samples:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
+# -------------------- Модель --------------------
+def _quantize(model):
+    """int8 dynamic quantization линейных слоёв Whisper для CPU"""
+    import torch
+
+    # whisper.model.Linear — подкласс nn.Linear (приводит веса к dtype входа), а quantize_dynamic
+    # подменяет только точный тип; на CPU в fp32 поведение классов совпадает
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_model(name: str = STT_MODEL, quantize: bool = STT_QUANTIZE):
+    import torch
+    import whisper
+
+    start = time.perf_counter()
+    torch.set_num_threads(STT_THREADS)
+    model = whisper.load_model(name, device="cpu")
+    model.eval()
+    if quantize:
+        model = _quantize(model)
+    logger.info(f"Модель Whisper '{name}' загружена за {time.perf_counter() - start:.1f} с "
+                f"(CPU, {'int8' if quantize else 'fp32'}, потоков torch: {STT_THREADS})")
+    return model
+
+
+class SpeechToText:
+    """
+    Сервис распознавания: очередь фрагментов и воркеры (у каждого своя резидентная модель),
+    которые декодируют фрагменты разных пользователей общими пачками.
+    """
+
+    def __init__(self, model_name: str = STT_MODEL, language: str = STT_LANGUAGE, quantize: bool = STT_QUANTIZE,
+                 workers: int = STT_WORKERS, batch_size: int = STT_BATCH_SIZE, batch_wait_ms: float = STT_BATCH_WAIT_MS):
+        self.model_name = model_name
+        self.language = language
+        self.quantize = quantize
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self._models: List[object] = []
+        self._queue: "queue.Queue[Optional[Tuple[object, Future]]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._models)
+
+    def warmup(self):
+        """Загружает модели и запускает воркеры (из фонового прогрева или при первом запросе)"""
+        if self._models:
+            return
+        with self._start_lock:
+            if self._models:
+                return
+            models = [load_model(self.model_name, self.quantize) for _ in range(max(1, self.workers))]
+            for i, model in enumerate(models):
+                thread = threading.Thread(target=self._worker, args=(model,), name=f"stt-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._models = models
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    @property
+    def queue_depth(self) -> int:
+        """Фрагменты, ожидающие распознавания"""
+        return self._queue.qsize()
+
+    # --- воркеры ---
+
+    def _next_batch(self) -> Optional[List[Tuple[object, Future]]]:
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # сигнал остановки — вернём его в очередь после текущей пачки
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self, model):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [(audio, fut) for audio, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                start = time.perf_counter()
+                texts = self._decode_batch(model, [audio for audio, _ in batch])
+                metrics.observe("stt_batch", time.perf_counter() - start)
+                for (_, fut), text in zip(batch, texts):
+                    fut.set_result(text)
+            except Exception as e:
+                logger.error(f"Ошибка распознавания пачки из {len(batch)} фрагментов: {e}", exc_info=True)
+                for _, fut in batch:
+                    fut.set_exception(STTError(str(e)))
+
+    def _decode_batch(self, model, audios) -> List[str]:
+        import torch
+        import whisper
+
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), n_mels=model.dims.n_mels)
+            for audio in audios
+        ])
+        options = whisper.DecodingOptions(language=self.language, fp16=False, without_timestamps=True)
+        with torch.inference_mode():
+            results = whisper.decode(model, mels, options)
+        return ["" if r.no_speech_prob > NO_SPEECH_PROB and r.avg_logprob < NO_SPEECH_LOGPROB else r.text.strip()
+                for r in results]
+
+    # --- API ---
+
+    async def _recognize(self, audio) -> List[Dict]:
+        if not self._models:
+            await asyncio.to_thread(self.warmup)
+        chunks = group_chunks(split_speech(audio))
+        futures = []
+        for begin, end in chunks:
+            fut: Future = Future()
+            self._queue.put((audio[begin:end], fut))
+            futures.append(asyncio.wrap_future(fut))
+        texts = await asyncio.gather(*futures)
+        return [{"start": begin / SAMPLE_RATE, "end": end / SAMPLE_RATE, "text": text}
+                for (begin, end), text in zip(chunks, texts) if text]
+
+    async def transcribe_pcm(self, audio) -> Dict:
+        """
+        Распознаёт PCM 16 кГц. Возвращает {"text", "segments": [{"start", "end", "text"}], "audio_s",
+        "seconds", "rtf"}; rtf — время обработки / длительность записи (меньше 1 — быстрее реального времени).
+        """
+        start = time.perf_counter()
+        return self._result(await self._recognize(audio), len(audio) / SAMPLE_RATE, start)
+
+    async def transcribe(self, source: Union[bytes, AsyncIterator[bytes]]) -> Dict:
+        """Голосовое сообщение (OGG/Opus байтами или потоком кусков) -> результат как у transcribe_pcm"""
+        start = time.perf_counter()
+        audio = await decode_to_pcm(source)
+        metrics.observe("stt_decode_audio", time.perf_counter() - start)
+        # в RTF входит и декодирование OGG
+        return self._result(await self._recognize(audio), len(audio) / SAMPLE_RATE, start)
+
+    @staticmethod
+    def _result(segments: List[Dict], audio_s: float, start: float) -> Dict:
+        seconds = time.perf_counter() - start
+        rtf = seconds / audio_s if audio_s else 0.0
+        metrics.observe("stt_transcribe", seconds)
+        metrics.observe_value("stt_rtf", rtf)
+        logger.info(f"Распознано {audio_s:.1f} с аудио за {seconds:.2f} с (RTF {rtf:.2f}, фрагментов: {len(segments)})")
+        return {"text": " ".join(s["text"] for s in segments), "segments": segments,
+                "audio_s": audio_s, "seconds": seconds, "rtf": rtf}
+
+
+# общий сервис распознавания для всего процесса (модель загружается при warmup/первом запросе)
+stt_service = SpeechToText()
+
+
+async def _transcribe_files(paths: List[str]) -> int:
+    stt_service.warmup()
+
+    async def _one(path):
+        with open(path, "rb") as f:
+            return path, await stt_service.transcribe(f.read())
+
+    # файлы распознаются одновременно — как ответы разных пользователей
+    for path, result in await asyncio.gather(*(_one(p) for p in paths)):
+        print(f"{path}: {result['audio_s']:.1f} с, RTF {result['rtf']:.2f}\n  {result['text']}")
+    stt_service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Использование: python -m voice.stt answer.ogg [answer2.ogg ...]")
+        sys.exit(2)
+    sys.exit(asyncio.run(_transcribe_files(sys.argv[1:])))
@@ -0,0 +1,399 @@
+# tts.py
+"""
+Озвучивание вопросов интервью (pyttsx3 -> OGG/Opus для голосовых Telegram).
+
+Вопросы по вакансии у кандидатов в основном одинаковые, поэтому озвучка кэшируется:
+готовый OGG хранится на диске под ключом из текста, голоса и настроек синтеза, а после первой
+отправки запоминается file_id Telegram — повторная отправка того же вопроса идёт без загрузки файла.
+Набор вопросов вакансии можно озвучить заранее в фоне (presynthesize). Кэш на диске ограничен
+по объёму и сроку неиспользования (TTS_CACHE_MAX_MB, TTS_CACHE_MAX_AGE_DAYS) — его чистит gc().
+
+    python -m voice.tts "Расскажите о своём опыте работы с SQL" -o question.ogg
+    python -m voice.tts --gc [--dry-run]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from bot.metrics import metrics
+from logs.logger import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(BASE_DIR, "data", "tts"))
+# Голос pyttsx3: подстрока id или имени голоса (например, "russian"), пусто — голос по умолчанию
+TTS_VOICE = os.getenv("TTS_VOICE", "russian")
+TTS_RATE = int(os.getenv("TTS_RATE", 170))
+TTS_VOLUME = float(os.getenv("TTS_VOLUME", 1.0))
+# Битрейт Opus: речи достаточно 24–32 кбит/с
+TTS_OPUS_BITRATE = os.getenv("TTS_OPUS_BITRATE", "32k")
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+# Лимит кэша озвучки на диске в МБ и срок хранения неиспользуемых клипов в днях (0 — без ограничения),
+# период фоновой очистки в часах
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", 500))
+TTS_CACHE_MAX_AGE_DAYS = float(os.getenv("TTS_CACHE_MAX_AGE_DAYS", 90))
+TTS_GC_INTERVAL_HOURS = float(os.getenv("TTS_GC_INTERVAL_HOURS", 24))
+
+# Меняется при изменении способа кодирования — старые файлы кэша перестают совпадать по ключу
+_CACHE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clips_last_used ON clips(last_used);
+CREATE TABLE IF NOT EXISTS telegram_files (
+    key TEXT NOT NULL,
+    bot_id INTEGER NOT NULL,
+    file_id TEXT NOT NULL,
+    PRIMARY KEY (key, bot_id)
+);
+"""
+
+
+class TTSError(Exception):
+    """Не удалось синтезировать или закодировать речь"""
+
+
+def cache_key(text: str, voice: str = TTS_VOICE, rate: int = TTS_RATE, volume: float = TTS_VOLUME,
+              bitrate: str = TTS_OPUS_BITRATE) -> str:
+    payload = json.dumps({"text": text.strip(), "voice": voice, "rate": rate, "volume": volume,
+                          "bitrate": bitrate, "v": _CACHE_VERSION}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_opus(wav_path: str, bitrate: str = TTS_OPUS_BITRATE) -> bytes:
+    """WAV -> OGG/Opus моно (формат голосовых сообщений Telegram)"""
+    try:
+        proc = subprocess.run(
+            [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-i", wav_path,
+             "-ac", "1", "-ar", "48000", "-c:a", "libopus", "-b:a", bitrate, "-application", "voip",
+             "-f", "ogg", "pipe:1"],
+            capture_output=True, check=False)
+    except FileNotFoundError as e:
+        raise TTSError(f"ffmpeg не найден ({FFMPEG_BIN}), нужен для кодирования голосовых") from e
+    if proc.returncode != 0 or not proc.stdout:
+        raise TTSError(f"ffmpeg не смог закодировать речь: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    return proc.stdout
+
+
+class TextToSpeech:
+    """
+    Синтез речи с кэшем OGG/Opus на диске и file_id Telegram.
+    pyttsx3 не потокобезопасен — весь синтез идёт в одном выделенном потоке.
+    """
+
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, voice: str = TTS_VOICE, rate: int = TTS_RATE,
+                 volume: float = TTS_VOLUME, bitrate: str = TTS_OPUS_BITRATE):
+        self.cache_dir = cache_dir
+        self.voice = voice
+        self.rate = rate
+        self.volume = volume
+        self.bitrate = bitrate
+        self._engine = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._file_ids: Dict[tuple, str] = {}  # (key, bot_id) -> file_id
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # время последнего использования клипов копится в памяти и пишется в базу при очистке
+        self._pending_used: Dict[str, float] = {}
+        self._gc_thread = None
+        self._stop_event = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # доступ из потока синтеза и asyncio.to_thread — под _lock
+            self._conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), timeout=30,
+                                         isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._file_ids = {(key, bot_id): file_id for key, bot_id, file_id
+                              in self._conn.execute("SELECT key, bot_id, file_id FROM telegram_files")}
+        return self._conn
+
+    def key(self, text: str) -> str:
+        return cache_key(text, self.voice, self.rate, self.volume, self.bitrate)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.ogg")
+
+    # --- синтез (поток "tts") ---
+
+    def _get_engine(self):
+        if self._engine is None:
+            import pyttsx3
+
+            engine = pyttsx3.init()
+            engine.setProperty("rate", self.rate)
+            engine.setProperty("volume", self.volume)
+            if self.voice:
+                wanted = self.voice.lower()
+                for voice in engine.getProperty("voices"):
+                    if wanted in (voice.id or "").lower() or wanted in (voice.name or "").lower():
+                        engine.setProperty("voice", voice.id)
+                        break
+                else:
+                    logger.warning(f"Голос TTS '{self.voice}' не найден, используется голос по умолчанию")
+            self._engine = engine
+        return self._engine
+
+    def _synthesize_blocking(self, text: str, key: str) -> bytes:
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix="tts_") as tmp:
+            wav_path = os.path.join(tmp, "speech.wav")
+            try:
+                engine = self._get_engine()
+                engine.save_to_file(text, wav_path)
+                engine.runAndWait()
+            except Exception as e:
+                # нет pyttsx3 или драйвера речи, ошибка движка: для вызывающих это тот же TTSError,
+                # а движок создаётся заново при следующем синтезе
+                self._engine = None
+                raise TTSError(f"pyttsx3 не смог синтезировать речь: {e!r}") from e
+            if not os.path.exists(wav_path):
+                raise TTSError("pyttsx3 не создал аудиофайл")
+            data = encode_opus(wav_path, self.bitrate)
+
+        path = self._path(key)
+        now = time.time()
+        # файл пишется под тем же lock, что и очистка: gc не удалит только что записанный клип
+        with self._lock:
+            tmp_path = f"{path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO clips(key, text, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, text, len(data), now, now))
+            except (OSError, sqlite3.Error) as e:
+                # озвучка уже готова — отдаём её без кэша; файл без записи в индексе gc бы не увидел
+                logger.warning(f"Не удалось сохранить озвучку в кэш: {e}")
+                for leftover in (tmp_path, path):
+                    try:
+                        os.remove(leftover)
+                    except OSError:
+                        pass
+        metrics.observe("tts_synthesize", time.perf_counter() - start)
+        logger.info(f"Озвучен вопрос ({len(text)} символов, {len(data) / 1024:.1f} КБ) "
+                    f"за {time.perf_counter() - start:.2f} с")
+        return data
+
+    def _read_cached(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _touch(self, key: str):
+        self._pending_used[key] = time.time()
+
+    def _write_pending(self, conn: sqlite3.Connection) -> Dict[str, float]:
+        pending = dict(self._pending_used)
+        if pending:
+            conn.executemany("UPDATE clips SET last_used = MAX(last_used, ?) WHERE key = ?",
+                             [(ts, key) for key, ts in pending.items()])
+        return pending
+
+    def _forget_pending(self, written: Dict[str, float]):
+        # после коммита; более поздние отметки, пришедшие за время очистки, остаются
+        for key, ts in written.items():
+            if self._pending_used.get(key) == ts:
+                self._pending_used.pop(key, None)
+
+    # --- API ---
+
+    async def synthesize(self, text: str) -> bytes:
+        """OGG/Opus для текста: из кэша или синтезом; одинаковые одновременные запросы синтезируются один раз"""
+        key = self.key(text)
+        data = await asyncio.to_thread(self._read_cached, key)
+        if data is not None:
+            metrics.inc("tts_cache_hits")
+            self._touch(key)
+            return data
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self._synthesize_blocking, text.strip(), key)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: отмена одного ожидающего не должна отменять синтез для остальных
+        return await asyncio.shield(future)
+
+    def presynthesize(self, texts: Iterable[str]) -> asyncio.Task:
+        """Фоновая озвучка набора вопросов (например, всех вопросов вакансии) до того, как они понадобятся"""
+        texts = [t for t in dict.fromkeys(texts) if t and t.strip()]
+
+        async def _run():
+            for text in texts:
+                try:
+                    await self.synthesize(text)
+                except Exception as e:
+                    logger.error(f"Не удалось заранее озвучить вопрос '{text[:40]}': {e}", exc_info=True)
+
+        return asyncio.get_running_loop().create_task(_run())
+
+    def get_file_id(self, text: str, bot_id: int) -> Optional[str]:
+        with self._lock:
+            self._connect()
+            return self._file_ids.get((self.key(text), bot_id))
+
+    def _remember_file_id(self, key: str, bot_id: int, file_id: Optional[str]):
+        with self._lock:
+            conn = self._connect()
+            if file_id is None:
+                self._file_ids.pop((key, bot_id), None)
+                conn.execute("DELETE FROM telegram_files WHERE key = ? AND bot_id = ?", (key, bot_id))
+            else:
+                self._file_ids[(key, bot_id)] = file_id
+                conn.execute("INSERT OR REPLACE INTO telegram_files(key, bot_id, file_id) VALUES (?, ?, ?)",
+                             (key, bot_id, file_id))
+
+    async def send_voice(self, bot, chat_id: int, text: str, **kwargs):
+        """
+        Отправляет вопрос голосовым. Если этот клип уже отправлялся этим ботом — по file_id,
+        без загрузки; иначе загружает OGG и запоминает file_id из ответа Telegram.
+        """
+        from telegram.error import BadRequest
+
+        key = self.key(text)
+        file_id = await asyncio.to_thread(self.get_file_id, text, bot.id)
+        if file_id:
+            try:
+                message = await bot.send_voice(chat_id, voice=file_id, **kwargs)
+                metrics.inc("tts_file_id_hits")
+                self._touch(key)
+                return message
+            except BadRequest as e:
+                # file_id устарел или принадлежит другому боту — загружаем заново
+                logger.warning(f"file_id озвучки не принят Telegram ({e}), загружаем файл заново")
+                await asyncio.to_thread(self._remember_file_id, key, bot.id, None)
+
+        data = await self.synthesize(text)
+        message = await bot.send_voice(chat_id, voice=data, filename="question.ogg", **kwargs)
+        if message.voice is not None:
+            await asyncio.to_thread(self._remember_file_id, key, bot.id, message.voice.file_id)
+        return message
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connect()
+            clips, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clips").fetchone()
+            file_ids = conn.execute("SELECT COUNT(*) FROM telegram_files").fetchone()[0]
+        return {"clips": clips, "bytes": size, "telegram_file_ids": file_ids}
+
+    def gc(self, max_age_days: float = TTS_CACHE_MAX_AGE_DAYS, max_mb: float = TTS_CACHE_MAX_MB,
+           dry_run: bool = False) -> Dict[str, int]:
+        """
+        Удаляет клипы, не использованные дольше max_age_days, и самые давно использованные сверх max_mb.
+        Ограничение <= 0 не применяется. Вместе с клипом забываются и его file_id Telegram.
+        """
+        cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+        max_bytes = int(max_mb * 1024 * 1024)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                written = self._write_pending(conn)
+                kept, removed = 0, []
+                for key, size, last_used in conn.execute(
+                        "SELECT key, size, last_used FROM clips ORDER BY last_used DESC").fetchall():
+                    if (cutoff is not None and last_used < cutoff) or (max_bytes > 0 and kept + size > max_bytes):
+                        removed.append((key, size))
+                    else:
+                        kept += size
+                conn.executemany("DELETE FROM clips WHERE key = ?", [(key,) for key, _ in removed])
+                conn.executemany("DELETE FROM telegram_files WHERE key = ?", [(key,) for key, _ in removed])
+                conn.execute("ROLLBACK" if dry_run else "COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            if not dry_run:
+                self._forget_pending(written)
+                removed_keys = {key for key, _ in removed}
+                self._file_ids = {k: v for k, v in self._file_ids.items() if k[0] not in removed_keys}
+                for key in removed_keys:
+                    try:
+                        os.remove(self._path(key))
+                    except FileNotFoundError:
+                        pass
+        result = {"removed_clips": len(removed), "freed_bytes": sum(size for _, size in removed), "kept_bytes": kept}
+        logger.info(f"Очистка кэша озвучки{' (dry-run)' if dry_run else ''}: {result}")
+        return result
+
+    def start_gc_worker(self, interval_hours: float = TTS_GC_INTERVAL_HOURS):
+        """Фоновый поток, который периодически применяет лимиты кэша"""
+        if self._gc_thread is not None or interval_hours <= 0:
+            return
+
+        def _run():
+            while not self._stop_event.wait(interval_hours * 3600):
+                try:
+                    self.gc()
+                except Exception as e:
+                    logger.error(f"Ошибка очистки кэша озвучки: {e}", exc_info=True)
+
+        self._gc_thread = threading.Thread(target=_run, name="tts-cache-gc", daemon=True)
+        self._gc_thread.start()
+        logger.info(f"Очистка кэша озвучки: до {TTS_CACHE_MAX_MB:g} МБ, срок {TTS_CACHE_MAX_AGE_DAYS:g} дн., "
+                    f"раз в {interval_hours:g} ч")
+
+    def stop_gc_worker(self):
+        self._stop_event.set()
+        self._gc_thread = None
+
+    def shutdown(self):
+        self.stop_gc_worker()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# общий сервис озвучки для всего процесса
+tts_service = TextToSpeech()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Озвучка текста в OGG/Opus через кэш TTS")
+    parser.add_argument("text", nargs="?")
+    parser.add_argument("-o", "--output", help="куда сохранить OGG")
+    parser.add_argument("--stats", action="store_true", help="показать размер кэша")
+    parser.add_argument("--gc", action="store_true", help="очистить кэш по TTS_CACHE_MAX_MB/TTS_CACHE_MAX_AGE_DAYS")
+    parser.add_argument("--dry-run", action="store_true", help="с --gc: только показать, что будет удалено")
+    args = parser.parse_args(argv)
+
+    if args.gc:
+        print(tts_service.gc(dry_run=args.dry_run))
+        return 0
+    if args.stats or not args.text:
+        print(tts_service.stats())
+        return 0
+    start = time.perf_counter()
+    data = asyncio.run(tts_service.synthesize(args.text))
+    print(f"{len(data) / 1024:.1f} КБ за {time.perf_counter() - start:.2f} с")
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(data)
+    tts_service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())